@@ -1,4 +1,13 @@
-from .generators import identity_table, rgb_color_enhance  # noqa: F401
-from .loaders import load_cube_file, load_hald_image  # noqa: F401
+from .compact import Float16Color3DLUT, UInt16Color3DLUT  # noqa: F401
+from .generators import identity_table, rgb_color_enhance, selective_color  # noqa: F401
+from .images import apply_lut_to_image, iter_apply_lut  # noqa: F401
+from .loaders import (  # noqa: F401
+    load_3dl_file, load_csp_file, load_cube_file, load_hald_image, load_lut_directory)
+from .lut1d import Color1DLUT  # noqa: F401
 from .operations import (  # noqa: F401
-    amplify_lut, resize_lut, sample_lut_cubic, sample_lut_linear, transform_lut)
+    amplify_lut, bake_colorspace, blend_luts, fold_shaper_lut, invert_lut,
+    lut_fingerprint, lut_sequence, luts_close, optimize_lut_size, resize_lut,
+    sample_lut_cubic, sample_lut_linear, transform_lut, update_lut_region)
+from .registry import LutRegistry  # noqa: F401
+from .savers import hald_image, save_cube_file, save_hald_image  # noqa: F401
+from .shared import SharedColor3DLUT  # noqa: F401
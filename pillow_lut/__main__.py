@@ -0,0 +1,242 @@
+"""Command-line interface: ``python -m pillow_lut COMMAND ...``.
+
+Commands:
+
+* ``convert`` — converts lookup tables between .cube and Hald image formats.
+* ``resize`` — resizes lookup tables.
+* ``compose`` — composes several lookup tables into one.
+* ``apply`` — applies a lookup table to images.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from .loaders import _load_lut_file
+from .operations import resize_lut, transform_lut
+from .savers import _save_lut_file
+
+
+_INTERPOLATIONS = {
+    'linear': Image.BILINEAR,
+    'cubic': Image.BICUBIC,
+}
+
+_EXTENSIONS = {
+    'cube': '.cube',
+    'hald': '.png',
+}
+
+# The table which is applied by the worker process, see _init_apply
+_apply_lut = None
+
+
+def _output_path(path, outdir, ext=None):
+    name, orig_ext = os.path.splitext(os.path.basename(path))
+    return os.path.join(outdir, name + (ext or orig_ext))
+
+
+def _convert_file(path, outdir, format, size, interp):
+    lut = _load_lut_file(path)
+    if size is not None:
+        lut = resize_lut(lut, size, interp=interp)
+    outpath = _output_path(path, outdir, _EXTENSIONS[format])
+    _save_lut_file(lut, outpath)
+    return outpath
+
+
+def _init_apply(lut):
+    global _apply_lut
+    _apply_lut = lut
+
+
+def _apply_file(path, outdir):
+    outpath = _output_path(path, outdir)
+    with Image.open(path) as im:
+        im.filter(_apply_lut).save(outpath)
+    return outpath
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _run_batch(func, paths, args, workers, initializer=None, initargs=()):
+    """Calls ``func(path, *args)`` for every path, in the process pool
+    when there is more than one worker. Returns a list of
+    ``(path, result, error, seconds)`` tuples in the order of paths.
+    """
+    results = []
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for path in paths:
+            try:
+                result, seconds = _timed(func, path, *args)
+            except Exception as e:
+                results.append((path, None, e, 0.0))
+            else:
+                results.append((path, result, None, seconds))
+        return results
+
+    with ProcessPoolExecutor(workers, initializer=initializer,
+                             initargs=initargs) as executor:
+        futures = [(path, executor.submit(_timed, func, path, *args))
+                   for path in paths]
+        for path, future in futures:
+            try:
+                result, seconds = future.result()
+            except Exception as e:
+                results.append((path, None, e, 0.0))
+            else:
+                results.append((path, result, None, seconds))
+    return results
+
+
+def _report(results, start, stats):
+    failed = 0
+    for path, result, error, seconds in results:
+        if error is not None:
+            failed += 1
+            print("{}: {}".format(path, error), file=sys.stderr)
+    if stats:
+        total = time.perf_counter() - start
+        done = len(results) - failed
+        busy = sum(seconds for _, _, _, seconds in results)
+        print("{:d} files, {:d} failed, {:.3f} s, {:.1f} files/s, "
+              "{:.1f} ms per file".format(
+                  len(results), failed, total,
+                  done / total if total > 0 else 0.0,
+                  busy / done * 1000 if done else 0.0),
+              file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _cmd_convert(args):
+    interp = _INTERPOLATIONS[args.interp]
+    return _run_batch(_convert_file, args.inputs,
+                      (args.outdir, args.format, args.size, interp),
+                      args.workers)
+
+
+def _cmd_apply(args):
+    try:
+        lut = _load_lut_file(args.lut)
+    except Exception as e:
+        return [(args.lut, None, e, 0.0)]
+    return _run_batch(_apply_file, args.images, (args.outdir,),
+                      args.workers, _init_apply, (lut,))
+
+
+def _compose_files(path, paths, output, size, interp):
+    lut = _load_lut_file(path)
+    for other in paths:
+        lut = transform_lut(lut, _load_lut_file(other),
+                            target_size=size, interp=interp)
+        # Only the first step is resized
+        size = None
+    _save_lut_file(lut, output)
+    return output
+
+
+def _cmd_compose(args):
+    interp = _INTERPOLATIONS[args.interp]
+    return _run_batch(_compose_files, args.luts[:1],
+                      (args.luts[1:], args.output, args.size, interp), 1)
+
+
+def _parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        '--stats', action='store_true',
+        help="Print the number of files, time and throughput to stderr.")
+
+    # Not for compose, which is a sequential chain
+    workers = argparse.ArgumentParser(add_help=False)
+    workers.add_argument(
+        '--workers', type=int, default=1,
+        help="The number of worker processes. Default is 1, "
+             "0 means the number of processors.")
+
+    lut_options = argparse.ArgumentParser(add_help=False)
+    lut_options.add_argument(
+        '--interp', choices=sorted(_INTERPOLATIONS), default='linear',
+        help="Interpolation for resizing. Default is linear.")
+
+    parser = argparse.ArgumentParser(
+        prog='python -m pillow_lut',
+        description="Batch processing of color lookup tables.")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    commands.required = True
+
+    cmd = commands.add_parser(
+        'convert', parents=[common, workers, lut_options],
+        help="Convert tables to another format.")
+    cmd.add_argument('inputs', nargs='+', metavar='INPUT')
+    cmd.add_argument('-o', '--outdir', required=True)
+    cmd.add_argument('-f', '--format', choices=sorted(_EXTENSIONS),
+                     default='cube', help="Default is cube.")
+    cmd.add_argument('--size', type=int,
+                     help="Resize tables to this size. Hald images could be "
+                          "made only for 4, 9, 16, 25, 36, 49 or 64 size.")
+    cmd.set_defaults(func=_cmd_convert)
+
+    cmd = commands.add_parser(
+        'resize', parents=[common, workers, lut_options],
+        help="Resize tables.")
+    cmd.add_argument('inputs', nargs='+', metavar='INPUT')
+    cmd.add_argument('-o', '--outdir', required=True)
+    cmd.add_argument('--size', type=int, required=True)
+    cmd.add_argument('-f', '--format', choices=sorted(_EXTENSIONS),
+                     default='cube', help="Default is cube.")
+    cmd.set_defaults(func=_cmd_convert)
+
+    cmd = commands.add_parser(
+        'compose', parents=[common, lut_options],
+        help="Compose tables, the first table is applied first.")
+    cmd.add_argument('luts', nargs='+', metavar='LUT')
+    cmd.add_argument('-o', '--output', required=True,
+                     help="The resulting file, .cube, .png or .tiff.")
+    cmd.add_argument('--size', type=int,
+                     help="The size of the resulting table. "
+                          "Default is the size of the first table.")
+    cmd.set_defaults(func=_cmd_compose)
+
+    cmd = commands.add_parser(
+        'apply', parents=[common, workers],
+        help="Apply the table to images.")
+    cmd.add_argument('lut', metavar='LUT')
+    cmd.add_argument('images', nargs='+', metavar='IMAGE')
+    cmd.add_argument('-o', '--outdir', required=True)
+    cmd.set_defaults(func=_cmd_apply)
+
+    return parser
+
+
+def main(argv=None):
+    """Runs the command-line tool and returns the exit code:
+    0 on success, 1 if any file failed.
+    """
+    args = _parser().parse_args(argv)
+    if getattr(args, 'workers', 1) < 1:
+        args.workers = os.cpu_count() or 1
+    outdir = getattr(args, 'outdir', None)
+    if outdir is not None:
+        os.makedirs(outdir, exist_ok=True)
+
+    start = time.perf_counter()
+    try:
+        results = args.func(args)
+    except Exception as e:
+        print("error: {}".format(e), file=sys.stderr)
+        return 1
+    return _report(results, start, args.stats)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
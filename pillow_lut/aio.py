@@ -0,0 +1,111 @@
+"""Coroutine versions of the package functions for asyncio applications.
+
+All work is done in the executor, so the event loop is not blocked.
+By default the default executor of the loop is used, another one could
+be set with :py:func:`set_executor`. When a process pool is used,
+all arguments, including callbacks, should be picklable.
+
+Functions which change the table in place, like
+:py:func:`pillow_lut.update_lut_region`, return the changed table. Use
+the result: with a process pool the argument itself is not changed.
+Generators, like :py:func:`pillow_lut.lut_sequence`, have no coroutine
+versions.
+
+Cancelled coroutines return immediately. The work which is already
+running in the executor is not interrupted, but its result is dropped.
+File loaders read the file and parse it in separate steps, so the parsing
+does not start when a coroutine is cancelled during reading.
+"""
+import asyncio
+import functools
+from io import BytesIO
+
+from . import generators, images, loaders, operations, savers
+
+
+_executor = None
+
+
+def set_executor(executor):
+    """Sets the executor for all coroutines of the module.
+
+    :param executor: ``concurrent.futures.Executor`` instance. None means
+                     the default executor of the event loop.
+    """
+    global _executor
+    _executor = executor
+
+
+def get_executor():
+    """Returns the executor set by :py:func:`set_executor`."""
+    return _executor
+
+
+async def _run(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, functools.partial(func, *args, **kwargs))
+
+
+def _read_file(filename, mode):
+    with open(filename, mode) as file:
+        return file.read()
+
+
+def _coroutine_of(func, wrapper):
+    functools.update_wrapper(wrapper, func)
+    wrapper.__name__ = wrapper.__qualname__ = 'a' + func.__name__
+    wrapper.__doc__ = "Coroutine version of :py:func:`pillow_lut.{}`.".format(
+        func.__name__)
+    return wrapper
+
+
+def _wrap(func):
+    async def wrapper(*args, **kwargs):
+        return await _run(func, *args, **kwargs)
+
+    return _coroutine_of(func, wrapper)
+
+
+def _wrap_text_loader(func):
+    async def wrapper(lines, *args, **kwargs):
+        if isinstance(lines, str):
+            lines = (await _run(_read_file, lines, 'rt')).splitlines()
+        return await _run(func, lines, *args, **kwargs)
+
+    return _coroutine_of(func, wrapper)
+
+
+aload_cube_file = _wrap_text_loader(loaders.load_cube_file)
+aload_3dl_file = _wrap_text_loader(loaders.load_3dl_file)
+aload_csp_file = _wrap_text_loader(loaders.load_csp_file)
+
+
+async def aload_hald_image(image, *args, **kwargs):
+    """Coroutine version of :py:func:`pillow_lut.load_hald_image`."""
+    if isinstance(image, str):
+        image = BytesIO(await _run(_read_file, image, 'rb'))
+    return await _run(loaders.load_hald_image, image, *args, **kwargs)
+
+
+aload_lut_directory = _wrap(loaders.load_lut_directory)
+asave_cube_file = _wrap(savers.save_cube_file)
+asave_hald_image = _wrap(savers.save_hald_image)
+ahald_image = _wrap(savers.hald_image)
+aidentity_table = _wrap(generators.identity_table)
+argb_color_enhance = _wrap(generators.rgb_color_enhance)
+aselective_color = _wrap(generators.selective_color)
+asample_lut_linear = _wrap(operations.sample_lut_linear)
+asample_lut_cubic = _wrap(operations.sample_lut_cubic)
+aresize_lut = _wrap(operations.resize_lut)
+atransform_lut = _wrap(operations.transform_lut)
+afold_shaper_lut = _wrap(operations.fold_shaper_lut)
+aamplify_lut = _wrap(operations.amplify_lut)
+ainvert_lut = _wrap(operations.invert_lut)
+abake_colorspace = _wrap(operations.bake_colorspace)
+ablend_luts = _wrap(operations.blend_luts)
+aupdate_lut_region = _wrap(operations.update_lut_region)
+aoptimize_lut_size = _wrap(operations.optimize_lut_size)
+alut_fingerprint = _wrap(operations.lut_fingerprint)
+aluts_close = _wrap(operations.luts_close)
+aapply_lut_to_image = _wrap(images.apply_lut_to_image)
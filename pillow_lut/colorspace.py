@@ -0,0 +1,196 @@
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def _srgb_to_linear(s):
+    if s < 0.0404482362771082:
+        return s / 12.92
+    return pow((s + 0.055) / 1.055, 2.4)
+
+
+def _linear_to_srgb(lin):
+    if lin < 0.00313066844250063:
+        return lin * 12.92
+    return pow(lin, 1 / 2.4) * 1.055 - 0.055
+
+
+# The power is computed for the clipped values, so it is never
+# undefined for negative values, which are taken from the linear segment.
+def _srgb_to_linear_numpy(s):
+    power = ((s.clip(0.0404482362771082) + 0.055) / 1.055) ** 2.4
+    return numpy.where(s < 0.0404482362771082, s / 12.92, power)
+
+
+def _linear_to_srgb_numpy(lin):
+    power = lin.clip(0.00313066844250063) ** (1 / 2.4) * 1.055 - 0.055
+    return numpy.where(lin < 0.00313066844250063, lin * 12.92, power)
+
+
+def _rgb_to_hsv(r, g, b):
+    max_v = v = max(r, g, b)
+    min_v = min(r, g, b)
+    d = max_v - min_v
+    s = 0 if max_v == 0 else d / max_v
+    if max_v == min_v:
+        h = 0
+    elif max_v == r:
+        h = (g - b) / d + (6 if g < b else 0)
+    elif max_v == g:
+        h = (b - r) / d + 2
+    else:  # max_v == b
+        h = (r - g) / d + 4
+    h /= 6
+    return h, s, v
+
+
+def _hsv_to_rgb(h, s, v):
+    i = int(h * 6)
+    f = h * 6 - i
+    p = v * (1 - s)
+    q = v * (1 - f * s)
+    t = v * (1 - (1 - f) * s)
+    if i == 0:
+        return v, t, p
+    if i == 1:
+        return q, v, p
+    if i == 2:
+        return p, v, t
+    if i == 3:
+        return p, q, v
+    if i == 4:
+        return t, p, v
+    return v, p, q  # if i == 5:
+
+
+def _rgb_to_hsv_numpy(r, g, b):
+    max_v = numpy.maximum(numpy.maximum(r, g), b)
+    min_v = numpy.minimum(numpy.minimum(r, g), b)
+    d = max_v - min_v
+    s = numpy.where(max_v == 0, 0, d / numpy.where(max_v == 0, 1, max_v))
+    safe_d = numpy.where(d == 0, 1, d)
+    h = numpy.select(
+        [d == 0, max_v == r, max_v == g],
+        [0, (g - b) / safe_d + numpy.where(g < b, 6, 0), (b - r) / safe_d + 2],
+        (r - g) / safe_d + 4,
+    )
+    return h / 6, s, max_v
+
+
+def _hsv_to_rgb_numpy(h, s, v):
+    i = (h * 6).astype(numpy.int32)
+    f = h * 6 - i
+    p = v * (1 - s)
+    q = v * (1 - f * s)
+    t = v * (1 - (1 - f) * s)
+    cases = [i == 0, i == 1, i == 2, i == 3, i == 4]
+    return (numpy.select(cases, [v, q, p, p, t], v),
+            numpy.select(cases, [t, v, v, q, p], p),
+            numpy.select(cases, [p, p, t, v, v], q))
+
+
+# Pillow's YCbCr is full range BT.601 as in JPEG
+def _rgb_to_ycbcr(r, g, b):
+    y = 0.299 * r + 0.587 * g + 0.114 * b
+    cb = -0.168736 * r - 0.331264 * g + 0.5 * b + 0.5
+    cr = 0.5 * r - 0.418688 * g - 0.081312 * b + 0.5
+    return y, cb, cr
+
+
+def _ycbcr_to_rgb(y, cb, cr):
+    r = y + 1.402 * (cr - 0.5)
+    g = y - 0.344136 * (cb - 0.5) - 0.714136 * (cr - 0.5)
+    b = y + 1.772 * (cb - 0.5)
+    return r, g, b
+
+
+# Pillow's LAB is CIE L*a*b* with D50 white point, converted from sRGB.
+# L* is scaled to [0, 1], a* and b* are shifted by 128 and divided by 255.
+_RGB_TO_XYZ = (
+    (0.4360747, 0.3850649, 0.1430804),
+    (0.2225045, 0.7168786, 0.0606169),
+    (0.0139322, 0.0971045, 0.7141733),
+)
+_XYZ_TO_RGB = (
+    (3.1338561, -1.6168667, -0.4906146),
+    (-0.9787684, 1.9161415, 0.0334540),
+    (0.0719453, -0.2289914, 1.4052427),
+)
+_WHITE = (0.9642, 1.0, 0.8249)
+_LAB_E = (6 / 29) ** 3
+_LAB_K = 3 * (6 / 29) ** 2
+
+
+def _lab_f(t):
+    if t > _LAB_E:
+        return t ** (1 / 3)
+    return t / _LAB_K + 4 / 29
+
+
+def _lab_f_inverse(t):
+    if t > 6 / 29:
+        return t ** 3
+    return (t - 4 / 29) * _LAB_K
+
+
+def _lab_f_numpy(t):
+    return numpy.where(t > _LAB_E, numpy.cbrt(t), t / _LAB_K + 4 / 29)
+
+
+def _lab_f_inverse_numpy(t):
+    return numpy.where(t > 6 / 29, t ** 3, (t - 4 / 29) * _LAB_K)
+
+
+def _mul(matrix, x, y, z):
+    return [m[0] * x + m[1] * y + m[2] * z for m in matrix]
+
+
+def _xyz_to_lab(x, y, z, f):
+    fx, fy, fz = f(x / _WHITE[0]), f(y / _WHITE[1]), f(z / _WHITE[2])
+    return (1.16 * fy - 0.16,
+            (500 * (fx - fy) + 128) / 255,
+            (200 * (fy - fz) + 128) / 255)
+
+
+def _lab_to_xyz(lum, a, b, f_inverse):
+    fy = (lum + 0.16) / 1.16
+    fx = fy + (a * 255 - 128) / 500
+    fz = fy - (b * 255 - 128) / 200
+    return (f_inverse(fx) * _WHITE[0], f_inverse(fy) * _WHITE[1],
+            f_inverse(fz) * _WHITE[2])
+
+
+def _rgb_to_lab(r, g, b):
+    xyz = _mul(_RGB_TO_XYZ, *map(_srgb_to_linear, (r, g, b)))
+    return _xyz_to_lab(*xyz, _lab_f)
+
+
+def _lab_to_rgb(lum, a, b):
+    xyz = _lab_to_xyz(lum, a, b, _lab_f_inverse)
+    return [_linear_to_srgb(max(0.0, v)) for v in _mul(_XYZ_TO_RGB, *xyz)]
+
+
+def _rgb_to_lab_numpy(r, g, b):
+    xyz = _mul(_RGB_TO_XYZ, *map(_srgb_to_linear_numpy, (r, g, b)))
+    return _xyz_to_lab(*xyz, _lab_f_numpy)
+
+
+def _lab_to_rgb_numpy(lum, a, b):
+    xyz = _lab_to_xyz(lum, a, b, _lab_f_inverse_numpy)
+    return [_linear_to_srgb_numpy(v.clip(0)) for v in _mul(_XYZ_TO_RGB, *xyz)]
+
+
+def _identity(r, g, b):
+    return r, g, b
+
+
+# Conversions between normalized values of the image modes and RGB:
+# mode: (to RGB, from RGB, to RGB with numpy, from RGB with numpy)
+_MODES = {
+    'RGB': (_identity, _identity, _identity, _identity),
+    'YCbCr': (_ycbcr_to_rgb, _rgb_to_ycbcr, _ycbcr_to_rgb, _rgb_to_ycbcr),
+    'HSV': (lambda h, s, v: _hsv_to_rgb(h % 1, s, v), _rgb_to_hsv,
+            lambda h, s, v: _hsv_to_rgb_numpy(h % 1, s, v), _rgb_to_hsv_numpy),
+    'LAB': (_lab_to_rgb, _rgb_to_lab, _lab_to_rgb_numpy, _rgb_to_lab_numpy),
+}
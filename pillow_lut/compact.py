@@ -0,0 +1,80 @@
+from PIL import ImageFilter
+
+from .operations import _PlainTableMixin
+
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+class _CompactColor3DLUT(_PlainTableMixin, ImageFilter.Color3DLUT):
+    """Base class for tables with compact storage. The table is kept
+    in the compact form and is widened to float32 on every access
+    of the ``table`` attribute. Without numpy the table is stored as is.
+    """
+    @property
+    def table(self):
+        if self._compacted:
+            return self._widen(self._table)
+        return self._table
+
+    @table.setter
+    def table(self, table):
+        self._compacted = bool(numpy)
+        if self._compacted:
+            table = self._compact(numpy.asarray(table, dtype=numpy.float32))
+        self._table = table
+
+    @property
+    def compact_table(self):
+        """The table in the compact storage form."""
+        return self._table
+
+    def __repr__(self):
+        return super().__repr__().replace(
+            " from ndarray ", " from {} ".format(self._table.dtype), 1)
+
+
+class Float16Color3DLUT(_CompactColor3DLUT):
+    """Three-dimensional color lookup table which stores the table
+    as float16 array, which takes two times less memory than float32.
+    The precision is about 11 significant bits, so the error is less
+    than ``1/4096`` for values in the ``[0, 1]`` range.
+
+    Could be passed as ``cls`` argument to the package loaders,
+    generators and operations.
+    Accepts the same arguments as ``ImageFilter.Color3DLUT``.
+    """
+    def _compact(self, table):
+        return table.astype(numpy.float16)
+
+    def _widen(self, table):
+        return table.astype(numpy.float32)
+
+
+class UInt16Color3DLUT(_CompactColor3DLUT):
+    """Three-dimensional color lookup table which stores the table
+    as uint16 array, normalized to the range of each channel.
+    Takes two times less memory than float32. The error is less
+    than ``1/65535`` of the channel range, which gives higher precision
+    than :py:class:`Float16Color3DLUT` for tables in the ``[0, 1]`` range.
+
+    Could be passed as ``cls`` argument to the package loaders,
+    generators and operations.
+    Accepts the same arguments as ``ImageFilter.Color3DLUT``.
+    """
+    def _compact(self, table):
+        table = table.reshape(-1, self.channels)
+        self._offset = table.min(axis=0).astype(numpy.float64)
+        self._scale = (table.max(axis=0) - self._offset) / 65535
+        # Avoid division by zero for constant channels
+        scale = numpy.where(self._scale > 0, self._scale, 1)
+        table = numpy.rint((table - self._offset) / scale)
+        return table.astype(numpy.uint16).reshape(-1)
+
+    def _widen(self, table):
+        # float64 math keeps the error within the uint16 step
+        table = table.reshape(-1, self.channels) * self._scale + self._offset
+        return table.astype(numpy.float32).reshape(-1)
@@ -1,7 +1,12 @@
-from math import sin
+from math import cos, pi, sin
 
 from PIL import ImageFilter
 
+from .colorspace import (
+    _hsv_to_rgb, _hsv_to_rgb_numpy, _linear_to_srgb, _linear_to_srgb_numpy, _rgb_to_hsv,
+    _rgb_to_hsv_numpy, _srgb_to_linear, _srgb_to_linear_numpy)
+from .operations import _check_dtype
+
 
 try:
     import numpy
@@ -9,64 +14,6 @@ except ImportError:  # pragma: no cover
     numpy = None
 
 
-def _srgb_to_linear(s):
-    if s < 0.0404482362771082:
-        return s / 12.92
-    return pow((s + 0.055) / 1.055, 2.4)
-
-
-def _linear_to_srgb(lin):
-    if lin < 0.00313066844250063:
-        return lin * 12.92
-    return pow(lin, 1 / 2.4) * 1.055 - 0.055
-
-
-def _srgb_to_linear_numpy(s):
-    choicelist = [s / 12.92, ((s + 0.055) / 1.055) ** 2.4]
-    return numpy.select([s < 0.0404482362771082, True], choicelist)
-
-
-def _linear_to_srgb_numpy(lin):
-    choicelist = [lin * 12.92, (lin ** (1 / 2.4)) * 1.055 - 0.055]
-    return numpy.select([lin < 0.00313066844250063, True], choicelist)
-
-
-def _rgb_to_hsv(r, g, b):
-    max_v = v = max(r, g, b)
-    min_v = min(r, g, b)
-    d = max_v - min_v
-    s = 0 if max_v == 0 else d / max_v
-    if max_v == min_v:
-        h = 0
-    elif max_v == r:
-        h = (g - b) / d + (6 if g < b else 0)
-    elif max_v == g:
-        h = (b - r) / d + 2
-    else:  # max_v == b
-        h = (r - g) / d + 4
-    h /= 6
-    return h, s, v
-
-
-def _hsv_to_rgb(h, s, v):
-    i = int(h * 6)
-    f = h * 6 - i
-    p = v * (1 - s)
-    q = v * (1 - f * s)
-    t = v * (1 - (1 - f) * s)
-    if i == 0:
-        return v, t, p
-    if i == 1:
-        return q, v, p
-    if i == 2:
-        return p, v, t
-    if i == 3:
-        return p, q, v
-    if i == 4:
-        return t, p, v
-    return v, p, q  # if i == 5:
-
-
 def _rgb_to_yuv(r, g, b):
     y = (0.299 * r) + (0.587 * g) + (0.114 * b)
     u = (1.0 / 1.772) * (b - y)
@@ -86,7 +33,7 @@ def rgb_color_enhance(source,
                       saturation=0, vibrance=0,
                       # highlights=0, shadows=0,
                       hue=0, gamma=1.0,
-                      linear=False, cls=ImageFilter.Color3DLUT):
+                      linear=False, cls=ImageFilter.Color3DLUT, dtype=None):
     """Generates 3D color lookup table based on given values of basic
     color settings.
 
@@ -109,7 +56,9 @@ def rgb_color_enhance(source,
     :param linear: boolean value. Convert values from sRGB to linear color space
                    before the manipulating and return after. Default is False.
                    Most arguments more sensitive in this mode.
+    :param dtype: ``'float32'`` (default) or ``'float64'`` for the calculations.
     """
+    dtype = _check_dtype(dtype)
     source_is_lut = hasattr(source, 'table')
     if source_is_lut and source.channels != 3:
         raise ValueError("Only 3-channels table could be a source")
@@ -176,25 +125,25 @@ def rgb_color_enhance(source,
         if any(not 0 <= x <= 10 for x in gamma):
             raise ValueError("Gamma should be from 0.0 to 10.0")
 
-    if numpy and not hue:
+    if numpy:
         if source_is_lut:
             size = source.size
-            points = numpy.asarray(source.table, dtype=numpy.float32)
+            # Copy, since channels are modified in place
+            points = numpy.array(source.table, dtype=dtype)
             r = points[0::3]
             g = points[1::3]
             b = points[2::3]
+            if linear:
+                r = _srgb_to_linear_numpy(r)
+                g = _srgb_to_linear_numpy(g)
+                b = _srgb_to_linear_numpy(b)
         else:
             size = cls._check_size(source)
-            b, g, r = numpy.mgrid[
-                0:1:size[2]*1j,
-                0:1:size[1]*1j,
-                0:1:size[0]*1j
-            ].astype(numpy.float32)
-
-        if linear:
-            r = _srgb_to_linear_numpy(r)
-            g = _srgb_to_linear_numpy(g)
-            b = _srgb_to_linear_numpy(b)
+            axes = [numpy.linspace(0, 1, x).astype(dtype) for x in size]
+            if linear:
+                # Only the nodes of every axis are converted
+                axes = [_srgb_to_linear_numpy(x) for x in axes]
+            b, g, r = numpy.meshgrid(axes[2], axes[1], axes[0], indexing='ij')
 
         if contrast:
             r = (r - 0.5) * contrast[0] + 0.5
@@ -232,6 +181,10 @@ def rgb_color_enhance(source,
             v += scale * warmth[2]
             r, g, b = _yuv_to_rgb(y, u, v)
 
+        if hue:
+            h, s, v = _rgb_to_hsv_numpy(r, g, b)
+            r, g, b = _hsv_to_rgb_numpy((h + hue) % 1, s, v)
+
         if gamma != 1:
             r = r.clip(0) ** gamma[0]
             g = g.clip(0) ** gamma[1]
@@ -242,7 +195,7 @@ def rgb_color_enhance(source,
             g = _linear_to_srgb_numpy(g)
             b = _linear_to_srgb_numpy(b)
 
-        table = numpy.stack((r, g, b), axis=-1)
+        table = numpy.stack((r, g, b), axis=-1).astype(dtype, copy=False)
         return cls(size, table.reshape(table.size), _copy_table=False)
 
     def generate(r, g, b):
@@ -309,21 +262,136 @@ def rgb_color_enhance(source,
         return cls.generate(source, generate)
 
 
-def identity_table(size, target_mode=None, cls=ImageFilter.Color3DLUT):
+_HUES = {
+    'reds': 0.0, 'yellows': 1 / 6, 'greens': 2 / 6,
+    'cyans': 3 / 6, 'blues': 4 / 6, 'magentas': 5 / 6,
+}
+
+
+def _check_color_range(color_range):
+    color_range = dict(color_range)
+    unknown = set(color_range) - {'hue', 'width', 'hue_shift',
+                                  'saturation', 'value'}
+    if unknown:
+        raise ValueError("Unknown color range parameters: {}".format(
+            ", ".join(sorted(unknown))))
+
+    hue = color_range.get('hue', 0.0)
+    hue = _HUES.get(hue, hue)
+    if isinstance(hue, str):
+        raise ValueError("Unknown hue name: {}".format(hue))
+    if not 0 <= hue <= 1.0:
+        raise ValueError("Hue should be from 0.0 to 1.0")
+    width = color_range.get('width', 1 / 6)
+    if not 0 < width <= 0.5:
+        raise ValueError("Width should be from 0.0 to 0.5")
+    hue_shift = color_range.get('hue_shift', 0)
+    if not -0.5 <= hue_shift <= 0.5:
+        raise ValueError("Hue shift should be from -0.5 to 0.5")
+    saturation = color_range.get('saturation', 0)
+    if not -1.0 <= saturation <= 5.0:
+        raise ValueError("Saturation should be from -1.0 to 5.0")
+    value = color_range.get('value', 0)
+    if not -1.0 <= value <= 1.0:
+        raise ValueError("Value should be from -1.0 to 1.0")
+    return hue, width, hue_shift, saturation, value
+
+
+def selective_color(source, ranges, cls=ImageFilter.Color3DLUT, dtype=None):
+    """Generates 3D color lookup table which adjusts only colors
+    with given hues. The strength of the adjustment smoothly decreases
+    with the distance from the center of the range and is proportional
+    to the saturation of the color, so gray colors are not changed.
+
+    :param source: Could be the source lookup table which will be modified,
+                   or just a size of new identity table, from 2 to 65.
+    :param ranges: List of dicts, each describes one range of hues with
+                   the following keys. ``hue``: The center of the range
+                   from 0 to 1.0 or one of the names: ``'reds'``,
+                   ``'yellows'``, ``'greens'``, ``'cyans'``, ``'blues'``,
+                   ``'magentas'``. ``width``: The distance from the center
+                   where the adjustment stops, from 0 to 0.5.
+                   Default is 1/6. ``hue_shift``: from -0.5 to 0.5.
+                   ``saturation``: from -1.0 to 5.0. ``value``: Change
+                   of the brightness, from -1.0 to 1.0. All adjustments
+                   are 0 by default. The weights of all ranges are
+                   calculated from the source colors.
+    :param dtype: ``'float32'`` (default) or ``'float64'`` for the calculations.
+    """
+    dtype = _check_dtype(dtype)
+    source_is_lut = hasattr(source, 'table')
+    if source_is_lut and source.channels != 3:
+        raise ValueError("Only 3-channels table could be a source")
+    ranges = [_check_color_range(color_range) for color_range in ranges]
+
+    if numpy:
+        if source_is_lut:
+            size = source.size
+            points = numpy.array(source.table, dtype=dtype)
+            r, g, b = points[0::3], points[1::3], points[2::3]
+        else:
+            size = cls._check_size(source)
+            b, g, r = numpy.mgrid[
+                0:1:size[2]*1j,
+                0:1:size[1]*1j,
+                0:1:size[0]*1j
+            ].astype(dtype)
+
+        h, s, v = _rgb_to_hsv_numpy(r, g, b)
+        strength = s.clip(0, 1)
+        new_h, new_s, new_v = h, s, v
+        for hue, width, hue_shift, saturation, value in ranges:
+            distance = numpy.abs((h - hue + 0.5) % 1 - 0.5)
+            weight = numpy.where(
+                distance < width,
+                0.5 + 0.5 * numpy.cos(distance * (pi / width)), 0,
+            ) * strength
+            new_h = new_h + weight * hue_shift
+            new_s = new_s * (1 + weight * saturation)
+            new_v = new_v * (1 + weight * value)
+
+        r, g, b = _hsv_to_rgb_numpy(new_h % 1, new_s.clip(0, 1), new_v)
+        table = numpy.stack((r, g, b), axis=-1).astype(dtype, copy=False)
+        return cls(size, table.reshape(table.size), _copy_table=False)
+
+    def generate(r, g, b):
+        h, s, v = _rgb_to_hsv(r, g, b)
+        strength = max(0, min(1, s))
+        new_h, new_s, new_v = h, s, v
+        for hue, width, hue_shift, saturation, value in ranges:
+            distance = abs((h - hue + 0.5) % 1 - 0.5)
+            if distance >= width:
+                continue
+            weight = (0.5 + 0.5 * cos(distance * (pi / width))) * strength
+            new_h += weight * hue_shift
+            new_s *= 1 + weight * saturation
+            new_v *= 1 + weight * value
+        return _hsv_to_rgb(new_h % 1, max(0, min(1, new_s)), new_v)
+
+    if source_is_lut:
+        return source.transform(generate)
+    else:
+        return cls.generate(source, generate)
+
+
+def identity_table(size, target_mode=None, cls=ImageFilter.Color3DLUT,
+                   dtype=None):
     """Returns noop lookup table with linear distributed values.
 
     :param size: Size of the table. From 2 to 65.
     :param target_mode: A mode for the result image. Should have not less
                         than ``channels`` channels. Default is ``None``,
                         which means that mode wouldn't be changed.
+    :param dtype: numpy type of the table, ``'float32'`` (default) or ``'float64'``.
     """
+    dtype = _check_dtype(dtype)
     if numpy:
         size = cls._check_size(size)
         b, g, r = numpy.mgrid[
             0:1:size[2]*1j,
             0:1:size[1]*1j,
             0:1:size[0]*1j
-        ].astype(numpy.float32)
+        ].astype(dtype)
 
         table = numpy.stack((r, g, b), axis=-1)
         return cls(size, table.reshape(table.size),
@@ -0,0 +1,279 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .operations import _sample_lut_linear_numpy, sample_lut_linear
+
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def _frame_to_image(frame, size, mode):
+    """Wraps the frame to the image without copying when it is possible."""
+    if isinstance(frame, Image.Image):
+        return frame
+    if numpy and isinstance(frame, numpy.ndarray):
+        height, width = frame.shape[:2]
+        frame = numpy.ascontiguousarray(frame, dtype=numpy.uint8)
+        return Image.frombuffer(mode, (width, height), frame, 'raw', mode, 0, 1)
+    if size is None:
+        raise ValueError("The size is required for frames in bytes")
+    return Image.frombuffer(mode, size, frame, 'raw', mode, 0, 1)
+
+
+def _apply_to_frame(lut, frame, size, mode):
+    result = _frame_to_image(frame, size, mode).filter(lut)
+    if isinstance(frame, Image.Image):
+        return result
+    if numpy and isinstance(frame, numpy.ndarray):
+        return numpy.asarray(result)
+    return result.tobytes()
+
+
+def iter_apply_lut(lut, frames, size=None, mode='RGB', workers=None,
+                   prefetch=None, stats=None):
+    """Applies the lookup table to the stream of frames in the thread pool
+    and yields the results in the same order. Pillow releases the GIL
+    while the table is applied, so frames are processed in parallel.
+    Frames in bytes or numpy arrays are wrapped into images without
+    copying when Pillow supports this for the mode.
+
+    :param lut: Lookup table, ``ImageFilter.Color3DLUT`` object.
+    :param frames: Any iterable of frames. A frame could be Pillow image,
+                   numpy array with ``(height, width, channels)`` shape
+                   and uint8 type, or raw bytes. The results have
+                   the same type.
+    :param size: The size of raw frames, ``(width, height)``.
+                 Required for frames in bytes.
+    :param mode: The mode of raw frames and arrays. Default is ``'RGB'``.
+    :param workers: The number of threads. The default is None,
+                    which means the number of processors.
+    :param prefetch: How many frames are taken from the iterable
+                     before the first result is returned. The default
+                     is None, which means the doubled number of workers.
+    :param stats: Optional dict which is updated after every frame
+                  with the number of ``frames``, total ``seconds``
+                  and ``fps``, the number of frames per second.
+    """
+    workers = workers or os.cpu_count() or 1
+    prefetch = max(1, prefetch or workers * 2)
+    if stats is not None:
+        stats.update(frames=0, seconds=0.0, fps=0.0)
+    start = time.perf_counter()
+
+    def result(future):
+        frame = future.result()
+        if stats is not None:
+            stats['frames'] += 1
+            stats['seconds'] = time.perf_counter() - start
+            if stats['seconds'] > 0:
+                stats['fps'] = stats['frames'] / stats['seconds']
+        return frame
+
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+        for frame in frames:
+            pending.append(
+                executor.submit(_apply_to_frame, lut, frame, size, mode))
+            if len(pending) >= prefetch:
+                yield result(pending.popleft())
+        while pending:
+            yield result(pending.popleft())
+
+
+def _map_colors_numpy(lut, colors):
+    points = numpy.asarray(colors, dtype=numpy.float32) / 255
+    values = _sample_lut_linear_numpy(lut, points.reshape(-1, 3))
+    return (values.clip(0, 1) * 255 + 0.5).astype(numpy.uint8)
+
+
+def _map_colors(lut, colors):
+    """Applies the table to the list of RGB colors with 8 bit values.
+    Returns a list of colors with ``lut.channels`` values each.
+    """
+    if numpy:
+        return _map_colors_numpy(lut, colors).tolist()
+
+    return [
+        [int(max(0.0, min(1.0, v)) * 255 + 0.5)
+         for v in sample_lut_linear(lut, (r / 255, g / 255, b / 255))]
+        for r, g, b in colors
+    ]
+
+
+def _getpalette(image, mode):
+    try:
+        return image.getpalette(mode)
+    except TypeError:
+        # Pillow < 9.1 doesn't have rawmode argument
+        image.load()
+        return list(image.im.getpalette(mode, mode))
+
+
+def _apply_to_palette(image, lut):
+    mode = image.palette.mode
+    bands = len(mode)
+    palette = _getpalette(image, mode)
+    colors = [palette[i:i + 3] for i in range(0, len(palette), bands)]
+
+    for i, color in enumerate(_map_colors(lut, colors)):
+        palette[i * bands:i * bands + 3] = color
+    result = image.copy()
+    result.putpalette(palette, mode)
+    return result
+
+
+def _color_keys(colors):
+    """Packs 8-bit RGB colors to integers in the same way as pixels
+    of RGBX and RGBA images are laid out in little-endian uint32.
+    """
+    colors = numpy.asarray(colors, dtype=numpy.uint32).reshape(-1, 3)
+    return colors[:, 0] | (colors[:, 1] << 8) | (colors[:, 2] << 16)
+
+
+def _pixel_keys(image):
+    if image.mode != 'RGBA':
+        image = image.convert('RGBX')
+    return numpy.frombuffer(image.tobytes(), dtype='<u4') & 0xffffff
+
+
+# The dense index of all 24-bit colors has a fixed cost of allocating
+# 16 MB, the binary search is faster for small images.
+_DENSE_INDEX_MIN_PIXELS = 1 << 14
+
+
+def _apply_to_colors(image, lut, colors):
+    """Applies the table only to given distinct colors of RGB or RGBA image.
+    The pixels are replaced with indexes of the colors and the result is
+    made as palette image with the transformed colors. Up to 256 colors.
+    """
+    keys = _color_keys(colors)
+    if image.width * image.height < _DENSE_INDEX_MIN_PIXELS:
+        order = numpy.argsort(keys)
+        colors = [colors[i] for i in order]
+        indexes = numpy.searchsorted(keys[order], _pixel_keys(image))
+        indexes = indexes.astype(numpy.uint8)
+    else:
+        index = numpy.zeros(1 << 24, dtype=numpy.uint8)
+        index[keys] = numpy.arange(len(colors))
+        indexes = index[_pixel_keys(image)]
+
+    result = Image.frombytes('P', image.size, indexes.tobytes())
+    result.putpalette([v for color in _map_colors(lut, colors) for v in color])
+    result = result.convert('RGB')
+    if image.mode == 'RGBA':
+        result.putalpha(image.getchannel('A'))
+    return result
+
+
+def _apply_histogram(image, lut):
+    """Applies the table only to distinct colors of RGB or RGBA image
+    and scatters the results back to the pixels. The distinct colors
+    and the index of every pixel's color are found with the dense
+    table of all 24-bit colors, which is faster than sorting.
+    """
+    keys = _pixel_keys(image)
+    present = numpy.zeros(1 << 24, dtype=numpy.bool_)
+    present[keys] = True
+    unique = numpy.flatnonzero(present).astype(numpy.uint32)
+
+    itype = numpy.uint16 if len(unique) <= 1 << 16 else numpy.uint32
+    # Only the items of present colors are ever read
+    index = numpy.empty(1 << 24, dtype=itype)
+    index[unique] = numpy.arange(len(unique), dtype=itype)
+
+    colors = numpy.stack(
+        (unique & 0xff, (unique >> 8) & 0xff, unique >> 16), axis=-1)
+    values = numpy.zeros((len(unique), 4), dtype=numpy.uint8)
+    values[:, :3] = _map_colors_numpy(lut, colors)
+    pixels = values.view('<u4').reshape(-1).take(index.take(keys))
+
+    result = Image.frombuffer('RGBX', image.size, pixels, 'raw', 'RGBX', 0, 1)
+    result = result.convert('RGB')
+    if image.mode == 'RGBA':
+        result.putalpha(image.getchannel('A'))
+    return result
+
+
+# The histogram has a fixed cost of scanning all 24-bit colors,
+# so it pays off only for large images.
+_HISTOGRAM_MIN_PIXELS = 1 << 21
+_HISTOGRAM_SAMPLE_PIXELS = 1 << 14
+_HISTOGRAM_MAX_RATIO = 0.5
+
+
+def _few_colors(image):
+    """Estimates if the image has few distinct colors comparing to
+    the number of pixels using a sample of the pixels.
+    """
+    width, height = image.size
+    step = max(1, int((width * height / _HISTOGRAM_SAMPLE_PIXELS) ** 0.5))
+    sample = image.resize((max(1, width // step), max(1, height // step)),
+                          Image.NEAREST)
+    if sample.mode == 'RGBA':
+        sample = sample.convert('RGB')
+    max_colors = int(sample.width * sample.height * _HISTOGRAM_MAX_RATIO)
+    return sample.getcolors(max(1, max_colors)) is not None
+
+
+def apply_lut_to_image(image, lut, max_colors=256, histogram=None):
+    """Applies the lookup table to the image, the same as ``image.filter(lut)``,
+    but for palette images and images with few distinct colors only
+    the colors are transformed, not every pixel. The work depends on
+    the number of colors rather than on the number of pixels.
+
+    ``P`` images keep the mode, only the palette is transformed.
+    For ``RGB`` and ``RGBA`` images the distinct colors are counted first
+    and if there are not too many of them, the transformed colors
+    are placed to the pixels, this requires numpy.
+    Large images with more colors, but still repeated in many pixels,
+    like screenshots and illustrations, are processed in histogram mode:
+    the table is applied to every distinct color and the results are
+    scattered back to the pixels. Other images are filtered as usual.
+    Since the table is sampled with float precision, the values may
+    differ from ``image.filter(lut)`` by one.
+
+    :param image: Pillow image.
+    :param lut: Lookup table, ``ImageFilter.Color3DLUT`` object.
+                Only 3-channel tables which don't change the mode
+                are applied by colors.
+    :param max_colors: Max number of distinct colors of RGB and RGBA images
+                       which are transformed by colors, up to 256.
+                       Default is 256.
+    :param histogram: Use histogram mode for RGB and RGBA images.
+                      The default is None, which means the mode is chosen
+                      automatically for images larger than 2 megapixels
+                      when a sample of pixels has not more than 50%
+                      distinct colors. Requires numpy.
+    """
+    if not 0 <= max_colors <= 256:
+        raise ValueError("Max colors should be from 0 to 256")
+    by_colors = lut.channels == 3 and lut.mode in (None, image.mode)
+
+    if image.mode == 'P':
+        if by_colors and image.getpalette():
+            return _apply_to_palette(image, lut)
+        if 'transparency' in image.info:
+            image = image.convert('RGBA')
+        else:
+            image = image.convert('RGB')
+
+    elif by_colors and numpy and image.mode in ('RGB', 'RGBA'):
+        rgb = image if image.mode == 'RGB' else image.convert('RGB')
+        colors = rgb.getcolors(max_colors)
+        if colors is not None:
+            return _apply_to_colors(image, lut, [c for _, c in colors])
+
+        if histogram is None:
+            histogram = image.width * image.height >= _HISTOGRAM_MIN_PIXELS \
+                and _few_colors(image)
+        if histogram:
+            return _apply_histogram(image, lut)
+
+    return image.filter(lut)
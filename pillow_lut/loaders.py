@@ -1,6 +1,14 @@
+import os
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
 from itertools import chain
 
-from PIL import Image, ImageFilter, ImageMath
+from PIL import Image, ImageFilter
+
+from .lut1d import Color1DLUT
+from .operations import _resample_lut, fold_shaper_lut
+from .shared import SharedColor3DLUT, _attach
 
 
 try:
@@ -8,18 +16,77 @@ try:
 except ImportError:  # pragma: no cover
     numpy = None
 
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # pragma: no cover
+    shared_memory = None
+
+
+def _interp(x, xp, fp):
+    """Piecewise linear interpolation, the same as ``numpy.interp``."""
+    i = bisect_right(xp, x)
+    if i == 0:
+        return fp[0]
+    if i == len(xp):
+        return fp[-1]
+    return fp[i-1] + (fp[i] - fp[i-1]) * (x - xp[i-1]) / (xp[i] - xp[i-1])
+
+
+def _remap_lut(lut, remap, target_size, cls):
+    """Resamples the table to the new nodes.
+
+    :param remap: A function which takes the axis and the coordinate
+                  of the new node and returns the coordinate in the table.
+    """
+    size = cls._check_size(target_size or lut.size)
+    points = [
+        [remap(axis, x / (s - 1)) for x in range(s)]
+        for axis, s in enumerate(size)
+    ]
+    table = _resample_lut(lut, points, Image.BILINEAR)
+    return cls(size, table, channels=lut.channels,
+               target_mode=lut.mode, _copy_table=False)
+
+
+def _read_lines(lines):
+    """Reads file content and returns stripped lines without comments."""
+    if isinstance(lines, str):
+        with open(lines, 'rt') as file:
+            lines = file.readlines()
+    lines = [line.strip() for line in lines]
+    return [line for line in lines if line and not line.startswith('#')]
 
-def load_cube_file(lines, target_mode=None, cls=ImageFilter.Color3DLUT):
-    """Loads 3D lookup table from .cube file format.
+
+def _parse_values(tokens):
+    try:
+        if numpy:
+            return numpy.array(tokens, dtype=numpy.float32)
+        return [float(x) for x in tokens]
+    except ValueError:
+        raise ValueError("Not a number in the table")
+
+
+def load_cube_file(lines, target_mode=None, target_size=None,
+                   cls=ImageFilter.Color3DLUT):
+    """Loads 3D lookup table from .cube file format. Files with only
+    1D table are loaded as ``Color1DLUT`` objects. If a file contains
+    both 1D and 3D tables, the 1D table is used as a shaper
+    and is folded into the 3D table. 3D tables with the domain
+    other than from 0.0 to 1.0 are resampled to this range.
 
     :param lines: Filename or iterable list of strings with file content.
     :param target_mode: Image mode which should be after color transformation.
                         The default is None, which means mode doesn't change.
+    :param target_size: Size of the resulting table for files with a shaper
+                        or with a domain which should be resampled.
+                        By default, size of the 3D table will be used.
     :param cls: A class which handles the parsed file.
                 Default is ``ImageFilter.Color3DLUT``.
     """
-    name, size = None, None
+    name, size, size_1d = None, None, None
     channels = 3
+    domain_min, domain_max = (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)
+    domain_1d, domain_3d = None, None
     file = None
 
     if isinstance(lines, str):
@@ -38,10 +105,25 @@ def load_cube_file(lines, target_mode=None, cls=ImageFilter.Color3DLUT):
                 if len(size) == 1:
                     size = size[0]
                 continue
+            if line.startswith('LUT_1D_SIZE'):
+                size_1d = int(line.split()[1])
+                continue
+            if line.startswith('LUT_1D_INPUT_RANGE'):
+                low, high = [float(x) for x in line.split()[1:3]]
+                domain_1d = (low, low, low), (high, high, high)
+                continue
+            if line.startswith('LUT_3D_INPUT_RANGE'):
+                low, high = [float(x) for x in line.split()[1:3]]
+                domain_3d = (low, low, low), (high, high, high)
+                continue
+            if line.startswith('DOMAIN_MIN'):
+                domain_min = tuple(float(x) for x in line.split()[1:4])
+                continue
+            if line.startswith('DOMAIN_MAX'):
+                domain_max = tuple(float(x) for x in line.split()[1:4])
+                continue
             if line.startswith('CHANNELS'):
                 channels = int(line.split()[1])
-            if line.startswith('LUT_1D_SIZE'):
-                raise ValueError("1D LUT cube files aren't supported")
 
             try:
                 float(line.partition(' ')[0])
@@ -51,10 +133,11 @@ def load_cube_file(lines, target_mode=None, cls=ImageFilter.Color3DLUT):
                 # Data starts
                 break
 
-        if size is None:
+        if size is None and size_1d is None:
             raise ValueError('No size found in the file')
 
         table = []
+        items_1d = (size_1d or 0) * 3
         for i, line in enumerate(chain([line], iterator), i):
             line = line.strip()
             if not line or line.startswith('#'):
@@ -63,7 +146,7 @@ def load_cube_file(lines, target_mode=None, cls=ImageFilter.Color3DLUT):
                 pixel = [float(x) for x in line.split()]
             except ValueError:
                 raise ValueError("Not a number on line {}".format(i))
-            if len(pixel) != channels:
+            if len(pixel) != (3 if len(table) < items_1d else channels):
                 raise ValueError(
                     "Wrong number of colors on line {}".format(i))
             table.extend(pixel)
@@ -71,46 +154,331 @@ def load_cube_file(lines, target_mode=None, cls=ImageFilter.Color3DLUT):
         if file is not None:
             file.close()
 
+    if size_1d:
+        if domain_1d is None:
+            domain_1d = domain_min, domain_max
+        if domain_3d is None:
+            domain_3d = (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)
+    elif domain_3d is None:
+        domain_3d = domain_min, domain_max
+    low, high = domain_3d
+    if any(lo >= hi for lo, hi in zip(low, high)):
+        raise ValueError("Domain max should be greater than domain min")
+
+    if size_1d:
+        # Without 3D table all items belong to the shaper, so extra items
+        # are reported by Color1DLUT.
+        shaper_table = table[:items_1d] if size is not None else table
+        if domain_3d != ((0.0, 0.0, 0.0), (1.0, 1.0, 1.0)):
+            # Output of the shaper is the input of the 3D table,
+            # so it is normalized to the domain of the 3D table.
+            shaper_table = [
+                (v - low[i % 3]) / (high[i % 3] - low[i % 3])
+                for i, v in enumerate(shaper_table)
+            ]
+        shaper = Color1DLUT(size_1d, shaper_table, *domain_1d,
+                            _copy_table=False)
+        if size is None:
+            if name is not None:
+                shaper.name = name
+            return shaper
+        table = table[items_1d:]
+
     instance = cls(size, table, channels=channels,
                    target_mode=target_mode, _copy_table=False)
+    if size_1d:
+        instance = fold_shaper_lut(shaper, instance, target_size, cls=cls)
+    elif domain_3d != ((0.0, 0.0, 0.0), (1.0, 1.0, 1.0)):
+        # The values outside of the domain are clamped.
+        instance = _remap_lut(instance, lambda axis, x: min(1.0, max(
+            0.0, (x - low[axis]) / (high[axis] - low[axis]))), target_size, cls)
     if name is not None:
         instance.name = name
     return instance
 
 
+def _likely_bit_depth(value):
+    for depth in (10, 12, 16):
+        if value < (1 << depth):
+            return depth
+    raise ValueError("Values of the table are too big")
+
+
+def load_3dl_file(lines, target_mode=None, target_size=None,
+                  cls=ImageFilter.Color3DLUT):
+    """Loads 3D lookup table from .3dl file format (Autodesk Lustre
+    and Flame). Integer values are normalized using the output
+    bit depth from ``Mesh`` keyword or the depth which is guessed
+    from the max value: 10, 12 or 16 bits. Tables with nonuniform
+    input mesh are resampled to uniform nodes.
+
+    :param lines: Filename or iterable list of strings with file content.
+    :param target_mode: Image mode which should be after color transformation.
+                        The default is None, which means mode doesn't change.
+    :param target_size: Size of the resulting table for files
+                        with nonuniform input mesh.
+                        By default, size of the input mesh will be used.
+    :param cls: A class which handles the parsed file.
+                Default is ``ImageFilter.Color3DLUT``.
+    """
+    mesh, output_depth = None, None
+    data = []
+    for line in _read_lines(lines):
+        if line.startswith('Mesh'):
+            output_depth = int(line.split()[2])
+            continue
+        if not line.split()[0].isdigit():
+            # 3DMESH, LUT8, gamma and other keywords
+            continue
+        if mesh is None:
+            mesh = [int(x) for x in line.split()]
+        else:
+            data.append(line)
+
+    if mesh is None:
+        raise ValueError("No input mesh found in the file")
+    size = cls._check_size(len(mesh))[0]
+
+    tokens = ' '.join(data).split()
+    if len(tokens) != size**3 * 3:
+        raise ValueError("The table should have {} items. Actual: {}".format(
+            size**3 * 3, len(tokens)))
+    table = _parse_values(tokens)
+    if output_depth is None:
+        output_depth = _likely_bit_depth(table.max() if numpy else max(table))
+    scale = 1.0 / ((1 << output_depth) - 1)
+
+    # Blue changes fastest in the file, red should change fastest in the table.
+    if numpy:
+        table = table.reshape(size, size, size, 3).transpose(2, 1, 0, 3) * scale
+        table = table.reshape(table.size)
+    else:
+        table = [
+            table[((r * size + g) * size + b) * 3 + i] * scale
+            for b in range(size)
+            for g in range(size)
+            for r in range(size)
+            for i in range(3)
+        ]
+
+    instance = cls(size, table, target_mode=target_mode, _copy_table=False)
+
+    input_max = (1 << _likely_bit_depth(mesh[-1])) - 1
+    if any(abs(x - i * input_max / (size - 1)) > 1 for i, x in enumerate(mesh)):
+        nodes = [i / (size - 1) for i in range(size)]
+        instance = _remap_lut(
+            instance, lambda axis, x: _interp(x * input_max, mesh, nodes),
+            target_size, cls)
+    return instance
+
+
+def load_csp_file(lines, target_mode=None, target_size=None,
+                  cls=ImageFilter.Color3DLUT):
+    """Loads 3D lookup table from .csp file format (Cinespace).
+    Prelut curves are folded into the resulting table.
+
+    :param lines: Filename or iterable list of strings with file content.
+    :param target_mode: Image mode which should be after color transformation.
+                        The default is None, which means mode doesn't change.
+    :param target_size: Size of the resulting table for files
+                        with non-identity prelut curves.
+                        By default, size of the 3D table will be used.
+    :param cls: A class which handles the parsed file.
+                Default is ``ImageFilter.Color3DLUT``.
+    """
+    lines = _read_lines(lines)
+    if not lines or not lines[0].startswith('CSPLUTV100'):
+        raise ValueError("Not a CSP file")
+    if len(lines) < 2 or lines[1] != '3D':
+        raise ValueError("Only 3D CSP files are supported")
+
+    tokens = []
+    metadata = False
+    for line in lines[2:]:
+        if line.startswith('BEGIN METADATA'):
+            metadata = True
+        elif line.startswith('END METADATA'):
+            metadata = False
+        elif not metadata:
+            tokens.extend(line.split())
+
+    try:
+        preluts, pos = [], 0
+        for _ in range(3):
+            count = int(tokens[pos])
+            points = [float(x) for x in tokens[pos + 1:pos + 1 + count * 2]]
+            preluts.append((points[:count], points[count:]))
+            pos += 1 + count * 2
+        size = [int(x) for x in tokens[pos:pos + 3]]
+        pos += 3
+    except (ValueError, IndexError):
+        raise ValueError("Wrong prelut format")
+
+    size1D, size2D, size3D = cls._check_size(size)
+    tokens = tokens[pos:]
+    if len(tokens) != size1D * size2D * size3D * 3:
+        raise ValueError("The table should have {} items. Actual: {}".format(
+            size1D * size2D * size3D * 3, len(tokens)))
+    table = _parse_values(tokens)
+
+    instance = cls(size, table, target_mode=target_mode, _copy_table=False)
+
+    if any(ins != [0.0, 1.0] or outs != [0.0, 1.0] for ins, outs in preluts):
+        instance = _remap_lut(
+            instance, lambda axis, x: _interp(x, *preluts[axis]),
+            target_size, cls)
+    return instance
+
+
 def load_hald_image(image, target_mode=None, cls=ImageFilter.Color3DLUT):
     """Loads 3D lookup table from Hald image (normally .png or .tiff files).
 
-    :param image: Pillow RGB image or path to the file.
+    :param image: Pillow RGB image, path to the file or numpy array
+                  with ``(height, width, channels)`` shape. Since Pillow
+                  has no 16-bit or float multichannel modes, arrays
+                  should be used for high precision images. Values
+                  of unsigned integer arrays are normalized by the max
+                  value of the type, float arrays are used as is.
     :param target_mode: Image mode which should be after color transformation.
                         The default is None, which means mode doesn't change.
     :param cls: A class which handles the parsed file.
                 Default is ``ImageFilter.Color3DLUT``.
     """
-    if not isinstance(image, Image.Image):
-        image = Image.open(image)
+    if numpy and isinstance(image, numpy.ndarray):
+        if image.ndim != 3:
+            raise ValueError("Hald array should have 3 dimensions")
+        height, width, channels = image.shape
+    else:
+        if not isinstance(image, Image.Image):
+            image = Image.open(image)
+        width, height = image.size
+        channels = len(image.getbands())
 
-    if image.size[0] != image.size[1]:
+    if width != height:
         raise ValueError("Hald image should be a square")
 
-    channels = len(image.getbands())
-
     for i in range(2, 9):
-        if image.size[0] == i**3:
+        if width == i**3:
             size = i**2
             break
     else:
         raise ValueError("Can't detect hald size")
 
     if numpy:
-        table = numpy.array(image).reshape(size**3 * channels)
-        table = table.astype(numpy.float32) / 255.0
+        table = numpy.asarray(image)
+        if table.dtype.kind == 'u':
+            table = numpy.divide(table, numpy.iinfo(table.dtype).max,
+                                 dtype=numpy.float32)
+        elif table.dtype.kind == 'f':
+            table = table.astype(numpy.float32, copy=False)
+        else:
+            raise ValueError("Unsupported data type {}".format(table.dtype))
+        table = table.reshape(size**3 * channels)
     else:
-        table = []
-        for color in zip(*[
-            ImageMath.eval("a/255.0", a=im.convert('F')).im
-            for im in image.split()
-        ]):
-            table.extend(color)
+        table = [x / 255.0 for x in image.tobytes()]
+
+    return cls(size, table, channels=channels,
+               target_mode=target_mode, _copy_table=False)
+
 
-    return cls(size, table, target_mode=target_mode, _copy_table=False)
+_LOADERS = {
+    '.cube': load_cube_file,
+    '.3dl': load_3dl_file,
+    '.csp': load_csp_file,
+    '.png': load_hald_image,
+    '.tif': load_hald_image,
+    '.tiff': load_hald_image,
+}
+
+
+def _load_lut_file(path, target_mode=None, cls=ImageFilter.Color3DLUT):
+    """Loads the table choosing the loader by the file extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in _LOADERS:
+        raise ValueError("Unknown file extension: {}".format(ext))
+    return _LOADERS[ext](path, target_mode=target_mode, cls=cls)
+
+
+def _find_lut_files(path, pattern):
+    """Finds files with known extensions in the directory and returns
+    two dicts: table names to file names and names of several files
+    with the same name without extension to the lists of these files.
+    """
+    found = {}
+    for filename in sorted(glob(os.path.join(path, pattern))):
+        name, ext = os.path.splitext(os.path.basename(filename))
+        if ext.lower() in _LOADERS:
+            found.setdefault(name, []).append(filename)
+    files = {name: found[name][0] for name in found if len(found[name]) == 1}
+    duplicates = {name: found[name] for name in found if len(found[name]) > 1}
+    return files, duplicates
+
+
+def _duplicate_error(filenames):
+    return ValueError("Several files have the same name: {}".format(
+        ", ".join(os.path.basename(filename) for filename in filenames)))
+
+
+def _load_in_worker(path, target_mode, cls):
+    """Runs in the worker process. Tables in shared memory are handed
+    over to the parent, so only the name of the block is sent back.
+    Other tables are pickled.
+    """
+    lut = _load_lut_file(path, target_mode, cls)
+    if isinstance(lut, SharedColor3DLUT):
+        return lut._hand_over()
+    return lut
+
+
+def _load_from_worker(result):
+    if isinstance(result, tuple):
+        return _attach(*result, owner=True)
+    return result
+
+
+def load_lut_directory(path, pattern='*', workers=None, target_mode=None,
+                       cls=ImageFilter.Color3DLUT):
+    """Loads all lookup tables from the directory in parallel processes.
+    The loader is chosen by the file extension: ``.cube``, ``.3dl``,
+    ``.csp`` files and ``.png``, ``.tif``, ``.tiff`` Hald images
+    are supported. Files with other extensions are skipped.
+
+    The tables are pickled to pass them from the worker processes.
+    With :py:class:`SharedColor3DLUT` as ``cls`` the workers create
+    the tables in shared memory and only the names of the blocks are
+    passed, the returned tables own the blocks.
+
+    :param path: The directory with the files.
+    :param pattern: Glob pattern of the file names. Default is ``'*'``.
+    :param workers: The number of processes. The default is None,
+                    which means the number of processors.
+    :param target_mode: Image mode which should be after color transformation.
+                        The default is None, which means mode doesn't change.
+    :param cls: A class which handles the parsed files.
+                Default is ``ImageFilter.Color3DLUT``.
+    :return: A tuple of two dicts. The first maps file names without
+             extensions to the loaded tables, the second maps names
+             of the files which can't be loaded to the exceptions.
+             Files with the same name and different extensions
+             are not loaded and are reported as errors.
+    """
+    files, duplicates = _find_lut_files(path, pattern)
+    if shared_memory and issubclass(cls, SharedColor3DLUT):
+        # Start the tracker in the parent, so all workers share it
+        # and blocks unlinked by the parent are not reported as leaked.
+        resource_tracker.ensure_running()
+
+    luts = {}
+    errors = {name: _duplicate_error(duplicates[name]) for name in duplicates}
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [
+            (name, executor.submit(_load_in_worker, files[name],
+                                   target_mode, cls))
+            for name in sorted(files)
+        ]
+        for name, future in futures:
+            try:
+                luts[name] = _load_from_worker(future.result())
+            except Exception as e:
+                errors[name] = e
+    return luts, errors
@@ -0,0 +1,106 @@
+from PIL import ImageFilter
+
+from .operations import _sample_lut_1d, _sample_lut_1d_numpy
+
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+class Color1DLUT(ImageFilter.MultibandFilter):
+    """One-dimensional color lookup table. Transforms every channel
+    of the image independently, using linear interpolation between
+    the nearest elements. The input values outside of the domain
+    are clamped.
+
+    :param size: Size of the table. From 2 to 65536.
+    :param table: Flat lookup table. A list of ``3 * size`` float elements
+                  or a list of ``size`` 3-element tuples with floats.
+                  Channels are changed first.
+    :param domain_min: Input values for the first elements of the table.
+                       Three floats, default is ``(0.0, 0.0, 0.0)``.
+    :param domain_max: Input values for the last elements of the table.
+                       Three floats, default is ``(1.0, 1.0, 1.0)``.
+    """
+    name = "Color 1D LUT"
+    channels = 3
+
+    def __init__(self, size, table, domain_min=(0.0, 0.0, 0.0),
+                 domain_max=(1.0, 1.0, 1.0), **kwargs):
+        self.size = size = self._check_size(size)
+        self.domain_min = tuple(float(x) for x in domain_min)
+        self.domain_max = tuple(float(x) for x in domain_max)
+        if any(low >= high for low, high in zip(self.domain_min, self.domain_max)):
+            raise ValueError("Domain max should be greater than domain min")
+
+        # Hidden flag `_copy_table=False` could be used to avoid extra copying
+        # of the table if the table is specially made for the constructor.
+        copy_table = kwargs.get('_copy_table', True)
+        wrong_size = False
+
+        if numpy and isinstance(table, numpy.ndarray):
+            if copy_table:
+                table = table.copy()
+
+            if table.shape in [(size * 3,), (size, 3)]:
+                table = table.reshape(size * 3)
+            else:
+                wrong_size = True
+
+        else:
+            if copy_table:
+                table = list(table)
+
+            # Convert to a flat list
+            if table and isinstance(table[0], (list, tuple)):
+                table, raw_table = [], table
+                for pixel in raw_table:
+                    if len(pixel) != 3:
+                        raise ValueError(
+                            "The elements of the table should have a length of 3.")
+                    table.extend(pixel)
+
+        if wrong_size or len(table) != size * 3:
+            raise ValueError(
+                "The table should have either 3 * size float items "
+                "or size items of 3-element tuples with floats. "
+                "Table should be: 3x{}. Actual length: {}".format(
+                    size, len(table)))
+        self.table = table
+
+    @staticmethod
+    def _check_size(size):
+        size = int(size)
+        if not 2 <= size <= 65536:
+            raise ValueError("Size should be in [2, 65536] range.")
+        return size
+
+    def __repr__(self):
+        return "<{} from {} size={:d}>".format(
+            self.__class__.__name__, self.table.__class__.__name__, self.size)
+
+    def filter(self, image):
+        if image.bands not in (3, 4):
+            raise ValueError("Only 3 or 4 band images are supported")
+
+        points = [x / 255.0 for x in range(256)]
+        if numpy:
+            points = numpy.array(points, dtype=numpy.float32)
+            lut = numpy.concatenate([
+                _sample_lut_1d_numpy(self, points, channel)
+                for channel in range(3)
+            ])
+            lut = (lut * 255.0 + 0.5).clip(0, 255).astype(numpy.int32).tolist()
+        else:
+            lut = [
+                max(0, min(255, int(_sample_lut_1d(self, point, channel)
+                                    * 255.0 + 0.5)))
+                for channel in range(3)
+                for point in points
+            ]
+        if image.bands == 4:
+            lut.extend(range(256))
+
+        return image.point(lut, None)
@@ -1,7 +1,12 @@
+import hashlib
+import math
+import struct
 import warnings
 
 from PIL import Image, ImageFilter
 
+from .colorspace import _MODES
+
 
 try:
     import numpy
@@ -9,22 +14,104 @@ except ImportError:  # pragma: no cover
     numpy = None
 
 
+def _check_dtype(dtype):
+    """Returns numpy type for calculations. The default is float32.
+    Without numpy calculations are always performed with Python floats.
+    """
+    if not numpy:
+        if dtype not in (None, 'float32', 'float64', float):
+            raise ValueError("Only float32 and float64 dtypes are supported")
+        return None
+    if dtype is None:
+        return numpy.float32
+    try:
+        dtype = numpy.dtype(dtype).type
+    except TypeError:
+        dtype = None
+    if dtype not in (numpy.float32, numpy.float64):
+        raise ValueError("Only float32 and float64 dtypes are supported")
+    return dtype
+
+
+def _plain_lut(lut):
+    """Returns ``ImageFilter.Color3DLUT`` with the same table.
+    Compact and shared tables are converted on every access of
+    the ``table`` attribute, so the code which reads the table many
+    times should use the result, which converts it only once.
+    """
+    return ImageFilter.Color3DLUT(lut.size, lut.table, lut.channels,
+                                  lut.mode, _copy_table=False)
+
+
+def _store_table(lut, table):
+    """Stores the table modified in place back to the lookup table.
+    Compact tables return a new array on every access, so the changes
+    would be lost otherwise.
+    """
+    lut.table = table
+
+
+class _PlainTableMixin:
+    """For ``Color3DLUT`` subclasses which convert the table on every
+    access. The base ``transform`` reads the table for every node.
+    """
+    def transform(self, *args, **kwargs):
+        lut = _plain_lut(self).transform(*args, **kwargs)
+        return type(self)(lut.size, lut.table, lut.channels, lut.mode,
+                          _copy_table=False)
+
+
 def _inter_linear(d, v0, v1):
     return v0 + (v1 - v0) * d
 
 
-def _inter_linear_table(d, c, table, i0, i1):
+def _inter_trilinear(table, i00, i10, i01, i11, c, d1, d2, d3):
+    """Interpolates one channel between eight nodes of the table.
+
+    :param i00, i10, i01, i11: Indexes of four nodes with the lowest
+                               first coordinate. Their neighbours
+                               in the first dimension are ``c`` further.
+    """
+    a = table[i00]
+    v00 = a + (table[i00 + c] - a) * d1
+    a = table[i10]
+    v10 = a + (table[i10 + c] - a) * d1
+    a = table[i01]
+    v01 = a + (table[i01 + c] - a) * d1
+    a = table[i11]
+    v11 = a + (table[i11 + c] - a) * d1
+    v0 = v00 + (v10 - v00) * d2
+    v1 = v01 + (v11 - v01) * d2
+    return v0 + (v1 - v0) * d3
+
+
+def _sample_linear_native(table, c, s1Dc, s12Dc, i00, d1, d2, d3):
+    """Linear interpolation with unrolled loop for 3 and 4 channels."""
+    i10 = i00 + s1Dc
+    i01 = i00 + s12Dc
+    i11 = i01 + s1Dc
+    if c == 3:
+        return [
+            _inter_trilinear(table, i00, i10, i01, i11, 3, d1, d2, d3),
+            _inter_trilinear(table, i00+1, i10+1, i01+1, i11+1, 3, d1, d2, d3),
+            _inter_trilinear(table, i00+2, i10+2, i01+2, i11+2, 3, d1, d2, d3),
+        ]
     return [
-        _inter_linear(d, table[i0+i], table[i1+i])
-        for i in range(c)
+        _inter_trilinear(table, i00, i10, i01, i11, 4, d1, d2, d3),
+        _inter_trilinear(table, i00+1, i10+1, i01+1, i11+1, 4, d1, d2, d3),
+        _inter_trilinear(table, i00+2, i10+2, i01+2, i11+2, 4, d1, d2, d3),
+        _inter_trilinear(table, i00+3, i10+3, i01+3, i11+3, 4, d1, d2, d3),
     ]
 
 
-def _inter_linear_vector(d, c, v0, v1):
-    return [
-        _inter_linear(d, v0[i], v1[i])
-        for i in range(c)
-    ]
+def _filter_cubic_1l(x):
+    a = -0.5
+    return ((a + 2.0) * x - (a + 3.0)) * x*x + 1
+
+
+def _filter_cubic_2l(x):
+    a = -0.5
+    return (((x - 5) * x + 8) * x - 4) * a
 
 
 def _inter_cubic_inner(d, v0, v1, v2, v3):
@@ -32,18 +119,10 @@ def _inter_cubic_inner(d, v0, v1, v2, v3):
     :param d: Distance from v1 to the side of v2, from 0.0 to 1.0
     """
     # https://en.wikipedia.org/wiki/Bicubic_interpolation#Bicubic_convolution_algorithm
-    def filter_1l(x):
-        a = -0.5
-        return ((a + 2.0) * x - (a + 3.0)) * x*x + 1
-
-    def filter_2l(x):
-        a = -0.5
-        return (((x - 5) * x + 8) * x - 4) * a
-
-    return (v0 * filter_2l(1+d) +
-            v1 * filter_1l(0+d) +
-            v2 * filter_1l(1-d) +
-            v3 * filter_2l(2-d))
+    return (v0 * _filter_cubic_2l(1+d) +
+            v1 * _filter_cubic_1l(0+d) +
+            v2 * _filter_cubic_1l(1-d) +
+            v3 * _filter_cubic_2l(2-d))
 
 
 def _inter_cubic(d, v0, v1, v2, v3):
@@ -58,6 +137,28 @@ def _inter_cubic(d, v0, v1, v2, v3):
     return _inter_cubic_inner(d, v0, v1, v2, v3)
 
 
+def _cubic_weights(d):
+    """Returns weights of four nodes for the same interpolation
+    as ``_inter_cubic`` does, including extrapolation on the edges.
+    """
+    if d < 0:
+        if d < -1.0:
+            return -d, d + 1.0, 0.0, 0.0
+        d += 1.0
+        w0, w1 = _filter_cubic_2l(1+d), _filter_cubic_1l(0+d)
+        w2, w3 = _filter_cubic_1l(1-d), _filter_cubic_2l(2-d)
+        return w0 * 2 + w1, w2 - w0, w3, 0.0
+    if d >= 1.0:
+        if d >= 2.0:
+            return 0.0, 0.0, 2.0 - d, d - 1.0
+        d -= 1.0
+        w0, w1 = _filter_cubic_2l(1+d), _filter_cubic_1l(0+d)
+        w2, w3 = _filter_cubic_1l(1-d), _filter_cubic_2l(2-d)
+        return 0.0, w0, w1 - w3, w2 + w3 * 2
+    return (_filter_cubic_2l(1+d), _filter_cubic_1l(0+d),
+            _filter_cubic_1l(1-d), _filter_cubic_2l(2-d))
+
+
 def _inter_cubic_table(d, c, table, i0, i1, i2, i3):
     return [
         _inter_cubic(d, table[i0+i], table[i1+i], table[i2+i], table[i3+i])
@@ -104,12 +205,12 @@ def _points_shift_numpy(size, points, left, right):
     return idx, shift1D, shift2D, shift3D
 
 
-def _sample_lut_linear_numpy(lut, points):
+def _sample_lut_linear_numpy(lut, points, dtype=None):
     s1D, s2D, s3D = lut.size
     s12D = s1D * s2D
 
     idx, shift1D, shift2D, shift3D = _points_shift_numpy(lut.size, points, 0, 1)
-    table = numpy.asarray(lut.table, dtype=numpy.float32)
+    table = numpy.asarray(lut.table, dtype=dtype or numpy.float32)
     table = table.reshape(s1D * s2D * s3D, lut.channels)
 
     return _inter_linear(
@@ -130,6 +231,59 @@ def _sample_lut_linear_numpy(lut, points):
     )
 
 
+def _sample_lut_linear_jacobian_numpy(lut, points, dtype=None):
+    """Returns values of the 3-channel table in given points
+    and partial derivatives of the values by every coordinate.
+    """
+    s1D, s2D, s3D = lut.size
+    s12D = s1D * s2D
+
+    idx, shift1D, shift2D, shift3D = _points_shift_numpy(lut.size, points, 0, 1)
+    table = numpy.asarray(lut.table, dtype=dtype or numpy.float32)
+    table = table.reshape(s1D * s2D * s3D, lut.channels)
+
+    c000, c100 = table[idx + 0], table[idx + 1]
+    c010, c110 = table[idx + s1D + 0], table[idx + s1D + 1]
+    c001, c101 = table[idx + s12D + 0], table[idx + s12D + 1]
+    c011, c111 = table[idx + s12D + s1D + 0], table[idx + s12D + s1D + 1]
+
+    v00 = _inter_linear(shift1D, c000, c100)
+    v10 = _inter_linear(shift1D, c010, c110)
+    v01 = _inter_linear(shift1D, c001, c101)
+    v11 = _inter_linear(shift1D, c011, c111)
+    v0 = _inter_linear(shift2D, v00, v10)
+    v1 = _inter_linear(shift2D, v01, v11)
+
+    d1D = _inter_linear(
+        shift3D,
+        _inter_linear(shift2D, c100 - c000, c110 - c010),
+        _inter_linear(shift2D, c101 - c001, c111 - c011),
+    ) * (s1D - 1)
+    d2D = _inter_linear(shift3D, v10 - v00, v11 - v01) * (s2D - 1)
+    d3D = (v1 - v0) * (s3D - 1)
+
+    return _inter_linear(shift3D, v0, v1), numpy.stack((d1D, d2D, d3D), axis=-1)
+
+
+def _solve_jacobian_numpy(jacobian, residual):
+    """Solves linear systems with 3x3 matrices using Cramer's rule.
+    For singular matrices the residual itself is returned.
+    """
+    u, v, w = jacobian[:, :, 0], jacobian[:, :, 1], jacobian[:, :, 2]
+    vw = numpy.cross(v, w)
+    det = (u * vw).sum(axis=1)
+    singular = numpy.abs(det) < 1e-6
+    det[singular] = 1.0
+
+    step = numpy.stack((
+        (residual * vw).sum(axis=1),
+        (u * numpy.cross(residual, w)).sum(axis=1),
+        (u * numpy.cross(v, residual)).sum(axis=1),
+    ), axis=-1) / det.reshape(det.shape[0], 1)
+    step[singular] = residual[singular]
+    return step
+
+
 def sample_lut_linear(lut, point):
     """Computes the new point value from given 3D lookup table
     using linear interpolation.
@@ -140,27 +294,175 @@ def sample_lut_linear(lut, point):
     """
     size1D, size2D, size3D = lut.size
     c = lut.channels
-    s1Dc = size1D * c
-    s12Dc = size1D * size2D * c
+
+    index1D = point[0] * (size1D - 1)
+    index2D = point[1] * (size2D - 1)
+    index3D = point[2] * (size3D - 1)
+    idx1D = max(0, min(size1D - 2, int(index1D)))
+    idx2D = max(0, min(size2D - 2, int(index2D)))
+    idx3D = max(0, min(size3D - 2, int(index3D)))
+    idx = (idx1D + idx2D * size1D + idx3D * size1D * size2D) * c
+
+    return _sample_linear_native(
+        lut.table, c, size1D * c, size1D * size2D * c, idx,
+        index1D - idx1D, index2D - idx2D, index3D - idx3D)
+
+
+def _sample_lut_linear_jacobian(lut, point):
+    """Returns the value of the 3-channel table in the given point
+    and partial derivatives of the value by every coordinate.
+    """
+    size1D, size2D, size3D = lut.size
+    s1Dc = size1D * 3
+    s12Dc = size1D * size2D * 3
 
     idx, shift1D, shift2D, shift3D = _point_shift(lut.size, point, 0, 1)
-    idx *= c
+    idx *= 3
+
+    table = lut.table
+    value, d1D, d2D, d3D = [], [], [], []
+    for i in range(idx, idx + 3):
+        c000, c100 = table[i], table[i + 3]
+        c010, c110 = table[i + s1Dc], table[i + s1Dc + 3]
+        c001, c101 = table[i + s12Dc], table[i + s12Dc + 3]
+        c011, c111 = table[i + s12Dc + s1Dc], table[i + s12Dc + s1Dc + 3]
+
+        v00 = _inter_linear(shift1D, c000, c100)
+        v10 = _inter_linear(shift1D, c010, c110)
+        v01 = _inter_linear(shift1D, c001, c101)
+        v11 = _inter_linear(shift1D, c011, c111)
+        v0 = _inter_linear(shift2D, v00, v10)
+        v1 = _inter_linear(shift2D, v01, v11)
+
+        value.append(_inter_linear(shift3D, v0, v1))
+        d1D.append(_inter_linear(
+            shift3D,
+            _inter_linear(shift2D, c100 - c000, c110 - c010),
+            _inter_linear(shift2D, c101 - c001, c111 - c011),
+        ) * (size1D - 1))
+        d2D.append(_inter_linear(shift3D, v10 - v00, v11 - v01) * (size2D - 1))
+        d3D.append((v1 - v0) * (size3D - 1))
+
+    return value, (d1D, d2D, d3D)
+
+
+def _det3(u, v, w):
+    return (u[0] * (v[1] * w[2] - v[2] * w[1]) -
+            u[1] * (v[0] * w[2] - v[2] * w[0]) +
+            u[2] * (v[0] * w[1] - v[1] * w[0]))
+
+
+def _solve_jacobian(jacobian, residual):
+    u, v, w = jacobian
+    det = _det3(u, v, w)
+    if abs(det) < 1e-6:
+        return residual
+    return (_det3(residual, v, w) / det,
+            _det3(u, residual, w) / det,
+            _det3(u, v, residual) / det)
+
+
+def _sample_lut_1d(lut, point, channel):
+    """Computes the value of one channel of 1D lookup table
+    using linear interpolation. The point is clamped to the domain.
+    """
+    low, high = lut.domain_min[channel], lut.domain_max[channel]
+    index = (point - low) / (high - low) * (lut.size - 1)
+    idx = max(0, min(lut.size - 2, int(index)))
+    shift = max(0.0, min(1.0, index - idx))
+    idx = idx * 3 + channel
+    return _inter_linear(shift, lut.table[idx], lut.table[idx + 3])
 
-    return _inter_linear_vector(
-        shift3D, c,
-        _inter_linear_vector(
-            shift2D, c,
-            _inter_linear_table(shift1D, c, lut.table, idx + 0, idx + c),
-            _inter_linear_table(shift1D, c, lut.table, idx + s1Dc + 0, idx + s1Dc + c),
-        ),
-        _inter_linear_vector(
-            shift2D, c,
-            _inter_linear_table(shift1D, c, lut.table,
-                                idx + s12Dc + 0, idx + s12Dc + c),
-            _inter_linear_table(shift1D, c, lut.table,
-                                idx + s12Dc + s1Dc + 0, idx + s12Dc + s1Dc + c),
-        ),
-    )
+
+def _sample_lut_1d_numpy(lut, points, channel, dtype=None):
+    dtype = dtype or numpy.float32
+    nodes = numpy.linspace(lut.domain_min[channel], lut.domain_max[channel],
+                           lut.size)
+    table = numpy.asarray(lut.table, dtype=dtype)[channel::3]
+    return numpy.interp(points, nodes, table).astype(dtype)
+
+
+def _axis_taps(size, points, interp):
+    """Returns the index of the first node and weights of the nodes
+    which are used for interpolation along one axis in the given points.
+    """
+    taps = []
+    for point in points:
+        index = point * (size - 1)
+        if interp == Image.BILINEAR:
+            idx = max(0, min(size - 2, int(index)))
+            shift = index - idx
+            taps.append((idx, (1.0 - shift, shift)))
+        else:
+            idx = max(1, min(size - 3, int(index)))
+            taps.append((idx - 1, _cubic_weights(index - idx)))
+    return taps
+
+
+def _resample_axis_native(table, outer, size, inner, taps):
+    """Interpolates the flat table of ``outer * size * inner`` elements
+    along the middle dimension.
+    """
+    result = []
+    for base in range(0, outer * size * inner, size * inner):
+        for idx, weights in taps:
+            start = base + idx * inner
+            rows = [table[start + i * inner:start + (i + 1) * inner]
+                    for i in range(len(weights))]
+            if len(weights) == 2:
+                w0, w1 = weights
+                result.extend([v0 * w0 + v1 * w1
+                               for v0, v1 in zip(*rows)])
+            else:
+                w0, w1, w2, w3 = weights
+                result.extend([v0 * w0 + v1 * w1 + v2 * w2 + v3 * w3
+                               for v0, v1, v2, v3 in zip(*rows)])
+    return result
+
+
+def _resample_axis_numpy(table, size, taps):
+    """Interpolates the table with shape ``(outer, size, inner)``
+    along the middle dimension.
+    """
+    weights = numpy.zeros((len(taps), size), dtype=table.dtype)
+    for i, (idx, tap_weights) in enumerate(taps):
+        weights[i, idx:idx + len(tap_weights)] = tap_weights
+    return numpy.matmul(weights, table)
+
+
+def _resample_lut(source, points, interp, dtype=None):
+    """Samples the table in the nodes of the regular grid.
+    The grid is given by its coordinates on every axis.
+    Since the grid is aligned with the axes, the interpolation
+    is separable and is performed by one pass along every axis.
+
+    :param points: Three sequences of the coordinates on the axes,
+                   normalized from 0.0 to 1.0.
+    :param dtype: numpy type for calculations, float32 by default.
+    """
+    size1D, size2D, size3D = source.size
+    points1D, points2D, points3D = points
+    taps1D = _axis_taps(size1D, points1D, interp)
+    taps2D = _axis_taps(size2D, points2D, interp)
+    taps3D = _axis_taps(size3D, points3D, interp)
+    c = source.channels
+
+    if numpy:
+        table = numpy.asarray(source.table, dtype=dtype or numpy.float32)
+        table = table.reshape(size3D * size2D, size1D, c)
+        table = _resample_axis_numpy(table, size1D, taps1D)
+        table = table.reshape(size3D, size2D, len(points1D) * c)
+        table = _resample_axis_numpy(table, size2D, taps2D)
+        table = table.reshape(1, size3D, len(points2D) * len(points1D) * c)
+        table = _resample_axis_numpy(table, size3D, taps3D)
+        return table.reshape(table.size)
+
+    table = _resample_axis_native(
+        source.table, size3D * size2D, size1D, c, taps1D)
+    table = _resample_axis_native(
+        table, size3D, size2D, len(points1D) * c, taps2D)
+    return _resample_axis_native(
+        table, 1, size3D, len(points2D) * len(points1D) * c, taps3D)
 
 
 def sample_lut_cubic(lut, point):
@@ -185,75 +487,76 @@ def sample_lut_cubic(lut, point):
 
     idx, shift1D, shift2D, shift3D = _point_shift(lut.size, point, 1, 2)
     idx *= c
+    table = lut.table
 
     return _inter_cubic_vector(
         shift3D, c,
         _inter_cubic_vector(
             shift2D, c,
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx-s12Dc-s1Dc-c, idx-s12Dc-s1Dc+0,
                 idx-s12Dc-s1Dc+c, idx-s12Dc-s1Dc+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx-s12Dc-c, idx-s12Dc+0, idx-s12Dc+c, idx-s12Dc+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx-s12Dc+s1Dc-c, idx-s12Dc+s1Dc+0,
                 idx-s12Dc+s1Dc+c, idx-s12Dc+s1Dc+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx-s12Dc+s1Dc2-c, idx-s12Dc+s1Dc2+0,
                 idx-s12Dc+s1Dc2+c, idx-s12Dc+s1Dc2+c2),
         ),
         _inter_cubic_vector(
             shift2D, c,
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx-s1Dc-c, idx-s1Dc+0, idx-s1Dc+c, idx-s1Dc+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx-c, idx+0, idx+c, idx+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx+s1Dc-c, idx+s1Dc+0, idx+s1Dc+c, idx+s1Dc+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx+s1Dc2-c, idx+s1Dc2+0, idx+s1Dc2+c, idx+s1Dc2+c2),
         ),
         _inter_cubic_vector(
             shift2D, c,
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx+s12Dc-s1Dc-c, idx+s12Dc-s1Dc+0,
                 idx+s12Dc-s1Dc+c, idx+s12Dc-s1Dc+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx+s12Dc-c, idx+s12Dc+0, idx+s12Dc+c, idx+s12Dc+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx+s12Dc+s1Dc-c, idx+s12Dc+s1Dc+0,
                 idx+s12Dc+s1Dc+c, idx+s12Dc+s1Dc+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx+s12Dc+s1Dc2-c, idx+s12Dc+s1Dc2+0,
                 idx+s12Dc+s1Dc2+c, idx+s12Dc+s1Dc2+c2),
         ),
         _inter_cubic_vector(
             shift2D, c,
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx+s12Dc2-s1Dc-c, idx+s12Dc2-s1Dc+0,
                 idx+s12Dc2-s1Dc+c, idx+s12Dc2-s1Dc+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx+s12Dc2-c, idx+s12Dc2+0, idx+s12Dc2+c, idx+s12Dc2+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx+s12Dc2+s1Dc-c, idx+s12Dc2+s1Dc+0,
                 idx+s12Dc2+s1Dc+c, idx+s12Dc2+s1Dc+c2),
             _inter_cubic_table(
-                shift1D, c, lut.table,
+                shift1D, c, table,
                 idx+s12Dc2+s1Dc2-c, idx+s12Dc2+s1Dc2+0,
                 idx+s12Dc2+s1Dc2+c, idx+s12Dc2+s1Dc2+c2),
         ),
@@ -261,55 +564,98 @@ def sample_lut_cubic(lut, point):
 
 
 def resize_lut(source, target_size, interp=Image.BILINEAR,
-               cls=ImageFilter.Color3DLUT):
+               cls=ImageFilter.Color3DLUT, dtype=None):
     """Resizes given lookup table to new size using interpolation.
 
     :param source: Source lookup table, ``ImageFilter.Color3DLUT`` object.
     :param target_size: Size of the resulting lookup table.
     :param interp: Interpolation type, ``Image.BILINEAR`` or ``Image.BICUBIC``.
-                   BILINEAR is default. BICUBIC is dramatically slower.
+                   BILINEAR is default.
+    :param dtype: ``'float32'`` (default) or ``'float64'`` for resampling.
     """
+    dtype = _check_dtype(dtype)
     size1D, size2D, size3D = cls._check_size(target_size)
-    if interp == Image.BILINEAR:
-        sample_lut = sample_lut_linear
-    elif interp == Image.BICUBIC:
-        sample_lut = sample_lut_cubic
-    else:
+    if interp not in (Image.BILINEAR, Image.BICUBIC):
         raise ValueError(
             "Only Image.BILINEAR and Image.BICUBIC interpolations are supported")
     if interp == Image.BICUBIC and any(s < 4 for s in source.size):
-        sample_lut = sample_lut_linear
         interp = Image.BILINEAR
         warnings.warn("BICUBIC interpolation requires a table of size "
                       "4 in all dimensions at least. Switching to BILINEAR.")
 
-    if numpy and interp == Image.BILINEAR:
-        shape = (size1D * size2D * size3D, 3)
-        b, g, r = numpy.mgrid[
-            0:1:size3D*1j,
-            0:1:size2D*1j,
-            0:1:size1D*1j
-        ].astype(numpy.float32)
-        points = numpy.stack((r, g, b), axis=-1).reshape(shape)
-        points = _sample_lut_linear_numpy(source, points)
-
-        table = points.reshape(points.size)
-
-    else:  # Native implementation
-        table = []
-        for b in range(size3D):
-            for g in range(size2D):
-                for r in range(size1D):
-                    point = (r / (size1D-1), g / (size2D-1), b / (size3D-1))
-                    table.extend(sample_lut(source, point))
+    points = [
+        [x / (size - 1) for x in range(size)]
+        for size in (size1D, size2D, size3D)
+    ]
+    table = _resample_lut(source, points, interp, dtype)
 
     return cls((size1D, size2D, size3D), table,
                channels=source.channels, target_mode=source.mode,
                _copy_table=False)
 
 
+def optimize_lut_size(source, max_error, mean_error=None,
+                      interp=Image.BILINEAR, cls=ImageFilter.Color3DLUT):
+    """Finds the smallest size of the table which approximates the source
+    table within given error and returns the resized table.
+
+    The error is measured as the difference between the source and
+    the resized table applied with linear interpolation, as Pillow does.
+    The probe points are the nodes of the source table and the middles
+    of its cells. Sizes are checked using the bisection, assuming
+    the error decreases with the size growth.
+
+    :param source: Source lookup table, ``ImageFilter.Color3DLUT`` object.
+    :param max_error: Max absolute deviation in any probe point.
+    :param mean_error: Optional limit of the mean absolute deviation.
+    :param interp: Interpolation type used for resizing,
+                   ``Image.BILINEAR`` or ``Image.BICUBIC``.
+                   BILINEAR is default.
+    """
+    # Linear interpolation in the nodes of a regular grid is separable,
+    # so all probe points are sampled with per-axis resampling.
+    probes = [
+        [x / (2 * (size - 1)) for x in range(2 * size - 1)]
+        for size in source.size
+    ]
+    reference = _resample_lut(source, probes, Image.BILINEAR)
+
+    def acceptable(size):
+        lut = resize_lut(source, [min(size, s) for s in source.size],
+                         interp, cls)
+        values = _resample_lut(lut, probes, Image.BILINEAR)
+        if numpy:
+            errors = numpy.abs(values - reference)
+            worst, mean = errors.max(), errors.mean(dtype=numpy.float64)
+        else:
+            errors = [abs(x - y) for x, y in zip(values, reference)]
+            worst, mean = max(errors), sum(errors) / len(errors)
+
+        if worst > max_error:
+            return None
+        if mean_error is not None and mean > mean_error:
+            return None
+        return lut
+
+    # The source size is always acceptable
+    low, high = 2, max(source.size)
+    best = None
+    while low < high:
+        middle = (low + high) // 2
+        lut = acceptable(middle)
+        if lut is None:
+            low = middle + 1
+        else:
+            high, best = middle, lut
+
+    if best is None:
+        best = resize_lut(source, [min(high, s) for s in source.size],
+                          interp, cls)
+    return best
+
+
 def transform_lut(source, lut, target_size=None, interp=Image.BILINEAR,
-                  cls=ImageFilter.Color3DLUT):
+                  cls=ImageFilter.Color3DLUT, dtype=None):
     """Transforms given lookup table using another table and returns the result.
     Sizes of the tables do not have to be the same. Moreover,
     you can set the result table size with ``target_size`` argument.
@@ -320,7 +666,9 @@ def transform_lut(source, lut, target_size=None, interp=Image.BILINEAR,
                         By default, size of the ``source`` will be used.
     :param interp: Interpolation type, ``Image.BILINEAR`` or ``Image.BICUBIC``.
                    BILINEAR is default. BICUBIC is dramatically slower.
+    :param dtype: ``'float32'`` (default) or ``'float64'`` for chains of transforms.
     """
+    dtype = _check_dtype(dtype)
     if source.channels != 3:
         raise ValueError("Can transform only 3-channel cubes")
     if interp == Image.BILINEAR:
@@ -345,88 +693,582 @@ def transform_lut(source, lut, target_size=None, interp=Image.BILINEAR,
             warnings.warn("Cubic interpolation requires a table of size "
                           "4 in all dimensions at least. Switching to linear.")
 
-    if numpy and interp == Image.BILINEAR:
-        shape = (size1D * size2D * size3D, source.channels)
-        if target_size:
-            b, g, r = numpy.mgrid[
-                0:1:size3D*1j,
-                0:1:size2D*1j,
-                0:1:size1D*1j
-            ].astype(numpy.float32)
-            points = numpy.stack((r, g, b), axis=-1).reshape(shape)
-            points = _sample_lut_linear_numpy(source, points)
-        else:
-            points = numpy.asarray(source.table, dtype=numpy.float32)
-            points = points.reshape(shape)
+    if target_size:
+        points = _resample_lut(source, [
+            [x / (size - 1) for x in range(size)]
+            for size in (size1D, size2D, size3D)
+        ], interp, dtype)
+    else:
+        points = source.table
 
-        points = _sample_lut_linear_numpy(lut, points)
+    if numpy and interp == Image.BILINEAR:
+        points = numpy.asarray(points, dtype=dtype)
+        points = points.reshape(size1D * size2D * size3D, source.channels)
+        points = _sample_lut_linear_numpy(lut, points, dtype)
         table = points.reshape(points.size)
 
     else:  # Native implementation
+        lut = _plain_lut(lut)
         table = []
-        index = 0
-        for b in range(size3D):
-            for g in range(size2D):
-                for r in range(size1D):
-                    if target_size:
-                        point = (r / (size1D-1), g / (size2D-1), b / (size3D-1))
-                        point = sample_lut(source, point)
-                    else:
-                        point = (source.table[index + 0],
-                                 source.table[index + 1],
-                                 source.table[index + 2])
-                        index += 3
-                    table.extend(sample_lut(lut, point))
+        for index in range(0, size1D * size2D * size3D * 3, 3):
+            point = (points[index], points[index + 1], points[index + 2])
+            table.extend(sample_lut(lut, point))
 
     return cls((size1D, size2D, size3D), table,
                channels=lut.channels, target_mode=lut.mode or source.mode,
                _copy_table=False)
 
 
-def amplify_lut(source, scale):
+def fold_shaper_lut(shaper, lut, target_size=None, interp=Image.BILINEAR,
+                    cls=ImageFilter.Color3DLUT, dtype=None):
+    """Folds one-dimensional shaper table into three-dimensional lookup table.
+    Applying the result gives the same as applying the shaper
+    and then the lookup table. Since a shaper spreads the nodes
+    of the lookup table nonuniformly, the result usually needs
+    a bigger size to preserve precision.
+
+    :param shaper: Shaper lookup table, ``Color1DLUT`` object.
+    :param lut: Applied lookup table, ``ImageFilter.Color3DLUT`` object.
+    :param target_size: Optional size of the resulting lookup table.
+                        By default, size of the ``lut`` will be used.
+    :param interp: Interpolation type, ``Image.BILINEAR`` or ``Image.BICUBIC``.
+                   BILINEAR is default. BICUBIC is dramatically slower.
+    :param dtype: ``'float32'`` (default) or ``'float64'`` for sampling the tables.
+    """
+    dtype = _check_dtype(dtype)
+    size1D, size2D, size3D = cls._check_size(target_size or lut.size)
+
+    if numpy:
+        points = [
+            _sample_lut_1d_numpy(shaper, numpy.linspace(0, 1, size), channel,
+                                 dtype)
+            for channel, size in enumerate((size1D, size2D, size3D))
+        ]
+        b, g, r = numpy.meshgrid(points[2], points[1], points[0], indexing='ij')
+        table = numpy.stack((r, g, b), axis=-1)
+        table = table.reshape(table.size)
+    else:
+        points = [
+            [_sample_lut_1d(shaper, x / (size - 1), channel) for x in range(size)]
+            for channel, size in enumerate((size1D, size2D, size3D))
+        ]
+        table = []
+        for b in points[2]:
+            for g in points[1]:
+                for r in points[0]:
+                    table.extend((r, g, b))
+
+    source = ImageFilter.Color3DLUT((size1D, size2D, size3D), table,
+                                    _copy_table=False)
+    return transform_lut(source, lut, interp=interp, cls=cls, dtype=dtype)
+
+
+def bake_colorspace(lut, input='RGB', output='RGB', target_size=None,
+                    cls=ImageFilter.Color3DLUT, dtype=None):
+    """Returns the lookup table which applies given RGB table to images
+    in another mode and writes the result in another mode. Applying
+    the result to ``YCbCr``, ``LAB`` or ``HSV`` image is the same as
+    converting the image to ``RGB``, applying the table and converting
+    the result to ``output`` mode, but in one pass without
+    intermediate images. The values are clipped after every conversion.
+    Since the conversions are nonlinear, the result needs a bigger size
+    than the ``lut`` for the same precision. Hue of ``HSV`` output
+    is discontinuous and is interpolated with big errors near red.
+
+    :param lut: Applied RGB lookup table, ``ImageFilter.Color3DLUT`` object.
+    :param input: The mode of images the result will be applied to.
+                  ``'RGB'``, ``'YCbCr'``, ``'LAB'`` or ``'HSV'``.
+                  Default is ``'RGB'``.
+    :param output: The mode of the resulting images. The same modes
+                   are supported. Default is ``'RGB'``.
+    :param target_size: Optional size of the resulting lookup table.
+                        By default, size of the ``lut`` will be used.
+    :param dtype: ``'float32'`` (default) or ``'float64'`` for the conversions.
+    """
+    dtype = _check_dtype(dtype)
+    if lut.channels != 3:
+        raise ValueError("Can bake only 3-channel cubes")
+    for mode in (input, output):
+        if mode not in _MODES:
+            raise ValueError("Unsupported mode: {}".format(mode))
+    size = cls._check_size(target_size or lut.size)
+    target_mode = output if output != input else None
+
+    if numpy:
+        to_rgb, from_rgb = _MODES[input][2], _MODES[output][3]
+        b, g, r = numpy.mgrid[
+            0:1:size[2]*1j,
+            0:1:size[1]*1j,
+            0:1:size[0]*1j
+        ].astype(dtype)
+        points = numpy.stack(to_rgb(r, g, b), axis=-1).clip(0, 1)
+        points = _sample_lut_linear_numpy(lut, points.reshape(-1, 3), dtype)
+        points = from_rgb(*points.clip(0, 1).T)
+        table = numpy.stack(points, axis=-1).astype(dtype, copy=False)
+        return cls(size, table.reshape(table.size),
+                   target_mode=target_mode, _copy_table=False)
+
+    to_rgb, from_rgb = _MODES[input][0], _MODES[output][1]
+    lut = _plain_lut(lut)
+
+    def generate(r, g, b):
+        point = [max(0.0, min(1.0, v)) for v in to_rgb(r, g, b)]
+        point = sample_lut_linear(lut, point)
+        return from_rgb(*[max(0.0, min(1.0, v)) for v in point])
+
+    return cls.generate(size, generate, target_mode=target_mode)
+
+
+def blend_luts(luts, weights, target_size=None, cls=ImageFilter.Color3DLUT,
+               dtype=None):
+    """Returns the weighted sum of the lookup tables. Tables with
+    other sizes are resampled with linear interpolation.
+
+    :param luts: List of ``ImageFilter.Color3DLUT`` objects with the same
+                 number of channels. None means the identity table,
+                 its extra channels for 4-channel tables are zeros.
+    :param weights: The weight of every table. One float or a tuple
+                    with a float for every channel.
+    :param target_size: Optional size of the resulting lookup table.
+                        By default, size of the first table will be used.
+    :param dtype: ``'float32'`` (default) or ``'float64'`` for blending.
+    """
+    dtype = _check_dtype(dtype)
+    if len(luts) != len(weights):
+        raise ValueError(
+            "The number of weights should be equal to the number of tables")
+    tables = [lut for lut in luts if lut is not None]
+    if not tables and not target_size:
+        raise ValueError("The target size is required for identity tables")
+    channels = tables[0].channels if tables else 3
+    if any(lut.channels != channels for lut in tables):
+        raise ValueError("All tables should have the same number of channels")
+    if target_size:
+        size = cls._check_size(target_size)
+    else:
+        size = tuple(tables[0].size)
+    size1D, size2D, size3D = size
+    items = size1D * size2D * size3D
+
+    weights = [
+        tuple(w) if isinstance(w, (tuple, list)) else (w,) * channels
+        for w in weights
+    ]
+    if any(len(w) != channels for w in weights):
+        raise ValueError(
+            "Weights should be one float or {} floats".format(channels))
+
+    points = [[x / (s - 1) for x in range(s)] for s in size]
+
+    if numpy:
+        table = numpy.zeros((items, channels), dtype=dtype)
+        scratch = numpy.empty_like(table)
+        for lut, weight in zip(luts, weights):
+            weight = numpy.asarray(weight, dtype=dtype)
+            if lut is None:
+                b, g, r = numpy.mgrid[
+                    0:1:size3D*1j,
+                    0:1:size2D*1j,
+                    0:1:size1D*1j
+                ].astype(dtype).reshape(3, items)
+                values = numpy.stack((r, g, b), axis=-1)
+                numpy.multiply(values, weight[:3], out=scratch[:, :3])
+                table[:, :3] += scratch[:, :3]
+                continue
+            if tuple(lut.size) == size:
+                values = numpy.asarray(lut.table, dtype=dtype)
+            else:
+                values = _resample_lut(lut, points, Image.BILINEAR, dtype)
+            values = values.reshape(items, channels)
+            numpy.multiply(values, weight, out=scratch)
+            table += scratch
+        table = table.reshape(table.size)
+
+    else:
+        table = [0.0] * (items * channels)
+        for lut, weight in zip(luts, weights):
+            if lut is None:
+                values = [
+                    value
+                    for b in points[2] for g in points[1] for r in points[0]
+                    for value in (r, g, b) + (0.0,) * (channels - 3)
+                ]
+            elif tuple(lut.size) == size:
+                values = lut.table
+            else:
+                values = _resample_lut(lut, points, Image.BILINEAR)
+            for i in range(0, items * channels, channels):
+                for c in range(channels):
+                    table[i + c] += values[i + c] * weight[c]
+
+    mode = next((lut.mode for lut in tables if lut.mode), None)
+    return cls(size, table, channels=channels, target_mode=mode,
+               _copy_table=False)
+
+
+def amplify_lut(source, scale, dtype=None):
     """Amplifies given lookup table compared to identity table the same size.
     For 4-channel lookup tables the fourth channel will be unschanged.
 
     :param source: Source lookup table, ``ImageFilter.Color3DLUT`` object.
     :param scale: One or three floats which define the amplification strength.
                   1.0 mean no changes, 0.0 transforms to identity table.
+    :param dtype: ``'float32'`` (default) or ``'float64'`` for the result.
     """
     if not isinstance(scale, (tuple, list)):
         scale = (scale, scale, scale)
+    extra = source.channels - 3
+
+    return blend_luts(
+        [source, None],
+        [tuple(scale) + (1.0,) * extra,
+         tuple(1.0 - x for x in scale) + (0.0,) * extra],
+        cls=type(source), dtype=dtype,
+    )
+
+
+def _lut_frames(start, delta, n_frames, size, channels, mode, reuse, cls):
+    """Yields the frames of :py:func:`lut_sequence`. Separated,
+    so the arguments are checked when the sequence is created.
+    """
+    lut = None
+    for i in range(n_frames):
+        t = i / (n_frames - 1) if n_frames > 1 else 0.0
+        if lut is not None and reuse:
+            table = lut.table
+        elif numpy:
+            table = numpy.empty_like(start)
+        else:
+            table = [0.0] * len(start)
+
+        if numpy:
+            numpy.multiply(delta, t, out=table)
+            table += start
+        else:
+            table[:] = [x + d * t for x, d in zip(start, delta)]
+
+        if lut is not None and reuse:
+            _store_table(lut, table)
+        else:
+            lut = cls(size, table, channels=channels, target_mode=mode,
+                      _copy_table=False)
+        yield lut
+
+
+def lut_sequence(lut_a, lut_b, n_frames, target_size=None, reuse=False,
+                 cls=ImageFilter.Color3DLUT, dtype=None):
+    """Generates lookup tables which gradually change from ``lut_a``
+    to ``lut_b``, for example for transitions between looks in video.
+    The first frame is equal to ``lut_a``, the last one to ``lut_b``.
+    The frames are calculated lazily using linear interpolation,
+    while the arguments are checked and the tables are aligned
+    immediately.
+
+    :param lut_a: The first lookup table, ``ImageFilter.Color3DLUT`` object.
+    :param lut_b: The last lookup table with the same number of channels.
+                  It is resampled if its size is different.
+    :param n_frames: The number of frames.
+    :param target_size: Optional size of the frames.
+                        By default, size of ``lut_a`` will be used.
+    :param reuse: If true, the same lookup table object with the same table
+                  buffer is yielded every time. The frame is valid only
+                  until the next one is requested, which avoids any
+                  allocations. Default is False.
+    :param dtype: numpy type of the frames, ``'float32'`` (default) or ``'float64'``.
+    """
+    dtype = _check_dtype(dtype)
+    if n_frames < 1:
+        raise ValueError("The number of frames should be positive")
+    if lut_a.channels != lut_b.channels:
+        raise ValueError("The tables should have the same number of channels")
+    size = cls._check_size(target_size or lut_a.size)
+    points = [[x / (s - 1) for x in range(s)] for s in size]
+    channels = lut_a.channels
+    mode = lut_a.mode or lut_b.mode
+
+    def aligned(lut):
+        if tuple(lut.size) == size:
+            return lut.table
+        return _resample_lut(lut, points, Image.BILINEAR, dtype)
+
+    start, end = aligned(lut_a), aligned(lut_b)
+    if numpy:
+        start = numpy.array(start, dtype=dtype)
+        delta = numpy.asarray(end, dtype=dtype) - start
+    else:
+        start = list(start)
+        delta = [y - x for x, y in zip(start, end)]
+
+    return _lut_frames(start, delta, n_frames, size, channels, mode, reuse,
+                       cls)
+
+
+def _lut_region(size, bounds):
+    """Returns ranges of the nodes which affect colors in given bounds.
+    Every range has two nodes at least.
+    """
+    low, high = bounds
+    if any(lo > hi for lo, hi in zip(low, high)):
+        raise ValueError("The minimum bound should not exceed the maximum")
+    region = []
+    for s, lo, hi in zip(size, low, high):
+        start = max(0, min(s - 2, int(math.floor(lo * (s - 1)))))
+        stop = max(start + 2, min(s, int(math.ceil(hi * (s - 1))) + 1))
+        region.append((start, stop))
+    return region
+
+
+def update_lut_region(lut, generator, bounds, source=None):
+    """Recomputes the part of the table in place. Only nodes which affect
+    the colors inside given bounds are changed. This is much faster than
+    regeneration of the whole table when the changes are local.
+
+    :param lut: Lookup table, ``ImageFilter.Color3DLUT`` object,
+                which will be changed.
+    :param generator: A function which takes the lookup table of the region
+                      and returns a new table with the same size
+                      and ``lut.channels`` channels. Functions from
+                      the package which accept the source table could be used,
+                      for example ``lambda region: rgb_color_enhance(region,
+                      saturation=0.5)``.
+    :param bounds: Two tuples with three floats, the minimum
+                   and maximum input colors of the region. The minimum
+                   shouldn't exceed the maximum on any axis.
+    :param source: Optional source lookup table with the same size as
+                   ``lut``. Its values in the region are passed to
+                   the generator. By default, the values of the identity
+                   table are used.
+    :return: The same ``lut`` object.
+    """
+    size1D, size2D, size3D = lut.size
+    c = lut.channels
+    if source is not None and tuple(source.size) != tuple(lut.size):
+        raise ValueError("The source should have the same size as the table")
+    (r0, r1), (g0, g1), (b0, b1) = _lut_region(lut.size, bounds)
+    size = (r1 - r0, g1 - g0, b1 - b0)
 
     if numpy:
+        if source is None:
+            b, g, r = numpy.mgrid[b0:b1, g0:g1, r0:r1].astype(numpy.float32)
+            points = numpy.stack((
+                r / (size1D - 1), g / (size2D - 1), b / (size3D - 1),
+            ), axis=-1)
+            channels = 3
+        else:
+            channels = source.channels
+            points = numpy.asarray(source.table, dtype=numpy.float32).reshape(
+                size3D, size2D, size1D, channels)[b0:b1, g0:g1, r0:r1]
+        points = points.reshape(points.size)
+    else:
+        if source is None:
+            points = [
+                value
+                for b in range(b0, b1)
+                for g in range(g0, g1)
+                for r in range(r0, r1)
+                for value in (r / (size1D - 1), g / (size2D - 1),
+                              b / (size3D - 1))
+            ]
+            channels = 3
+        else:
+            channels = source.channels
+            table = source.table
+            points = []
+            for b in range(b0, b1):
+                for g in range(g0, g1):
+                    start = ((b * size2D + g) * size1D + r0) * channels
+                    points.extend(table[start:start + size[0] * channels])
+
+    region = generator(ImageFilter.Color3DLUT(
+        size, points, channels=channels, _copy_table=False))
+    if tuple(region.size) != size or region.channels != c:
+        raise ValueError(
+            "The generator should return a table of {}x{}x{} size "
+            "with {} channels".format(*size, c))
+
+    table, values = lut.table, region.table
+    if numpy and isinstance(table, numpy.ndarray):
+        values = numpy.asarray(values, dtype=table.dtype)
+        table.reshape(size3D, size2D, size1D, c)[b0:b1, g0:g1, r0:r1] = \
+            values.reshape(size[2], size[1], size[0], c)
+    else:
+        if numpy and isinstance(values, numpy.ndarray):
+            values = values.tolist()
+        row = size[0] * c
+        i = 0
+        for b in range(b0, b1):
+            for g in range(g0, g1):
+                start = ((b * size2D + g) * size1D + r0) * c
+                table[start:start + row] = values[i:i + row]
+                i += row
+    _store_table(lut, table)
+    return lut
+
+
+_INVERT_TOLERANCE = 1.0 / (1 << 16)
+
+
+def invert_lut(source, target_size=None, iterations=10,
+               cls=ImageFilter.Color3DLUT, dtype=None, strict=False):
+    """Computes inverse lookup table, which transforms colors
+    back to the original ones. Applying the source and the inverse
+    tables consequently gives nearly identity table.
+
+    Every node of the inverse table is found with Newton's method
+    using linear interpolation of the source table. The results are
+    clipped to the cube, so the colors which can't be produced
+    by the source table are not inverted precisely. If some nodes
+    are not converged, a warning with the max error is issued,
+    or ValueError is raised in the strict mode.
+
+    :param source: Source lookup table, ``ImageFilter.Color3DLUT`` object.
+    :param target_size: Optional size of the resulting lookup table.
+                        By default, size of the ``source`` will be used.
+    :param iterations: Maximum number of iterations for every node.
+    :param dtype: ``'float32'`` (default) or ``'float64'`` for the iterations.
+    :param strict: Raise ValueError instead of the warning
+                   if some nodes are not converged.
+    """
+    dtype = _check_dtype(dtype)
+    if source.channels != 3:
+        raise ValueError("Can invert only 3-channel cubes")
+
+    if target_size:
+        size1D, size2D, size3D = cls._check_size(target_size)
+    else:
         size1D, size2D, size3D = source.size
-        sb, sg, sr = numpy.mgrid[
+
+    if numpy:
+        shape = (size1D * size2D * size3D, 3)
+        b, g, r = numpy.mgrid[
             0:1:size3D*1j,
             0:1:size2D*1j,
             0:1:size1D*1j
-        ].astype(numpy.float32).reshape(3, size1D * size2D * size3D)
+        ].astype(dtype)
+        targets = numpy.stack((r, g, b), axis=-1).reshape(shape)
+        points = targets.copy()
+
+        active = numpy.arange(shape[0])
+        for _ in range(iterations):
+            values, jacobian = _sample_lut_linear_jacobian_numpy(
+                source, points[active], dtype)
+            residual = values - targets[active]
+            left = numpy.abs(residual).max(axis=1) > _INVERT_TOLERANCE
+            active = active[left]
+            if not active.size:
+                break
+            step = _solve_jacobian_numpy(jacobian[left], residual[left])
+            points[active] = (points[active] - step).clip(0, 1)
+
+        errors = _sample_lut_linear_numpy(source, points, dtype) - targets
+        errors = numpy.abs(errors).max(axis=1)
+        failed, max_error = (errors > _INVERT_TOLERANCE).sum(), errors.max()
+        table = points.reshape(points.size)
 
-        points = numpy.array(source.table, dtype=numpy.float32)
-        points = points.reshape(size1D * size2D * size3D, source.channels)
-        points[:, 0] = sr + (points[:, 0] - sr) * scale[0]
-        points[:, 1] = sg + (points[:, 1] - sg) * scale[1]
-        points[:, 2] = sb + (points[:, 2] - sb) * scale[2]
-
-        return type(source)(
-            source.size, points.reshape(points.size), channels=source.channels,
-            target_mode=source.mode, _copy_table=False,
-        )
-
-    def transform3(sr, sg, sb, r, g, b):
-        return (sr + (r - sr) * scale[0],
-                sg + (g - sg) * scale[1],
-                sb + (b - sb) * scale[2])
-
-    def transform4(sr, sg, sb, r, g, b, x):
-        return (sr + (r - sr) * scale[0],
-                sg + (g - sg) * scale[1],
-                sb + (b - sb) * scale[2],
-                x)
-
-    if source.channels == 3:
-        return source.transform(transform3, with_normals=True)
-    elif source.channels == 4:
-        return source.transform(transform4, with_normals=True)
-    else:  # pragma: no cover
-        raise ValueError("The source lut should have 3 or 4 channels")
+    else:  # Native implementation
+        table = []
+        failed, max_error = 0, 0.0
+        for b in range(size3D):
+            for g in range(size2D):
+                for r in range(size1D):
+                    target = (r / (size1D-1), g / (size2D-1), b / (size3D-1))
+                    point = target
+                    for _ in range(iterations):
+                        value, jacobian = _sample_lut_linear_jacobian(
+                            source, point)
+                        residual = [v - t for v, t in zip(value, target)]
+                        if max(map(abs, residual)) <= _INVERT_TOLERANCE:
+                            break
+                        step = _solve_jacobian(jacobian, residual)
+                        point = [max(0.0, min(1.0, p - s))
+                                 for p, s in zip(point, step)]
+
+                    value = sample_lut_linear(source, point)
+                    error = max(abs(v - t) for v, t in zip(value, target))
+                    if error > _INVERT_TOLERANCE:
+                        failed += 1
+                        max_error = max(max_error, error)
+                    table.extend(point)
+
+    if failed:
+        message = ("{} of {} nodes of the inverse table are not converged. "
+                   "The max error is {:.5f}.".format(
+                       failed, size1D * size2D * size3D, max_error))
+        if strict:
+            raise ValueError(message)
+        warnings.warn(message)
+
+    return cls((size1D, size2D, size3D), table, _copy_table=False)
+
+
+def _lut_shape(lut):
+    """Returns everything except the table which affects the result
+    of applying: the size, channels, target mode and the domain
+    of one-dimensional tables.
+    """
+    size = lut.size
+    if isinstance(size, int):
+        size = (size,)
+    return (tuple(size), lut.channels, getattr(lut, 'mode', None),
+            getattr(lut, 'domain_min', None), getattr(lut, 'domain_max', None))
+
+
+def lut_fingerprint(lut, precision=12):
+    """Returns a hash of the table content, the shape, target mode
+    and the domain of the table. Values are rounded to ``precision`` bits
+    after the point before hashing, so tables which differ less than
+    the precision usually have the same fingerprint.
+    Values close to the rounding boundaries could still produce
+    different fingerprints, use :py:func:`luts_close` for the exact check.
+
+    :param lut: Lookup table, ``ImageFilter.Color3DLUT``
+                or :py:class:`Color1DLUT` object.
+    :param precision: Number of bits after the point. Default is 12.
+    :return: Hex string.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(_lut_shape(lut)).encode())
+    scale = float(1 << precision)
+
+    if numpy:
+        table = numpy.asarray(lut.table, dtype=numpy.float64) * scale
+        digest.update(numpy.rint(table).astype('<i8').tobytes())
+    else:
+        table = [int(round(x * scale)) for x in lut.table]
+        digest.update(struct.pack('<{}q'.format(len(table)), *table))
+
+    return digest.hexdigest()
+
+
+def luts_close(left, right, tol=1.0 / (1 << 12)):
+    """Checks if the tables have the same shape, target mode and domain
+    and all values differ less than or equal to ``tol``. The comparison
+    stops on the first part of the tables which is not close enough.
+
+    :param left: Lookup table, ``ImageFilter.Color3DLUT``
+                 or :py:class:`Color1DLUT` object.
+    :param right: Lookup table of the same type.
+    :param tol: Max absolute difference of the values.
+    """
+    if _lut_shape(left) != _lut_shape(right):
+        return False
+    if left is right:
+        return True
+
+    # The values are compared as float64 on both paths, so the result
+    # doesn't depend on the storage type or on numpy availability.
+    if numpy:
+        a = numpy.asarray(left.table)
+        b = numpy.asarray(right.table)
+        chunk = 1 << 15
+        for start in range(0, a.size, chunk):
+            diff = numpy.abs(
+                a[start:start + chunk].astype(numpy.float64) -
+                b[start:start + chunk].astype(numpy.float64))
+            # Comparison with NaN is false
+            if not (diff <= tol).all():
+                return False
+        return True
+
+    return all(abs(float(x) - float(y)) <= tol
+               for x, y in zip(left.table, right.table))
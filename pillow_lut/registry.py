@@ -0,0 +1,208 @@
+import sys
+import threading
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import ImageFilter
+
+from .loaders import _duplicate_error, _find_lut_files, _load_lut_file
+
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def _table_bytes(lut):
+    """Memory used by the table. For lists this is an estimation."""
+    table = getattr(lut, 'compact_table', None)
+    if table is None:
+        table = lut.table
+    if numpy and isinstance(table, numpy.ndarray):
+        return table.nbytes
+    return sys.getsizeof(table) + len(table) * sys.getsizeof(0.0)
+
+
+class _Loading:
+    """The load in progress, shared between all waiting threads."""
+    def __init__(self, filename):
+        self.filename = filename
+        self.event = threading.Event()
+        self.lut = None
+        self.error = None
+
+
+class LutRegistry:
+    """Collection of named lookup tables which are loaded from the files
+    on the first access. Loaded tables are kept in the cache until
+    the total size of the tables exceeds ``max_bytes``, then the least
+    recently used tables are dropped. Tables which are larger than
+    ``max_bytes`` alone are not cached at all.
+
+    The registry is thread-safe. When several threads request the same
+    table, the file is loaded only once.
+
+    :param path: The directory with the files, optional.
+                 See :py:meth:`scan`.
+    :param pattern: Glob pattern of the file names. Default is ``'*'``.
+    :param max_bytes: Memory limit of the cached tables.
+                      Default is 256 MiB.
+    :param target_mode: Image mode which should be after color transformation.
+                        The default is None, which means mode doesn't change.
+    :param cls: A class which handles the loaded files.
+                Default is ``ImageFilter.Color3DLUT``.
+    """
+    def __init__(self, path=None, pattern='*', max_bytes=256 << 20,
+                 target_mode=None, cls=ImageFilter.Color3DLUT):
+        self.max_bytes = max_bytes
+        self.target_mode = target_mode
+        self.cls = cls
+        self._files = {}
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._loading = {}
+        self._lock = threading.Lock()
+
+        if path is not None:
+            self.scan(path, pattern)
+
+    def __repr__(self):
+        return "<{} files={:d} cached={:d} bytes={:d}>".format(
+            self.__class__.__name__, len(self._files), len(self._cache),
+            self._cached_bytes)
+
+    def __len__(self):
+        return len(self._files)
+
+    def __iter__(self):
+        return iter(sorted(self._files))
+
+    def __contains__(self, name):
+        return name in self._files
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    @property
+    def cached_bytes(self):
+        """Total size of the cached tables."""
+        return self._cached_bytes
+
+    def cached_names(self):
+        """Names of the cached tables from the least recently used."""
+        with self._lock:
+            return list(self._cache)
+
+    def scan(self, path, pattern='*'):
+        """Registers all files with known extensions from the directory.
+        The name of the table is the name of the file without extension.
+
+        Files with the same name and different extensions are skipped
+        with a warning.
+
+        :param path: The directory with the files.
+        :param pattern: Glob pattern of the file names. Default is ``'*'``.
+        """
+        files, duplicates = _find_lut_files(path, pattern)
+        for name in sorted(files):
+            self.register(name, files[name])
+        for name in sorted(duplicates):
+            warnings.warn(str(_duplicate_error(duplicates[name])))
+
+    def register(self, name, filename):
+        """Registers the file under the given name. The cached table
+        with the same name is dropped.
+        """
+        with self._lock:
+            self._files[name] = filename
+            self._evict(name)
+
+    def evict(self, name=None):
+        """Drops the table from the cache. The file is still registered
+        and will be loaded again on the next access.
+
+        :param name: The name of the table. The default is None,
+                     which means all tables are dropped.
+        """
+        with self._lock:
+            for name in list(self._cache) if name is None else [name]:
+                self._evict(name)
+
+    def _evict(self, name):
+        if name in self._cache:
+            lut, size = self._cache.pop(name)
+            self._cached_bytes -= size
+
+    def _store(self, name, lut):
+        size = _table_bytes(lut)
+        if size > self.max_bytes:
+            return
+        self._cache[name] = (lut, size)
+        self._cached_bytes += size
+        while self._cached_bytes > self.max_bytes:
+            self._evict(next(iter(self._cache)))
+
+    def get(self, name):
+        """Returns the table, loading it from the file if it is not cached.
+
+        :param name: The name of the table.
+        """
+        with self._lock:
+            if name in self._cache:
+                self._cache.move_to_end(name)
+                return self._cache[name][0]
+
+            loading = self._loading.get(name)
+            owner = loading is None
+            if owner:
+                if name not in self._files:
+                    raise KeyError(name)
+                loading = self._loading[name] = _Loading(self._files[name])
+
+        if not owner:
+            loading.event.wait()
+            if loading.error is not None:
+                raise loading.error
+            return loading.lut
+
+        try:
+            loading.lut = _load_lut_file(
+                loading.filename, self.target_mode, self.cls)
+        except Exception as e:
+            loading.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._loading[name]
+                # Don't cache the table if the file has been replaced
+                # while it was loading.
+                if loading.lut is not None and \
+                        self._files.get(name) == loading.filename:
+                    self._store(name, loading.lut)
+            loading.event.set()
+        return loading.lut
+
+    def prewarm(self, names=None, workers=None):
+        """Loads the tables to the cache in the thread pool.
+
+        :param names: List of names to load. The default is None,
+                      which means all registered tables.
+        :param workers: The number of threads. The default is None,
+                        which means the default of ``ThreadPoolExecutor``.
+        :return: A dict which maps names of the tables
+                 which can't be loaded to the exceptions.
+        """
+        if names is None:
+            names = list(self)
+
+        errors = {}
+        with ThreadPoolExecutor(workers) as executor:
+            futures = [(name, executor.submit(self.get, name)) for name in names]
+            for name, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[name] = e
+        return errors
@@ -0,0 +1,109 @@
+import os
+
+from PIL import Image
+
+from .lut1d import Color1DLUT
+
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def _format_rows(table, channels):
+    row = " ".join(["{:.6f}"] * channels) + "\n"
+    for i in range(0, len(table), channels):
+        yield row.format(*table[i:i + channels])
+
+
+def save_cube_file(lut, filename, title=None):
+    """Saves the lookup table to .cube file format.
+
+    :param lut: ``ImageFilter.Color3DLUT`` or :py:class:`Color1DLUT` object.
+    :param filename: Path to the file or a file object opened for writing
+                     in text mode.
+    :param title: Optional title of the table.
+    """
+    lines = []
+    if title:
+        lines.append('TITLE "{}"\n'.format(title))
+    if isinstance(lut, Color1DLUT):
+        lines.append("LUT_1D_SIZE {:d}\n".format(lut.size))
+        if lut.domain_min != (0.0, 0.0, 0.0) or \
+                lut.domain_max != (1.0, 1.0, 1.0):
+            lines.append("DOMAIN_MIN {} {} {}\n".format(*lut.domain_min))
+            lines.append("DOMAIN_MAX {} {} {}\n".format(*lut.domain_max))
+    else:
+        size = tuple(lut.size)
+        if size[0] == size[1] == size[2]:
+            size = size[:1]
+        lines.append("LUT_3D_SIZE {}\n".format(" ".join(map(str, size))))
+        if lut.channels != 3:
+            lines.append("CHANNELS {:d}\n".format(lut.channels))
+    lines.append("\n")
+
+    table = lut.table
+    if numpy and isinstance(table, numpy.ndarray):
+        table = table.tolist()
+
+    if isinstance(filename, str):
+        with open(filename, 'wt') as file:
+            file.writelines(lines)
+            file.writelines(_format_rows(table, lut.channels))
+    else:
+        filename.writelines(lines)
+        filename.writelines(_format_rows(table, lut.channels))
+
+
+def hald_image(lut):
+    """Returns Hald image for the lookup table. Values are clipped
+    to the ``[0, 1]`` range and rounded to 8 bits.
+
+    :param lut: ``ImageFilter.Color3DLUT`` object with the same size
+                in all dimensions: 4, 9, 16, 25, 36, 49 or 64.
+    """
+    size = lut.size[0]
+    for i in range(2, 9):
+        if i**2 == size and tuple(lut.size) == (size, size, size):
+            width = i**3
+            break
+    else:
+        raise ValueError(
+            "Hald image could be made only for 4, 9, 16, 25, 36, 49 "
+            "or 64 size in all dimensions")
+    mode = {3: 'RGB', 4: 'RGBA'}[lut.channels]
+
+    if numpy:
+        table = numpy.asarray(lut.table, dtype=numpy.float32)
+        data = (table * 255 + 0.5).clip(0, 255).astype(numpy.uint8).tobytes()
+    else:
+        data = bytes(max(0, min(255, int(x * 255 + 0.5))) for x in lut.table)
+    return Image.frombytes(mode, (width, width), data)
+
+
+def save_hald_image(lut, filename, format=None):
+    """Saves the lookup table as Hald image. See :py:func:`hald_image`.
+
+    :param lut: ``ImageFilter.Color3DLUT`` object.
+    :param filename: Path to the file or a file object.
+    :param format: Optional image format, see ``Image.save``.
+                   Should be lossless, like PNG or TIFF.
+    """
+    hald_image(lut).save(filename, format)
+
+
+_SAVERS = {
+    '.cube': save_cube_file,
+    '.png': save_hald_image,
+    '.tif': save_hald_image,
+    '.tiff': save_hald_image,
+}
+
+
+def _save_lut_file(lut, filename):
+    """Saves the table choosing the format by the file extension."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in _SAVERS:
+        raise ValueError("Unknown file extension: {}".format(ext))
+    _SAVERS[ext](lut, filename)
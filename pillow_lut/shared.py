@@ -0,0 +1,167 @@
+import threading
+import weakref
+from array import array
+
+from PIL import ImageFilter
+
+from .operations import _PlainTableMixin
+
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # pragma: no cover
+    shared_memory = None
+
+
+_register_lock = threading.Lock()
+
+
+def _release(block, views, owner):
+    """Closes the block and destroys it when this is the owner."""
+    views[0] = None
+    try:
+        block.close()
+    except BufferError:
+        # Someone still holds the table. The memory will be unmapped
+        # when the last reference is dropped.
+        pass
+    if owner:
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _open_block(name):
+    """Attaches to the existing block without registering it
+    in the resource tracker, which would destroy the block when
+    the process exits. Only the owner is responsible for this.
+    """
+    try:
+        # Python 3.13+
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    with _register_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _attach(block_name, length, size, channels, mode, name, owner=False):
+    lut = SharedColor3DLUT.__new__(SharedColor3DLUT)
+    lut.size = size
+    lut.channels = channels
+    lut.mode = mode
+    lut.name = name
+    if owner:
+        block = shared_memory.SharedMemory(name=block_name)
+    else:
+        block = _open_block(block_name)
+    lut._share(block, length, owner=owner)
+    return lut
+
+
+class SharedColor3DLUT(_PlainTableMixin, ImageFilter.Color3DLUT):
+    """Three-dimensional color lookup table which stores the table
+    as float32 array in ``multiprocessing.shared_memory`` block.
+    When the table is pickled, for example to be passed to the process
+    pool, only the name of the block is sent. The worker process maps
+    the same memory without copying.
+
+    The object which has created the block is the owner. The block is
+    destroyed when the owner is released with :py:meth:`release`,
+    exits the ``with`` statement or is garbage collected. The owner
+    should be alive while the workers use the table. The tables in
+    the workers are never the owners and only close the block.
+
+    Could be passed as ``cls`` argument to the package loaders,
+    generators and operations.
+    Accepts the same arguments as ``ImageFilter.Color3DLUT``.
+    """
+    @property
+    def table(self):
+        view = self._views[0]
+        if view is None:
+            raise ValueError("The table is released")
+        return view
+
+    @table.setter
+    def table(self, table):
+        if getattr(self, '_views', [None])[0] is table:
+            # The table is changed in place
+            return
+        if shared_memory is None:
+            raise ValueError("multiprocessing.shared_memory is not available")
+
+        if numpy:
+            table = numpy.asarray(table, dtype=numpy.float32).reshape(-1)
+        else:
+            table = array('f', table)
+        block = shared_memory.SharedMemory(
+            create=True, size=max(1, len(table) * 4))
+        self._share(block, len(table), owner=True, table=table)
+
+    def _share(self, block, length, owner, table=None):
+        if numpy:
+            view = numpy.ndarray((length,), numpy.float32, block.buf)
+        else:
+            view = block.buf[:length * 4].cast('f')
+        if table is not None:
+            view[:] = table
+        # The new table could be made from the old one,
+        # so the old block is released only after copying.
+        self.release()
+        # The view is kept in the list, so the finalizer can drop it
+        # before closing the block.
+        self._views = [view]
+        self._block = block
+        self._owner = owner
+        self._finalizer = weakref.finalize(
+            self, _release, block, self._views, owner)
+
+    @property
+    def shared_name(self):
+        """The name of the shared memory block."""
+        return self._block.name
+
+    @property
+    def is_owner(self):
+        """True if the block was created by this object."""
+        return self._owner
+
+    def release(self):
+        """Closes the shared memory block. The owner also destroys
+        the block, after that the table can't be attached anymore.
+        """
+        finalizer = getattr(self, '_finalizer', None)
+        if finalizer is not None:
+            finalizer()
+
+    def _hand_over(self):
+        """Closes the block without destroying it and returns arguments
+        for ``_attach``, so another process can become the owner.
+        """
+        args = self.__reduce__()[1]
+        self._finalizer.detach()
+        _release(self._block, self._views, False)
+        return args
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def __reduce__(self):
+        return _attach, (self.shared_name, len(self.table), self.size,
+                         self.channels, self.mode, self.name)
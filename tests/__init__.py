@@ -3,6 +3,8 @@ from os.path import abspath, dirname, join
 
 import numpy
 
+from pillow_lut import identity_table
+
 
 @contextmanager
 def disable_numpy(module):
@@ -21,6 +23,20 @@ def resource(*x):
     return abspath(join(dirname(__file__), *x))
 
 
+def write_cube(filename, size):
+    table = identity_table(size).table
+    with open(filename, 'w') as f:
+        f.write("LUT_3D_SIZE {}\n".format(size))
+        for i in range(0, len(table), 3):
+            f.write("{} {} {}\n".format(*table[i:i+3]))
+
+
+def write_broken_cube(directory):
+    """Writes broken.cube file with too few rows to the directory."""
+    with open(join(directory, 'broken.cube'), 'w') as f:
+        f.write("LUT_3D_SIZE 2\n0 0 0\n")
+
+
 class PillowTestCase:
     def assertAlmostEqualLuts(self, left, right, diff=None):
         assert tuple(left.size) == tuple(right.size)
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from pillow_lut import (
+    aio, blend_luts, identity_table, load_cube_file, load_hald_image, rgb_color_enhance,
+    transform_lut, update_lut_region)
+
+from . import PillowTestCase, resource
+
+
+class TestAio(PillowTestCase):
+    lut = rgb_color_enhance(3, contrast=0.2)
+
+    @pytest.fixture(autouse=True)
+    def executor(self):
+        yield
+        aio.set_executor(None)
+
+    def test_names(self):
+        assert aio.aload_cube_file.__name__ == 'aload_cube_file'
+        assert aio.atransform_lut.__doc__ == \
+            "Coroutine version of :py:func:`pillow_lut.transform_lut`."
+        assert asyncio.iscoroutinefunction(aio.argb_color_enhance)
+
+    def test_loaders(self, tmp_path):
+        filename = str(tmp_path / 'identity.cube')
+        table = identity_table(3).table
+        with open(filename, 'w') as f:
+            f.write("LUT_3D_SIZE 3\n")
+            for i in range(0, len(table), 3):
+                f.write("{} {} {}\n".format(*table[i:i+3]))
+        hald = resource('files', 'hald.4.png')
+
+        async def main():
+            return await asyncio.gather(
+                aio.aload_cube_file(filename, target_mode='RGBA'),
+                aio.aload_hald_image(hald),
+            )
+
+        cube, hald_lut = asyncio.run(main())
+        self.assertAlmostEqualLuts(cube, load_cube_file(filename))
+        assert cube.mode == 'RGBA'
+        self.assertAlmostEqualLuts(hald_lut, load_hald_image(hald))
+
+    def test_operations(self):
+        async def main():
+            source = await aio.argb_color_enhance(5, brightness=0.1)
+            return source, await aio.atransform_lut(source, self.lut)
+
+        source, lut = asyncio.run(main())
+        self.assertAlmostEqualLuts(source, rgb_color_enhance(5, brightness=0.1))
+        self.assertAlmostEqualLuts(lut, transform_lut(source, self.lut))
+
+    def test_later_operations(self):
+        bounds = ((0, 0, 0), (0.5, 0.5, 0.5))
+
+        def darken(region):
+            return region.transform(lambda r, g, b: (r / 2, g / 2, b / 2))
+
+        async def main():
+            return await asyncio.gather(
+                aio.ablend_luts([self.lut, identity_table(3)], [0.5, 0.5]),
+                aio.aupdate_lut_region(identity_table(5), darken, bounds),
+            )
+
+        blended, region = asyncio.run(main())
+        self.assertAlmostEqualLuts(
+            blended, blend_luts([self.lut, identity_table(3)], [0.5, 0.5]))
+        self.assertAlmostEqualLuts(
+            region, update_lut_region(identity_table(5), darken, bounds))
+
+    def test_executor(self):
+        with ThreadPoolExecutor(1) as executor:
+            aio.set_executor(executor)
+            assert aio.get_executor() is executor
+            lut = asyncio.run(aio.aidentity_table(4))
+        self.assertAlmostEqualLuts(lut, identity_table(4))
+
+        with ProcessPoolExecutor(1) as executor:
+            aio.set_executor(executor)
+            lut = asyncio.run(aio.atransform_lut(identity_table(4), self.lut))
+        self.assertAlmostEqualLuts(lut, transform_lut(identity_table(4), self.lut))
+
+    def test_not_blocking(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def work():
+            started.set()
+            return release.wait(5)
+
+        async def main():
+            task = asyncio.ensure_future(aio._run(work))
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, started.wait, 5)
+            # The loop is running while the work is blocked
+            release.set()
+            return await task
+
+        assert asyncio.run(main())
+
+    def test_cancel(self):
+        started = threading.Event()
+        release = threading.Event()
+        finished = threading.Event()
+
+        def work():
+            started.set()
+            release.wait(5)
+            finished.set()
+
+        async def main():
+            task = asyncio.ensure_future(aio._run(work))
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, started.wait, 5)
+            task.cancel()
+            try:
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                # Returned while the work is still running
+                assert not finished.is_set()
+            finally:
+                release.set()
+
+        with ThreadPoolExecutor(1) as executor:
+            aio.set_executor(executor)
+            asyncio.run(main())
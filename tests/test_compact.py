@@ -0,0 +1,138 @@
+import pickle
+
+import numpy
+import pytest
+from PIL import Image, ImageFilter
+
+from pillow_lut import (
+    Float16Color3DLUT, UInt16Color3DLUT, compact, identity_table, load_hald_image,
+    registry, rgb_color_enhance, sample_lut_cubic, sample_lut_linear, transform_lut)
+
+from . import PillowTestCase, disable_numpy, resource
+
+
+class TestCompactColor3DLUT(PillowTestCase):
+    # Values are out of [0, 1] range
+    source = rgb_color_enhance(9, exposure=0.5, contrast=0.3, vibrance=0.4)
+    normalized = source.transform(
+        lambda r, g, b: (min(1, max(0, r)), min(1, max(0, g)), min(1, max(0, b))))
+
+    def test_storage(self):
+        for cls, dtype in [(Float16Color3DLUT, numpy.float16),
+                           (UInt16Color3DLUT, numpy.uint16)]:
+            lut = cls(self.source.size, self.source.table)
+            assert lut.compact_table.dtype == dtype
+            assert lut.compact_table.nbytes == 9**3 * 3 * 2
+            assert lut.table.dtype == numpy.float32
+            assert lut.table.shape == (9**3 * 3,)
+            assert repr(lut) == "<{} from {} size=9x9x9 channels=3>".format(
+                cls.__name__, numpy.dtype(dtype).name)
+
+    def test_accuracy(self):
+        # float16 has 11 significant bits
+        float16 = Float16Color3DLUT(self.source.size, self.source.table)
+        self.assertAlmostEqualLuts(float16, self.source, 11)
+
+        # The absolute error is the half of uint16 step, the relative error
+        # is big for the values close to the minimum of the channel.
+        uint16 = UInt16Color3DLUT(self.source.size, self.source.table)
+        self.assertAlmostEqualLuts(uint16, self.source, 6)
+        table = numpy.asarray(self.source.table).reshape(-1, 3)
+        step = numpy.ptp(table, axis=0) / 65535
+        assert (numpy.abs(uint16.table.reshape(-1, 3) - table) <= step).all()
+
+    def test_accuracy_normalized(self):
+        source = self.normalized
+
+        float16 = Float16Color3DLUT(source.size, source.table)
+        assert numpy.abs(float16.table - source.table).max() <= 1 / 4096
+
+        uint16 = UInt16Color3DLUT(source.size, source.table)
+        assert numpy.abs(uint16.table - source.table).max() <= 1 / 65535
+
+    def test_out_of_range(self):
+        table = numpy.asarray(self.source.table) * 3 - 1
+        lut = UInt16Color3DLUT(self.source.size, table)
+        assert lut.table.min() == pytest.approx(table.min())
+        assert lut.table.max() == pytest.approx(table.max())
+        step = numpy.ptp(table.reshape(-1, 3), axis=0) / 65535
+        assert (numpy.abs(lut.table - table).reshape(-1, 3) <= step).all()
+
+    def test_constant_channel(self):
+        lut = UInt16Color3DLUT.generate(3, lambda r, g, b: (r, 0.5, b))
+        assert list(lut.table[1::3]) == [0.5] * 27
+        self.assertAlmostEqualLuts(
+            lut, ImageFilter.Color3DLUT.generate(3, lambda r, g, b: (r, 0.5, b)),
+            15)
+
+    def test_4_channels(self):
+        lut = UInt16Color3DLUT.generate(
+            3, lambda r, g, b: (r, g, b, 0.5), channels=4)
+        assert lut.compact_table.dtype == numpy.uint16
+        assert list(lut.table[3::4]) == [0.5] * 27
+
+    def test_package_output(self):
+        hald = resource('files', 'hald.6.hefe.png')
+        lut = load_hald_image(hald, cls=UInt16Color3DLUT)
+        assert isinstance(lut, UInt16Color3DLUT)
+        self.assertAlmostEqualLuts(lut, load_hald_image(hald), 6)
+
+        lut = rgb_color_enhance(5, brightness=0.2, cls=Float16Color3DLUT)
+        assert isinstance(lut, Float16Color3DLUT)
+        self.assertAlmostEqualLuts(
+            lut, rgb_color_enhance(5, brightness=0.2), 11)
+
+        for interp in [Image.BILINEAR, Image.BICUBIC]:
+            source = self.normalized
+            lut = transform_lut(
+                Float16Color3DLUT(source.size, source.table),
+                UInt16Color3DLUT(source.size, source.table),
+                interp=interp, cls=Float16Color3DLUT)
+            assert isinstance(lut, Float16Color3DLUT)
+            reference = transform_lut(source, source, interp=interp)
+            assert numpy.abs(lut.table - reference.table).max() < 1 / 1024
+
+    def test_transform(self):
+        lut = UInt16Color3DLUT(self.source.size, self.source.table)
+        inverted = lut.transform(lambda r, g, b: (1 - r, 1 - g, 1 - b))
+        assert isinstance(inverted, UInt16Color3DLUT)
+        reference = self.source.transform(lambda r, g, b: (1 - r, 1 - g, 1 - b))
+        assert numpy.abs(inverted.table - reference.table).max() <= 3 / 65535
+
+    def test_application(self):
+        im = Image.open(resource('files', 'hald.6.hefe.png'))
+        reference = numpy.asarray(im.filter(self.source), dtype=numpy.int16)
+        for cls in [Float16Color3DLUT, UInt16Color3DLUT]:
+            lut = cls(self.source.size, self.source.table)
+            result = numpy.asarray(im.filter(lut), dtype=numpy.int16)
+            assert numpy.abs(result - reference).max() <= 1
+
+    def test_sample(self, monkeypatch):
+        lut = Float16Color3DLUT(self.source.size, self.source.table)
+        calls = []
+        widen = Float16Color3DLUT._widen
+        monkeypatch.setattr(Float16Color3DLUT, '_widen',
+                            lambda self, table: calls.append(1) or widen(self, table))
+        for sample in [sample_lut_linear, sample_lut_cubic]:
+            del calls[:]
+            value = sample(lut, (0.2, 0.5, 0.7))
+            # The table is widened once per point
+            assert len(calls) == 1
+            assert value == pytest.approx(
+                sample(self.source, (0.2, 0.5, 0.7)), abs=1 / 1024)
+
+    def test_pickle(self):
+        lut = UInt16Color3DLUT(self.source.size, self.source.table)
+        restored = pickle.loads(pickle.dumps(lut))
+        assert restored.compact_table.dtype == numpy.uint16
+        self.assertEqualLuts(restored, lut)
+
+    def test_registry_bytes(self):
+        lut = Float16Color3DLUT(self.source.size, self.source.table)
+        assert registry._table_bytes(lut) == 9**3 * 3 * 2
+
+    def test_native(self):
+        with disable_numpy(compact):
+            lut = UInt16Color3DLUT(3, identity_table(3).table.tolist())
+        assert isinstance(lut.table, list)
+        self.assertEqualLuts(lut, identity_table(3))
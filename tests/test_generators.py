@@ -1,8 +1,10 @@
+import warnings
+
 import numpy
 import pytest
 from PIL import Image, ImageFilter
 
-from pillow_lut import generators, identity_table, rgb_color_enhance
+from pillow_lut import generators, identity_table, rgb_color_enhance, selective_color
 
 from . import PillowTestCase, disable_numpy
 
@@ -16,6 +18,27 @@ class TestUtils(PillowTestCase):
             assert x == pytest.approx(
                 generators._srgb_to_linear(generators._linear_to_srgb(x)))
 
+    def test_linear_numpy(self):
+        x = numpy.linspace(-0.5, 1.5, 201)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            lin = generators._srgb_to_linear_numpy(x)
+            srgb = generators._linear_to_srgb_numpy(x)
+        assert lin.tolist() == pytest.approx(
+            [generators._srgb_to_linear(v) for v in x.tolist()])
+        assert srgb.tolist() == pytest.approx(
+            [generators._linear_to_srgb(v) for v in x.tolist()])
+
+    def test_hsv_numpy(self):
+        rgb = identity_table(9).table.reshape(-1, 3).T
+        hsv = generators._rgb_to_hsv_numpy(*rgb)
+        for i in range(rgb.shape[1]):
+            point = [float(x[i]) for x in rgb]
+            assert [x[i] for x in hsv] == pytest.approx(
+                generators._rgb_to_hsv(*point))
+        for left, right in zip(rgb, generators._hsv_to_rgb_numpy(*hsv)):
+            assert list(left) == pytest.approx(list(right))
+
     def test_rgb_to_hsv_stability(self):
         for r in range(0, 256):
             rgb = (r / 255.0, 0.875, 0.8)
@@ -42,6 +65,18 @@ class TestUtils(PillowTestCase):
 class TestRgbColorEnhance(PillowTestCase):
     identity = identity_table(5)
 
+    def test_dtype(self):
+        kwargs = dict(exposure=0.2, contrast=0.1, saturation=0.3, warmth=0.5,
+                      vibrance=0.4, hue=0.05, gamma=1.1, linear=True)
+        lut64 = rgb_color_enhance(9, dtype='float64', **kwargs)
+        assert lut64.table.dtype == numpy.float64
+        with disable_numpy(generators):
+            lut_native = rgb_color_enhance(9, **kwargs)
+        self.assertAlmostEqualLuts(lut64, lut_native, 30)
+
+        lut64 = rgb_color_enhance(lut64, brightness=0.1, dtype='float64')
+        assert lut64.table.dtype == numpy.float64
+
     def test_wrong_args(self):
         lut_4c = ImageFilter.Color3DLUT.generate(
             3, channels=4, callback=lambda a, b, c: (a, b, c, 1))
@@ -192,6 +227,8 @@ class TestRgbColorEnhance(PillowTestCase):
 
         lut_numpy = rgb_color_enhance(source, exposure=0.3, warmth=1)
         self.assertEqualLuts(lut_numpy, lut_ref)
+        # The source is not changed
+        self.assertEqualLuts(source, rgb_color_enhance(5, saturation=0.5))
 
         with disable_numpy(generators):
             lut_native = rgb_color_enhance(source, exposure=0.3, warmth=1)
@@ -226,6 +263,13 @@ class TestRgbColorEnhance(PillowTestCase):
         self.assertAlmostEqualLuts(lut_numpy, lut_native, 10)
         self.assertNotEqualLutTables(lut_numpy, lut_native)
 
+    def test_numpy_hue(self):
+        lut_numpy = rgb_color_enhance(9, hue=0.3, saturation=0.2)
+        assert isinstance(lut_numpy.table, numpy.ndarray)
+        with disable_numpy(generators):
+            lut_native = rgb_color_enhance(9, hue=0.3, saturation=0.2)
+        assert list(lut_numpy.table) == pytest.approx(lut_native.table, abs=1e-6)
+
     def test_application(self):
         im = Image.new('RGB', (10, 10))
 
@@ -248,7 +292,106 @@ class TestRgbColorEnhance(PillowTestCase):
         assert isinstance(lut_native.table, list)
 
 
+class TestSelectiveColor(PillowTestCase):
+    reds = {'hue': 'reds', 'hue_shift': 0.05, 'saturation': -0.5}
+
+    def test_dtype(self):
+        ranges = [{'hue': 'reds', 'hue_shift': 0.1, 'saturation': 0.5}]
+        lut64 = selective_color(9, ranges, dtype='float64')
+        assert lut64.table.dtype == numpy.float64
+        with disable_numpy(generators):
+            lut_native = selective_color(9, ranges)
+        self.assertAlmostEqualLuts(lut64, lut_native, 30)
+
+    def test_wrong_args(self):
+        with pytest.raises(ValueError, match="Unknown color range parameters"):
+            selective_color(3, [{'hue': 0, 'brightness': 0.1}])
+        with pytest.raises(ValueError, match="Unknown hue name"):
+            selective_color(3, [{'hue': 'oranges'}])
+        with pytest.raises(ValueError, match="Hue should be"):
+            selective_color(3, [{'hue': 1.1}])
+        with pytest.raises(ValueError, match="Width should be"):
+            selective_color(3, [{'width': 0}])
+        with pytest.raises(ValueError, match="Hue shift should be"):
+            selective_color(3, [{'hue_shift': 0.6}])
+        with pytest.raises(ValueError, match="Saturation should be"):
+            selective_color(3, [{'saturation': -1.1}])
+        with pytest.raises(ValueError, match="Value should be"):
+            selective_color(3, [{'value': 1.1}])
+        with pytest.raises(ValueError, match="3-channels"):
+            selective_color(identity_table(3, cls=ImageFilter.Color3DLUT)
+                            .transform(lambda r, g, b: (r, g, b, 1), channels=4),
+                            [self.reds])
+
+    def test_no_ranges(self):
+        self.assertAlmostEqualLuts(selective_color(5, []), identity_table(5))
+        self.assertAlmostEqualLuts(
+            selective_color(5, [{'hue': 'greens'}]), identity_table(5))
+
+    def test_selected_hues(self):
+        lut = selective_color(9, [self.reds])
+        identity = identity_table(9)
+        table = numpy.asarray(lut.table).reshape(-1, 3)
+        h, s, v = generators._rgb_to_hsv_numpy(*identity.table.reshape(-1, 3).T)
+        distance = numpy.abs((h + 0.5) % 1 - 0.5)
+        changed = numpy.abs(table - identity.table.reshape(-1, 3)).max(axis=1) > 1e-6
+
+        assert changed.any()
+        # Grays and colors far from reds are not changed
+        assert not changed[s == 0].any()
+        assert not changed[distance >= 1 / 6].any()
+
+        # Pure red is desaturated and shifted to yellow
+        red = table[8]
+        assert red[0] == pytest.approx(1)
+        assert red[1] == pytest.approx(1 - (1 - 0.05 * 6) * 0.5)
+        assert red[2] == pytest.approx(0.5)
+
+    def test_value_and_width(self):
+        lut = selective_color(5, [{'hue': 2 / 3, 'width': 0.01, 'value': -0.5}])
+        table = numpy.asarray(lut.table).reshape(5, 5, 5, 3)
+        assert list(table[4, 0, 0]) == pytest.approx([0, 0, 0.5])
+        assert list(table[4, 1, 0]) == pytest.approx([0, 0.25, 1])
+        assert list(table[4, 4, 4]) == pytest.approx([1, 1, 1])
+
+    def test_source_lut(self):
+        self.assertEqualLuts(selective_color(identity_table(5), [self.reds]),
+                             selective_color(5, [self.reds]))
+
+        source = rgb_color_enhance(5, saturation=0.5)
+        table = source.table.copy()
+        lut = selective_color(source, [self.reds])
+        assert (source.table == table).all()
+        self.assertNotEqualLutTables(lut, source)
+
+    def test_numpy_correctness(self):
+        ranges = [self.reds, {'hue': 0.6, 'width': 0.1, 'value': 0.2},
+                  {'hue': 'greens', 'saturation': 3}]
+        lut_numpy = selective_color(13, ranges)
+        with disable_numpy(generators):
+            lut_native = selective_color(13, ranges)
+        assert isinstance(lut_native.table, list)
+        assert list(lut_numpy.table) == pytest.approx(lut_native.table, abs=1e-6)
+
+        source = rgb_color_enhance(5, exposure=0.3)
+        lut_numpy = selective_color(source, ranges)
+        with disable_numpy(generators):
+            lut_native = selective_color(source, ranges)
+        assert list(lut_numpy.table) == pytest.approx(lut_native.table, abs=1e-6)
+
+    def test_application(self):
+        im = Image.new('RGB', (10, 10), 'red')
+        assert im.filter(selective_color(5, [self.reds])).getpixel((0, 0)) \
+            == (255, 166, 127)
+
+
 class TestIdentityTable(PillowTestCase):
+    def test_dtype(self):
+        assert identity_table(3).table.dtype == numpy.float32
+        assert identity_table(3, dtype='float64').table.dtype == numpy.float64
+        with pytest.raises(ValueError, match="float32 and float64"):
+            identity_table(3, dtype='float16')
+
     def test_different_dimensions(self):
         lut_ref = ImageFilter.Color3DLUT.generate((4, 5, 6),
                                                   lambda a, b, c: (a, b, c))
@@ -0,0 +1,228 @@
+import numpy
+import pytest
+from PIL import Image, __version__ as pillow_version
+
+from pillow_lut import apply_lut_to_image, images, iter_apply_lut, rgb_color_enhance
+
+from . import PillowTestCase, disable_numpy, resource
+
+
+class TestIterApplyLut(PillowTestCase):
+    lut = rgb_color_enhance(9, exposure=0.3, saturation=0.2)
+
+    def frames(self):
+        im = Image.open(resource('files', 'hald.6.hefe.png')).convert('RGB')
+        return [im.rotate(angle) for angle in range(0, 360, 30)]
+
+    def test_images(self):
+        frames = self.frames()
+        results = list(iter_apply_lut(self.lut, frames, workers=3, prefetch=2))
+        assert len(results) == len(frames)
+        for frame, result in zip(frames, results):
+            assert isinstance(result, Image.Image)
+            assert result.tobytes() == frame.filter(self.lut).tobytes()
+
+    def test_arrays(self):
+        frames = self.frames()
+        arrays = [numpy.asarray(frame) for frame in frames]
+        results = list(iter_apply_lut(self.lut, arrays, workers=2))
+        for frame, result in zip(frames, results):
+            assert isinstance(result, numpy.ndarray)
+            assert result.shape == (216, 216, 3)
+            assert (result == numpy.asarray(frame.filter(self.lut))).all()
+
+        # Not contiguous
+        result = next(iter_apply_lut(self.lut, [arrays[0][:, ::2]]))
+        expected = Image.fromarray(arrays[0][:, ::2].copy()).filter(self.lut)
+        assert (result == numpy.asarray(expected)).all()
+
+    def test_bytes(self):
+        frames = [frame.convert('RGBA') for frame in self.frames()]
+        raw = [frame.tobytes() for frame in frames]
+        results = list(iter_apply_lut(self.lut, iter(raw), size=(216, 216),
+                                      mode='RGBA'))
+        for frame, result in zip(frames, results):
+            assert result == frame.filter(self.lut).tobytes()
+
+        with pytest.raises(ValueError, match="size is required"):
+            list(iter_apply_lut(self.lut, raw))
+
+        with disable_numpy(images):
+            results = list(iter_apply_lut(self.lut, raw, size=(216, 216),
+                                          mode='RGBA'))
+        assert results[0] == frames[0].filter(self.lut).tobytes()
+
+    def test_stats(self):
+        stats = {}
+        for i, _ in enumerate(iter_apply_lut(self.lut, self.frames(),
+                                             workers=2, stats=stats)):
+            assert stats['frames'] == i + 1
+        assert stats['frames'] == 12
+        assert stats['seconds'] > 0
+        assert stats['fps'] == pytest.approx(12 / stats['seconds'])
+
+        stats = {'frames': 10}
+        assert list(iter_apply_lut(self.lut, [], stats=stats)) == []
+        assert stats == {'frames': 0, 'seconds': 0.0, 'fps': 0.0}
+
+    def test_lazy(self):
+        taken = []
+
+        def frames():
+            for frame in self.frames():
+                taken.append(frame)
+                yield frame
+
+        results = iter_apply_lut(self.lut, frames(), workers=1, prefetch=3)
+        next(results)
+        assert len(taken) == 3
+        next(results)
+        assert len(taken) == 4
+
+
+class TestApplyLutToImage(PillowTestCase):
+    lut = rgb_color_enhance(9, exposure=0.3, saturation=0.2, hue=0.1)
+
+    def source(self):
+        return Image.open(resource('files', 'hald.6.hefe.png')).convert('RGB')
+
+    def assertCloseImages(self, left, right):
+        assert left.mode == right.mode
+        assert left.size == right.size
+        diff = numpy.abs(numpy.asarray(left, dtype=numpy.int16) -
+                         numpy.asarray(right, dtype=numpy.int16))
+        assert diff.max() <= 1
+
+    def test_palette(self):
+        im = self.source().quantize(100)
+        im.info['transparency'] = 5
+        result = apply_lut_to_image(im, self.lut)
+        assert result.mode == 'P'
+        assert result.info['transparency'] == 5
+        assert result.tobytes() == im.tobytes()
+        self.assertCloseImages(result.convert('RGB'),
+                               im.convert('RGB').filter(self.lut))
+        # The source is not changed
+        assert im.getpalette() == self.source().quantize(100).getpalette()
+
+        with disable_numpy(images):
+            native = apply_lut_to_image(im, self.lut)
+        assert native.getpalette() == result.getpalette()
+
+    def test_palette_old_pillow(self, monkeypatch):
+        im = self.source().quantize(100)
+        expected = apply_lut_to_image(im, self.lut)
+
+        getpalette = Image.Image.getpalette
+        monkeypatch.setattr(Image.Image, 'getpalette',
+                            lambda self: getpalette(self))
+        result = apply_lut_to_image(im, self.lut)
+        assert result.tobytes() == expected.tobytes()
+        assert result.im.getpalette() == expected.im.getpalette()
+
+    @pytest.mark.skipif(
+        tuple(map(int, pillow_version.split('.')[:2])) < (9, 1),
+        reason="quantize() makes RGBA palettes in recent Pillow only")
+    def test_rgba_palette(self):
+        im = self.source().convert('RGBA')
+        im.putalpha(Image.linear_gradient('L').resize(im.size))
+        im = im.quantize(50)
+        assert im.palette.mode == 'RGBA'
+        result = apply_lut_to_image(im, self.lut)
+        assert result.mode == 'P'
+        self.assertCloseImages(result.convert('RGBA'),
+                               im.convert('RGBA').filter(self.lut))
+
+    def test_few_colors(self):
+        im = self.source().quantize(200).convert('RGB')
+        result = apply_lut_to_image(im, self.lut)
+        self.assertCloseImages(result, im.filter(self.lut))
+
+        im = im.convert('RGBA')
+        im.putalpha(Image.linear_gradient('L').resize(im.size))
+        result = apply_lut_to_image(im, self.lut)
+        self.assertCloseImages(result, im.filter(self.lut))
+
+    def test_few_colors_small(self, monkeypatch):
+        im = self.source().quantize(200).convert('RGB')
+        im = im.resize((100, 100), Image.NEAREST)
+        assert im.width * im.height < images._DENSE_INDEX_MIN_PIXELS
+        result = apply_lut_to_image(im, self.lut)
+        self.assertCloseImages(result, im.filter(self.lut))
+
+        monkeypatch.setattr(images, '_DENSE_INDEX_MIN_PIXELS', 0)
+        assert apply_lut_to_image(im, self.lut).tobytes() == result.tobytes()
+
+    def test_many_colors(self):
+        im = self.source()
+        assert apply_lut_to_image(im, self.lut).tobytes() == \
+            im.filter(self.lut).tobytes()
+
+        im = im.quantize(200).convert('RGB')
+        result = apply_lut_to_image(im, self.lut, max_colors=100)
+        assert result.tobytes() == im.filter(self.lut).tobytes()
+
+        with pytest.raises(ValueError, match="from 0 to 256"):
+            apply_lut_to_image(im, self.lut, max_colors=1000)
+
+    def test_fallback(self):
+        im = self.source().quantize(100)
+        lut = rgb_color_enhance(5, saturation=0.2).transform(
+            lambda r, g, b: (r, g, b, g), channels=4, target_mode='RGBA')
+        result = apply_lut_to_image(im, lut)
+        assert result.mode == 'RGBA'
+        assert result.tobytes() == im.convert('RGB').filter(lut).tobytes()
+
+        im = self.source().convert('L')
+        with pytest.raises(ValueError):
+            apply_lut_to_image(im, self.lut)
+
+    def noisy(self, levels):
+        # A few thousand colors, each is repeated in many pixels
+        pixels = numpy.asarray(self.source().quantize(64).convert('RGB'))
+        noise = numpy.random.RandomState(0).randint(
+            0, levels, pixels.shape).astype(numpy.uint8)
+        return Image.fromarray(pixels + noise)
+
+    def test_histogram(self):
+        im = self.noisy(3)
+        assert im.getcolors(256) is None
+        result = apply_lut_to_image(im, self.lut, histogram=True)
+        self.assertCloseImages(result, im.filter(self.lut))
+
+        im = im.convert('RGBA')
+        im.putalpha(Image.linear_gradient('L').resize(im.size))
+        result = apply_lut_to_image(im, self.lut, histogram=True)
+        self.assertCloseImages(result, im.filter(self.lut))
+
+        im = self.source()
+        result = apply_lut_to_image(im, self.lut, histogram=True)
+        self.assertCloseImages(result, im.filter(self.lut))
+
+        assert apply_lut_to_image(im, self.lut, histogram=False).tobytes() == \
+            im.filter(self.lut).tobytes()
+
+    def test_histogram_auto(self, monkeypatch):
+        calls = []
+
+        def apply_histogram(image, lut):
+            calls.append(image)
+            return image.filter(lut)
+
+        monkeypatch.setattr(images, '_apply_histogram', apply_histogram)
+        few, many = self.noisy(2), self.noisy(32)
+        assert images._few_colors(few)
+        assert not images._few_colors(many)
+
+        # Small images are filtered
+        apply_lut_to_image(few, self.lut)
+        assert calls == []
+
+        monkeypatch.setattr(images, '_HISTOGRAM_MIN_PIXELS', 1000)
+        apply_lut_to_image(few, self.lut)
+        apply_lut_to_image(many, self.lut)
+        assert calls == [few]
+
+        with disable_numpy(images):
+            apply_lut_to_image(few, self.lut, histogram=True)
+        assert calls == [few]
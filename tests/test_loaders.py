@@ -1,13 +1,17 @@
 import os
+import shutil
 from tempfile import NamedTemporaryFile
 
 import numpy
 import pytest
 from PIL import Image, ImageFilter
 
-from pillow_lut import identity_table, load_cube_file, load_hald_image, loaders
+from pillow_lut import (
+    Color1DLUT, SharedColor3DLUT, generators, identity_table, load_3dl_file,
+    load_csp_file, load_cube_file, load_hald_image, load_lut_directory, loaders,
+    operations, shared)
 
-from . import PillowTestCase, disable_numpy, resource
+from . import PillowTestCase, disable_numpy, resource, write_broken_cube, write_cube
 
 
 class TestLoadCubeFile(PillowTestCase):
@@ -74,7 +78,7 @@ class TestLoadCubeFile(PillowTestCase):
                 "0.96 0 0.031 1",
             ] * 3)
 
-        with pytest.raises(ValueError, match="1D LUT cube files"):
+        with pytest.raises(ValueError, match="number of colors on line 3"):
             load_cube_file([
                 'LUT_1D_SIZE 2',
             ] + [
@@ -90,6 +94,115 @@ class TestLoadCubeFile(PillowTestCase):
                 "0.96 0 0.031",
             ] * 3)
 
+    def test_1d(self):
+        lut = load_cube_file([
+            'TITLE "1D LUT"',
+            "LUT_1D_SIZE 3",
+            "DOMAIN_MIN 0 0 0.5",
+            "DOMAIN_MAX 1 2 1",
+            "0    0 0.031",
+            "0.5  1 0.5",
+            "0.96 1 0.931",
+        ])
+        assert isinstance(lut, Color1DLUT)
+        assert lut.size == 3
+        assert lut.name == "1D LUT"
+        assert lut.domain_min == (0, 0, 0.5)
+        assert lut.domain_max == (1, 2, 1)
+        assert lut.table == [0, 0, 0.031,  0.5, 1, 0.5,  0.96, 1, 0.931]
+
+        lut = load_cube_file([
+            "LUT_1D_SIZE 2",
+            "LUT_1D_INPUT_RANGE -0.5 1.5",
+            "0 0 0",
+            "1 1 1",
+        ])
+        assert lut.domain_min == (-0.5, -0.5, -0.5)
+        assert lut.domain_max == (1.5, 1.5, 1.5)
+
+        with pytest.raises(ValueError, match="Actual length: 12"):
+            load_cube_file([
+                "LUT_1D_SIZE 2",
+                "0 0 0",
+                "0.5 0.5 0.5",
+                "0.7 0.7 0.7",
+                "1 1 1",
+            ])
+
+    def test_shaper(self):
+        lines = [
+            "LUT_1D_SIZE 3",
+            "LUT_3D_SIZE 3",
+            "0   0   0",
+            "0.7 0.7 0.7",
+            "1   1   1",
+        ] + [
+            "{} {} {}".format(r * r / 4, g * g / 4, b * b / 4)
+            for b in range(3) for g in range(3) for r in range(3)
+        ]
+        lut = load_cube_file(lines, target_mode='HSV')
+        assert isinstance(lut, ImageFilter.Color3DLUT)
+        assert tuple(lut.size) == (3, 3, 3)
+        assert lut.mode == 'HSV'
+        assert lut.table[3] == pytest.approx(0.25 + 0.4 * 0.75)
+
+        lut = load_cube_file(lines, target_size=(5, 6, 7))
+        assert tuple(lut.size) == (5, 6, 7)
+
+    def test_domain(self):
+        def cube(size, low, high, func):
+            nodes = [low + (high - low) * x / (size - 1) for x in range(size)]
+            return [
+                "{} {} {}".format(*func(r, g, b))
+                for b in nodes for g in nodes for r in nodes
+            ]
+
+        lines = [
+            "LUT_3D_SIZE 33",
+            "DOMAIN_MIN -0.5 -0.5 -0.5",
+            "DOMAIN_MAX 1.5 1.5 1.5",
+        ] + cube(33, -0.5, 1.5, lambda r, g, b: (r * r, g + b, b))
+        reference = ImageFilter.Color3DLUT.generate(
+            9, lambda r, g, b: (r * r, g + b, b))
+
+        lut_numpy = load_cube_file(lines, target_mode='HSV')
+        assert tuple(lut_numpy.size) == (33, 33, 33)
+        assert lut_numpy.mode == 'HSV'
+        lut_numpy = load_cube_file(lines, target_size=9)
+        self.assertAlmostEqualLuts(lut_numpy, reference, 8)
+
+        with disable_numpy(operations):
+            lut_native = load_cube_file(lines, target_size=9)
+        self.assertAlmostEqualLuts(lut_native, lut_numpy)
+
+        lut = load_cube_file([
+            "LUT_3D_SIZE 5",
+            "DOMAIN_MIN 0.25 0.25 0.25",
+            "DOMAIN_MAX 0.75 0.75 0.75",
+        ] + cube(5, 0.25, 0.75, lambda r, g, b: (r, g, b)))
+        assert list(lut.table[:3]) == [0.25, 0.25, 0.25]
+        assert list(lut.table[-3:]) == [0.75, 0.75, 0.75]
+
+        with pytest.raises(ValueError, match="Domain max"):
+            load_cube_file([
+                "LUT_3D_SIZE 2",
+                "DOMAIN_MAX 1 0 1",
+            ] + cube(2, 0, 1, lambda r, g, b: (r, g, b)))
+
+    def test_shaper_domain(self):
+        lut = load_cube_file([
+            "LUT_1D_SIZE 2",
+            "LUT_3D_SIZE 2",
+            "LUT_1D_INPUT_RANGE 0 2",
+            "LUT_3D_INPUT_RANGE 0 4",
+            "0 0 0",
+            "4 4 4",
+        ] + [
+            "{} {} {}".format(r, g, b)
+            for b in range(2) for g in range(2) for r in range(2)
+        ], target_size=3)
+        assert list(lut.table[:9]) == [0, 0, 0, 0.25, 0, 0, 0.5, 0, 0]
+
     def test_filename(self):
         with NamedTemporaryFile('w+t', delete=False) as f:
             f.write(
@@ -133,6 +246,146 @@ class TestLoadCubeFile(PillowTestCase):
         assert isinstance(lut.table, list)
 
 
+class TestLoad3dlFile(PillowTestCase):
+    @staticmethod
+    def lines(size, depth, func, mesh=None):
+        if mesh is None:
+            mesh = [round(i * 1023 / (size - 1)) for i in range(size)]
+        nodes = [x / (size - 1) for x in range(size)]
+        scale = (1 << depth) - 1
+        return [" ".join(str(x) for x in mesh)] + [
+            " ".join(str(round(v * scale)) for v in func(r, g, b))
+            for r in nodes for g in nodes for b in nodes
+        ]
+
+    def test_minimal(self):
+        lut = load_3dl_file([
+            "0 1023",
+            "0 0 0",
+            "0 0 1023",
+            "0 1023 0",
+            "0 1023 1023",
+            "1023 0 0",
+            "1023 0 1023",
+            "1023 1023 0",
+            "1023 1023 1023",
+        ], target_mode='HSV')
+        assert isinstance(lut, ImageFilter.Color3DLUT)
+        assert tuple(lut.size) == (2, 2, 2)
+        assert lut.mode == 'HSV'
+        self.assertEqualLuts(lut, identity_table(2))
+
+    def test_correctness(self):
+        func = lambda r, g, b: (r * r, g, (r + b) / 2)  # noqa: E731
+        reference = ImageFilter.Color3DLUT.generate(9, func)
+        for depth, lines in [
+            (12, ["3DMESH", "Mesh 3 12"] + self.lines(9, 12, func)),
+            (12, ["# Comment"] + self.lines(9, 12, func) + ["LUT8", "gamma 1.0"]),
+            (16, self.lines(9, 16, func)),
+        ]:
+            lut_numpy = load_3dl_file(lines)
+            self.assertAlmostEqualLuts(lut_numpy, reference, depth - 2)
+
+            with disable_numpy(loaders):
+                lut_native = load_3dl_file(lines)
+            self.assertAlmostEqualLuts(lut_native, lut_numpy)
+
+    def test_nonuniform_mesh(self):
+        mesh = [0, 100, 300, 1023]
+        lines = ["0 100 300 1023"] + [
+            "{} {} {}".format(r, g, b) for r in mesh for g in mesh for b in mesh
+        ]
+        lut = load_3dl_file(lines, target_size=5)
+        assert tuple(lut.size) == (5, 5, 5)
+        assert lut.table[3] == pytest.approx(0.25, abs=1e-6)
+        assert lut.table[-3] == pytest.approx(1.0)
+
+        lut = load_3dl_file(self.lines(4, 10, lambda r, g, b: (r, g, b)),
+                            target_size=5)
+        assert tuple(lut.size) == (4, 4, 4)
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match="No input mesh"):
+            load_3dl_file(["3DMESH", "Mesh 1 10"])
+
+        with pytest.raises(ValueError, match="should have 24 items"):
+            load_3dl_file(["0 1023"] + ["0 0 0"] * 7)
+
+        with pytest.raises(ValueError, match="Not a number"):
+            load_3dl_file(["0 1023"] + ["0 0 0"] * 7 + ["0 0 x"])
+
+        with pytest.raises(ValueError, match="too big"):
+            load_3dl_file(["0 1023"] + ["0 0 0"] * 7 + ["0 0 65536"])
+
+    def test_filename(self):
+        with NamedTemporaryFile('w+t', delete=False) as f:
+            f.write("\n".join(self.lines(3, 10, lambda r, g, b: (r, g, b))))
+
+        try:
+            lut = load_3dl_file(f.name)
+            self.assertAlmostEqualLuts(lut, identity_table(3), 8)
+        finally:
+            os.unlink(f.name)
+
+
+class TestLoadCspFile(PillowTestCase):
+    @staticmethod
+    def lines(size, func, prelut=("2", "0 1", "0 1")):
+        nodes = [x / (size - 1) for x in range(size)]
+        return [
+            "CSPLUTV100",
+            "3D",
+            "",
+            "BEGIN METADATA",
+            "3 3 3",
+            "END METADATA",
+        ] + list(prelut) * 3 + [
+            "{0} {0} {0}".format(size),
+        ] + [
+            " ".join(str(v) for v in func(r, g, b))
+            for b in nodes for g in nodes for r in nodes
+        ]
+
+    def test_correctness(self):
+        func = lambda r, g, b: (r * r, g, (r + b) / 2)  # noqa: E731
+        reference = ImageFilter.Color3DLUT.generate(5, func)
+        lines = self.lines(5, func)
+
+        lut_numpy = load_csp_file(lines, target_mode='HSV')
+        assert lut_numpy.mode == 'HSV'
+        self.assertAlmostEqualLuts(lut_numpy, reference)
+
+        with disable_numpy(loaders):
+            lut_native = load_csp_file(lines)
+        assert isinstance(lut_native.table, list)
+        self.assertAlmostEqualLuts(lut_native, lut_numpy)
+
+    def test_prelut(self):
+        lines = self.lines(3, lambda r, g, b: (r, g, b),
+                           ("3", "0 0.5 2", "0 0.5 1"))
+        lut_numpy = load_csp_file(lines, target_size=(3, 4, 5))
+        assert tuple(lut_numpy.size) == (3, 4, 5)
+        assert list(lut_numpy.table[3:6]) == [0.5, 0, 0]
+        assert list(lut_numpy.table[-3:]) == pytest.approx([2/3, 2/3, 2/3])
+
+        with disable_numpy(loaders):
+            lut_native = load_csp_file(lines, target_size=(3, 4, 5))
+        self.assertAlmostEqualLuts(lut_native, lut_numpy)
+
+    def test_errors(self):
+        with pytest.raises(ValueError, match="Not a CSP file"):
+            load_csp_file(["LUT_3D_SIZE 2"])
+
+        with pytest.raises(ValueError, match="Only 3D"):
+            load_csp_file(["CSPLUTV100", "1D"])
+
+        with pytest.raises(ValueError, match="Wrong prelut"):
+            load_csp_file(["CSPLUTV100", "3D", "2", "0 1", "0 1"])
+
+        with pytest.raises(ValueError, match="should have 24 items"):
+            load_csp_file(self.lines(2, lambda r, g, b: (r, g, b))[:-1])
+
+
 class TestLoadHaldImage(PillowTestCase):
     def test_wrong_size(self):
         with pytest.raises(ValueError, match="should be a square"):
@@ -167,8 +420,47 @@ class TestLoadHaldImage(PillowTestCase):
 
         with disable_numpy(loaders):
             lut_pillow = load_hald_image(image)
+        with disable_numpy(generators):
+            identity = identity_table(16)
         self.assertEqualLuts(lut_pillow, identity)
 
+    def test_high_precision(self):
+        identity = identity_table(16)
+        image = numpy.asarray(Image.open(resource('files', 'hald.4.png')))
+
+        lut = load_hald_image(image)
+        self.assertEqualLuts(lut, identity)
+
+        array = image.astype(numpy.uint16) * 257
+        lut = load_hald_image(array, target_mode='HSV')
+        assert lut.mode == 'HSV'
+        self.assertEqualLuts(lut, identity)
+
+        array = (array.astype(numpy.float32) / 65535).astype(numpy.float64)
+        lut = load_hald_image(array)
+        self.assertAlmostEqualLuts(lut, identity)
+
+        array = array.astype(numpy.float32)
+        lut = load_hald_image(array)
+        assert numpy.shares_memory(lut.table, array)
+
+        with pytest.raises(ValueError, match="Unsupported data type"):
+            load_hald_image(image.astype(numpy.int16))
+
+        with pytest.raises(ValueError, match="3 dimensions"):
+            load_hald_image(image[:, :, 0])
+
+    def test_4_channels(self):
+        image = Image.open(resource('files', 'hald.4.png')).convert('RGBA')
+
+        lut_numpy = load_hald_image(image)
+        assert lut_numpy.channels == 4
+        assert list(lut_numpy.table[-4:]) == [1, 1, 1, 1]
+
+        with disable_numpy(loaders):
+            lut_native = load_hald_image(image)
+        self.assertAlmostEqualLuts(lut_native, lut_numpy)
+
     def test_application(self):
         im = Image.new('RGB', (10, 10))
         hald = Image.open(resource('files', 'hald.4.png'))
@@ -181,3 +473,66 @@ class TestLoadHaldImage(PillowTestCase):
             lut_native = load_hald_image(hald)
         im.filter(lut_native)
         assert isinstance(lut_native.table, list)
+
+
+class TestLoadLutDirectory(PillowTestCase):
+    @pytest.fixture(autouse=True)
+    def directory(self, tmp_path):
+        self.path = str(tmp_path)
+        for name in ['hald.4.png', 'hald.6.hefe.png']:
+            shutil.copy(resource('files', name), self.path)
+        write_cube(os.path.join(self.path, 'identity.cube'), 2)
+        with open(os.path.join(self.path, 'readme.txt'), 'w') as f:
+            f.write("Not a table")
+
+    def test_load(self):
+        write_broken_cube(self.path)
+        luts, errors = load_lut_directory(self.path, workers=2)
+        assert sorted(luts) == ['hald.4', 'hald.6.hefe', 'identity']
+        assert sorted(errors) == ['broken']
+        assert isinstance(errors['broken'], ValueError)
+
+        self.assertAlmostEqualLuts(
+            luts['hald.4'], load_hald_image(resource('files', 'hald.4.png')))
+        self.assertAlmostEqualLuts(luts['identity'], identity_table(2))
+        assert tuple(luts['hald.6.hefe'].size) == (36, 36, 36)
+
+    def test_same_name(self):
+        shutil.copy(resource('files', 'hald.4.png'),
+                    os.path.join(self.path, 'identity.png'))
+        luts, errors = load_lut_directory(self.path, workers=1)
+        assert sorted(luts) == ['hald.4', 'hald.6.hefe']
+        assert sorted(errors) == ['identity']
+        assert isinstance(errors['identity'], ValueError)
+        assert "identity.cube, identity.png" in str(errors['identity'])
+
+    def test_pattern(self):
+        luts, errors = load_lut_directory(self.path, '*.png', workers=1,
+                                          target_mode='RGBA')
+        assert sorted(luts) == ['hald.4', 'hald.6.hefe']
+        assert errors == {}
+        assert luts['hald.4'].mode == 'RGBA'
+
+    @pytest.mark.skipif(shared.shared_memory is None,
+                        reason="multiprocessing.shared_memory is not available")
+    def test_shared(self):
+        luts, errors = load_lut_directory(self.path, '*.png', workers=2,
+                                          cls=SharedColor3DLUT)
+        assert sorted(luts) == ['hald.4', 'hald.6.hefe']
+        lut = luts['hald.4']
+        assert isinstance(lut, SharedColor3DLUT)
+        assert lut.is_owner
+        self.assertAlmostEqualLuts(
+            lut, load_hald_image(resource('files', 'hald.4.png')))
+
+        name = lut.shared_name
+        for lut in luts.values():
+            lut.release()
+        with pytest.raises(FileNotFoundError):
+            shared.shared_memory.SharedMemory(name=name)
+
+    def test_native(self):
+        with disable_numpy(loaders):
+            luts, errors = load_lut_directory(self.path, '*.cube')
+        assert sorted(luts) == ['identity']
+        assert isinstance(luts['identity'].table, list)
@@ -0,0 +1,62 @@
+import numpy
+import pytest
+from PIL import Image
+
+from pillow_lut import Color1DLUT, lut1d
+
+from . import PillowTestCase, disable_numpy
+
+
+class TestColor1DLUT(PillowTestCase):
+    def test_wrong_args(self):
+        with pytest.raises(ValueError, match="should be in"):
+            Color1DLUT(1, [0, 0, 0])
+
+        with pytest.raises(ValueError, match="should be: 3x2"):
+            Color1DLUT(2, [0, 0, 0, 1, 1])
+
+        with pytest.raises(ValueError, match="should be: 3x2"):
+            Color1DLUT(2, numpy.zeros((3, 2)))
+
+        with pytest.raises(ValueError, match="length of 3"):
+            Color1DLUT(2, [(0, 0, 0), (1, 1)])
+
+        with pytest.raises(ValueError, match="Domain max"):
+            Color1DLUT(2, [0, 0, 0, 1, 1, 1], domain_max=(1, 0, 1))
+
+    def test_correct_args(self):
+        lut = Color1DLUT(2, [(0, 0, 0), (1, 1, 1)])
+        assert lut.size == 2
+        assert lut.channels == 3
+        assert lut.table == [0, 0, 0, 1, 1, 1]
+        assert lut.domain_min == (0, 0, 0)
+        assert lut.domain_max == (1, 1, 1)
+
+        lut = Color1DLUT(2, numpy.zeros((2, 3)))
+        assert lut.table.shape == (6,)
+
+        assert repr(lut) == "<Color1DLUT from ndarray size=2>"
+
+    def test_application(self):
+        lut = Color1DLUT(3, [0, 0, 0,  0.25, 0.5, 1,  1, 1, 1],
+                         domain_max=(2, 2, 2))
+        im = Image.new('RGB', (10, 10), (255, 128, 10))
+
+        assert im.filter(lut).getpixel((0, 0)) == (64, 64, 10)
+        with disable_numpy(lut1d):
+            assert im.filter(lut).getpixel((0, 0)) == (64, 64, 10)
+
+        im = Image.new('RGBA', (10, 10), (255, 128, 10, 7))
+        assert im.filter(lut).getpixel((0, 0)) == (64, 64, 10, 7)
+
+        with pytest.raises(ValueError, match="3 or 4 band"):
+            Image.new('L', (10, 10)).filter(lut)
+
+    def test_clamping(self):
+        lut = Color1DLUT(2, [0.1, 0.2, 0.3,  0.5, 0.6, 0.7],
+                         domain_min=(0.2, 0.2, 0.2), domain_max=(0.8, 0.8, 0.8))
+        im = Image.new('RGB', (10, 10), (0, 128, 255))
+
+        assert im.filter(lut).getpixel((0, 0)) == (26, 102, 179)
+        with disable_numpy(lut1d):
+            assert im.filter(lut).getpixel((0, 0)) == (26, 102, 179)
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+from PIL import Image
+
+from pillow_lut import (
+    identity_table, load_cube_file, load_hald_image, resize_lut, rgb_color_enhance,
+    save_cube_file, transform_lut)
+from pillow_lut.__main__ import main
+
+from . import PillowTestCase, resource, write_broken_cube
+
+
+class TestMain(PillowTestCase):
+    @pytest.fixture(autouse=True)
+    def directory(self, tmp_path):
+        self.path = str(tmp_path)
+        self.luts = {
+            'bright': rgb_color_enhance(9, brightness=0.1),
+            'warm': rgb_color_enhance(13, warmth=0.3),
+        }
+        for name, lut in self.luts.items():
+            save_cube_file(lut, self.join(name + '.cube'))
+
+    def join(self, *names):
+        return os.path.join(self.path, *names)
+
+    def test_convert(self, capsys):
+        assert main(['convert', self.join('bright.cube'), self.join('warm.cube'),
+                     '-o', self.join('out'), '--format', 'hald',
+                     '--size', '16', '--workers', '2', '--stats']) == 0
+        assert sorted(os.listdir(self.join('out'))) == ['bright.png', 'warm.png']
+        lut = load_hald_image(self.join('out', 'warm.png'))
+        assert tuple(lut.size) == (16, 16, 16)
+
+        err = capsys.readouterr().err
+        assert err.startswith("2 files, 0 failed, ")
+        assert "files/s" in err
+
+    def test_errors(self, capsys):
+        write_broken_cube(self.path)
+        assert main(['convert', self.join('broken.cube'),
+                     self.join('bright.cube'), self.join('missing.cube'),
+                     '-o', self.join('out'), '-f', 'hald']) == 1
+        # Size 9 is valid for Hald image
+        assert os.listdir(self.join('out')) == ['bright.png']
+
+        err = capsys.readouterr().err.splitlines()
+        assert len(err) == 2
+        assert err[0].startswith(self.join('broken.cube') + ": ")
+        assert err[1].startswith(self.join('missing.cube') + ": ")
+
+        with pytest.raises(SystemExit):
+            main(['resize', self.join('bright.cube'), '-o', self.join('out')])
+
+    def test_resize(self):
+        assert main(['resize', self.join('warm.cube'), '-o', self.join('out'),
+                     '--size', '5', '--interp', 'cubic']) == 0
+        self.assertAlmostEqualLuts(
+            load_cube_file(self.join('out', 'warm.cube')),
+            resize_lut(self.luts['warm'], 5, interp=Image.BICUBIC), 10)
+
+    def test_compose(self):
+        output = self.join('composed.cube')
+        assert main(['compose', self.join('bright.cube'),
+                     self.join('warm.cube'), '-o', output]) == 0
+        self.assertAlmostEqualLuts(
+            load_cube_file(output),
+            transform_lut(self.luts['bright'], self.luts['warm']), 12)
+
+    def test_apply(self):
+        names = ['hald.4.png', 'hald.6.hefe.png']
+        for workers in ['1', '2']:
+            outdir = self.join('out' + workers)
+            assert main(['apply', self.join('bright.cube'),
+                         *[resource('files', name) for name in names],
+                         '-o', outdir, '--workers', workers]) == 0
+            for name in names:
+                with Image.open(resource('files', name)) as im:
+                    expected = im.filter(self.luts['bright'])
+                with Image.open(os.path.join(outdir, name)) as result:
+                    assert result.tobytes() == expected.tobytes()
+
+    def test_apply_missing_lut(self, capsys):
+        assert main(['apply', self.join('missing.cube'),
+                     resource('files', 'hald.4.png'),
+                     '-o', self.join('out')]) == 1
+        assert "missing.cube" in capsys.readouterr().err
+
+    def test_compose_workers(self):
+        with pytest.raises(SystemExit):
+            main(['compose', self.join('bright.cube'), self.join('warm.cube'),
+                  '-o', self.join('composed.cube'), '--workers', '2'])
+
+    def test_identity(self):
+        # Tables survive the round trip through the formats
+        save_cube_file(identity_table(16), self.join('identity.cube'))
+        assert main(['convert', self.join('identity.cube'),
+                     '-o', self.join('hald'), '-f', 'hald']) == 0
+        assert main(['convert', self.join('hald', 'identity.png'),
+                     '-o', self.join('cube')]) == 0
+        self.assertAlmostEqualLuts(
+            load_cube_file(self.join('cube', 'identity.cube')),
+            identity_table(16), 10)
@@ -5,8 +5,10 @@ import pytest
 from PIL import Image, ImageFilter
 
 from pillow_lut import (
-    amplify_lut, generators, identity_table, operations, resize_lut, sample_lut_cubic,
-    sample_lut_linear, transform_lut)
+    Color1DLUT, Float16Color3DLUT, amplify_lut, bake_colorspace, blend_luts,
+    fold_shaper_lut, generators, identity_table, invert_lut, lut_fingerprint,
+    lut_sequence, luts_close, operations, optimize_lut_size, resize_lut,
+    sample_lut_cubic, sample_lut_linear, transform_lut, update_lut_region)
 
 from . import PillowTestCase, disable_numpy
 
@@ -144,6 +146,27 @@ class TestResizeLut(PillowTestCase):
         with pytest.raises(ValueError, match="interpolations"):
             resize_lut(identity_table(4), 5, interp=Image.NEAREST)
 
+    def test_dtype(self):
+        with pytest.raises(ValueError, match="float32 and float64"):
+            resize_lut(self.lut7_in, 5, dtype='int32')
+        with pytest.raises(ValueError, match="float32 and float64"):
+            resize_lut(self.lut7_in, 5, dtype='no such type')
+        with disable_numpy(operations):
+            with pytest.raises(ValueError, match="float32 and float64"):
+                resize_lut(self.lut7_in, 5, dtype='int32')
+            assert isinstance(
+                resize_lut(self.lut7_in, 5, dtype='float64').table, list)
+
+        assert resize_lut(self.lut7_in, 5).table.dtype == numpy.float32
+        lut64 = resize_lut(self.lut7_in, 5, dtype='float64')
+        assert lut64.table.dtype == numpy.float64
+        lut64 = resize_lut(self.lut7_in, 5, interp=Image.BICUBIC,
+                           dtype=numpy.float64)
+        with disable_numpy(operations):
+            lut_native = resize_lut(self.lut7_in, 5, interp=Image.BICUBIC,
+                                    dtype='float64')
+        self.assertAlmostEqualLuts(lut64, lut_native, 40)
+
     def test_correct_args(self):
         result = resize_lut(identity_table((3, 4, 5), target_mode='RGB'),
                             (6, 7, 8))
@@ -170,10 +193,31 @@ class TestResizeLut(PillowTestCase):
             res_native = resize_lut(self.lut9_in, 7)
         self.assertAlmostEqualLuts(res_native, res_numpy)
 
+    def test_correctness_linear_4c(self):
+        res_numpy = resize_lut(self.lut5_4c, (3, 6, 9))
+        with disable_numpy(operations):
+            res_native = resize_lut(self.lut5_4c, (3, 6, 9))
+        self.assertAlmostEqualLuts(res_native, res_numpy)
+
     def test_correctness_cubic(self):
         result = resize_lut(self.lut9_in, 7, interp=Image.BICUBIC)
         self.assertAlmostEqualLuts(result, self.lut7_in, 7)
 
+    def test_separable_passes(self):
+        lut = ImageFilter.Color3DLUT.generate(
+            (5, 6, 7), lambda r, g, b: (r * g, g ** 1.5, b - r * r))
+        for interp, sample_lut in [(Image.BILINEAR, sample_lut_linear),
+                                   (Image.BICUBIC, sample_lut_cubic)]:
+            reference = ImageFilter.Color3DLUT.generate(
+                (9, 4, 11), lambda r, g, b: sample_lut(lut, (r, g, b)))
+
+            res_numpy = resize_lut(lut, (9, 4, 11), interp=interp)
+            self.assertAlmostEqualLuts(res_numpy, reference, 16)
+
+            with disable_numpy(operations):
+                res_native = resize_lut(lut, (9, 4, 11), interp=interp)
+            self.assertAlmostEqualLuts(res_native, reference)
+
     def test_fallback_to_linear(self):
         lut3 = ImageFilter.Color3DLUT.generate(
             (5, 5, 3), lambda r, g, b: (r**1.5, g**1.5, b**1.5))
@@ -232,6 +276,26 @@ class TestTransformLut(PillowTestCase):
     lut5_4c = ImageFilter.Color3DLUT.generate(
         5, channels=4, callback=lambda r, g, b: (r*r, g*g, b*b, 1.0))
 
+    def test_dtype_chain(self):
+        def chain(dtype):
+            lut = identity_table(9, dtype=dtype)
+            for i in range(20):
+                lut = transform_lut(
+                    lut, self.lut7_in if i % 2 else self.lut7_out, dtype=dtype)
+            return lut
+
+        with disable_numpy(operations), disable_numpy(generators):
+            lut_native = chain(None)
+        lut32, lut64 = chain('float32'), chain('float64')
+        assert lut32.table.dtype == numpy.float32
+        assert lut64.table.dtype == numpy.float64
+
+        # Errors of float32 are accumulated
+        diff32 = numpy.abs(lut32.table - numpy.array(lut_native.table)).max()
+        diff64 = numpy.abs(lut64.table - numpy.array(lut_native.table)).max()
+        assert diff32 > 1e-7
+        assert diff64 < 1e-12
+
     def test_wrong_args(self):
         with pytest.raises(ValueError, match="only 3-channel cubes"):
             transform_lut(self.lut5_4c, identity_table(3))
@@ -387,6 +451,159 @@ class TestTransformLut(PillowTestCase):
         assert isinstance(lut_native.table, list)
 
 
+class TestFoldShaperLut(PillowTestCase):
+    shaper = Color1DLUT(17, [
+        (x / 16) ** (1 / 2.2) for x in range(17) for _ in range(3)
+    ])
+    lut9_out = ImageFilter.Color3DLUT.generate(
+        9, lambda r, g, b: (r**2.2, g**2.2, b**2.2))
+
+    def test_dtype(self):
+        lut64 = fold_shaper_lut(self.shaper, self.lut9_out, dtype='float64')
+        assert lut64.table.dtype == numpy.float64
+        with disable_numpy(operations):
+            lut_native = fold_shaper_lut(self.shaper, self.lut9_out)
+        self.assertAlmostEqualLuts(lut64, lut_native, 40)
+
+    def test_correct_args(self):
+        result = fold_shaper_lut(self.shaper, identity_table((3, 4, 5),
+                                                             target_mode='RGB'))
+        assert tuple(result.size) == (3, 4, 5)
+        assert result.mode == 'RGB'
+        assert result.channels == 3
+
+        result = fold_shaper_lut(self.shaper, identity_table(3), target_size=6)
+        assert tuple(result.size) == (6, 6, 6)
+
+    def test_identity(self):
+        shaper = Color1DLUT(2, [0, 0, 0, 1, 1, 1])
+        res_numpy = fold_shaper_lut(shaper, self.lut9_out)
+        self.assertAlmostEqualLuts(res_numpy, self.lut9_out)
+
+        with disable_numpy(operations):
+            res_native = fold_shaper_lut(shaper, self.lut9_out)
+        self.assertAlmostEqualLuts(res_native, res_numpy)
+
+    def test_correctness(self):
+        res_numpy = fold_shaper_lut(self.shaper, self.lut9_out, target_size=5)
+        self.assertAlmostEqualLuts(res_numpy, identity_table(5), 6)
+
+        with disable_numpy(operations):
+            res_native = fold_shaper_lut(self.shaper, self.lut9_out,
+                                         target_size=5)
+        self.assertAlmostEqualLuts(res_native, res_numpy)
+
+        result = fold_shaper_lut(self.shaper, self.lut9_out, target_size=5,
+                                 interp=Image.BICUBIC)
+        self.assertAlmostEqualLuts(result, identity_table(5), 6)
+
+    def test_domain(self):
+        shaper = Color1DLUT(2, [0, 0, 0, 1, 1, 1],
+                            domain_min=(-1, 0, 0), domain_max=(1, 2, 1))
+        result = fold_shaper_lut(shaper, identity_table(3))
+        assert list(result.table[3:6]) == [0.75, 0, 0]
+        assert list(result.table[-3:]) == [1, 0.5, 1]
+
+
+class TestBakeColorspace(PillowTestCase):
+    lut = ImageFilter.Color3DLUT.generate(
+        17, lambda r, g, b: (r**1.5, g, b**0.7))
+
+    @staticmethod
+    def image():
+        im = Image.linear_gradient('L').resize((64, 64))
+        return Image.merge('RGB', (im, im.rotate(90), im.rotate(180)))
+
+    @staticmethod
+    def modes():
+        modes = ['YCbCr', 'LAB', 'HSV']
+        try:
+            Image.new('RGB', (1, 1)).convert('LAB')
+        except ValueError:
+            # Old Pillow can't convert RGB to LAB
+            modes.remove('LAB')
+        return modes
+
+    @staticmethod
+    def pixels(im):
+        # LAB images are stored with signed a and b channels,
+        # but Color3DLUT works with the unsigned ones.
+        return numpy.stack([numpy.asarray(ch, dtype=numpy.int16)
+                            for ch in im.split()], axis=-1)
+
+    def test_wrong_args(self):
+        with pytest.raises(ValueError, match="3-channel"):
+            bake_colorspace(identity_table(3, target_mode='RGBA').transform(
+                lambda r, g, b: (r, g, b, 1), channels=4), 'YCbCr')
+
+        with pytest.raises(ValueError, match="Unsupported mode"):
+            bake_colorspace(self.lut, 'CMYK')
+
+        with pytest.raises(ValueError, match="Unsupported mode"):
+            bake_colorspace(self.lut, 'RGB', 'L')
+
+    def test_correct_args(self):
+        result = bake_colorspace(self.lut, 'YCbCr')
+        assert tuple(result.size) == (17, 17, 17)
+        assert result.channels == 3
+        assert result.mode == 'RGB'
+
+        result = bake_colorspace(self.lut, 'RGB', 'LAB', target_size=(5, 6, 7))
+        assert tuple(result.size) == (5, 6, 7)
+        assert result.mode == 'LAB'
+
+        result = bake_colorspace(self.lut, 'HSV', 'HSV')
+        assert result.mode is None
+
+        result = bake_colorspace(self.lut, dtype='float64')
+        assert result.table.dtype == numpy.float64
+
+    def test_identity(self):
+        result = bake_colorspace(identity_table(5))
+        self.assertAlmostEqualLuts(result, identity_table(5), 18)
+
+        result = bake_colorspace(self.lut, 'YCbCr', 'YCbCr')
+        ycbcr = self.image().convert('YCbCr')
+        expected = ycbcr.convert('RGB').filter(self.lut).convert('YCbCr')
+        diff = numpy.abs(self.pixels(ycbcr.filter(result)) -
+                         self.pixels(expected))
+        assert diff.max() <= 16
+
+    def test_input(self):
+        for mode in self.modes():
+            im = self.image().convert(mode)
+            result = im.filter(bake_colorspace(self.lut, mode, target_size=33))
+            assert result.mode == 'RGB'
+
+            expected = im.convert('RGB').filter(self.lut)
+            diff = numpy.abs(self.pixels(result) - self.pixels(expected))
+            # Conversion to RGB is nonlinear at the gamut bounds
+            assert diff.max() <= 16, mode
+            assert diff.mean() <= 1, mode
+
+    def test_output(self):
+        im = self.image()
+        for mode in self.modes():
+            result = im.filter(bake_colorspace(self.lut, 'RGB', mode))
+            assert result.mode == mode
+
+            expected = im.filter(self.lut).convert(mode)
+            diff = numpy.abs(self.pixels(result) - self.pixels(expected))
+            if mode == 'HSV':
+                # Hue is discontinuous and can't be interpolated,
+                # saturation and value are nonlinear
+                assert diff[..., 1:].max() <= 16
+            else:
+                assert diff.max() <= 2, mode
+
+    def test_native(self):
+        res_numpy = bake_colorspace(self.lut, 'LAB', 'HSV')
+        with disable_numpy(operations):
+            res_native = bake_colorspace(self.lut, 'LAB', 'HSV')
+        assert isinstance(res_native.table, list)
+        self.assertAlmostEqualLuts(res_native, res_numpy, 12)
+
+
 class TestAmplifyLut(PillowTestCase):
     lut5_4c = ImageFilter.Color3DLUT.generate(
         5, channels=4, callback=lambda r, g, b: (r*r, g*g, b*b, 1.0))
@@ -472,3 +689,495 @@ class TestAmplifyLut(PillowTestCase):
             lut_native = amplify_lut(args, 2.0)
         im.filter(lut_native)
         assert isinstance(lut_native.table, list)
+
+
+class TestBlendLuts(PillowTestCase):
+    lut_a = generators.rgb_color_enhance(5, exposure=0.3)
+    lut_b = generators.rgb_color_enhance(5, saturation=0.5, contrast=0.2)
+
+    def test_dtype(self):
+        luts = [self.lut_a, self.lut_b, None]
+        weights = [0.5, (0.2, 0.3, 0.4), 0.3]
+        lut64 = blend_luts(luts, weights, target_size=7, dtype='float64')
+        assert lut64.table.dtype == numpy.float64
+        # numpy scalars would make the native path compute in float32
+        native_luts = [
+            ImageFilter.Color3DLUT(lut.size, lut.table.tolist()) if lut else None
+            for lut in luts
+        ]
+        with disable_numpy(operations):
+            lut_native = blend_luts(native_luts, weights, target_size=7)
+        self.assertAlmostEqualLuts(lut64, lut_native, 40)
+
+        lut64 = amplify_lut(self.lut_a, 1.5, dtype='float64')
+        assert lut64.table.dtype == numpy.float64
+
+    def test_wrong_args(self):
+        with pytest.raises(ValueError, match="number of weights"):
+            blend_luts([self.lut_a, self.lut_b], [1])
+        with pytest.raises(ValueError, match="target size is required"):
+            blend_luts([None], [1])
+        with pytest.raises(ValueError, match="same number of channels"):
+            blend_luts([self.lut_a, TestAmplifyLut.lut5_4c], [0.5, 0.5])
+        with pytest.raises(ValueError, match="one float or 3 floats"):
+            blend_luts([self.lut_a], [(1, 1)])
+
+    def test_correctness(self):
+        result = blend_luts([self.lut_a, self.lut_b], [0.3, 0.7])
+        assert tuple(result.size) == (5, 5, 5)
+        expected = self.lut_a.table * 0.3 + self.lut_b.table * 0.7
+        assert list(result.table) == pytest.approx(list(expected), abs=1e-6)
+
+        result = blend_luts([self.lut_a, self.lut_b], [(1, 0, 0.5), (0, 1, 0.5)])
+        table = result.table.reshape(-1, 3)
+        assert list(table[:, 0]) == list(self.lut_a.table[0::3])
+        assert list(table[:, 1]) == list(self.lut_b.table[1::3])
+
+        with disable_numpy(operations):
+            native = blend_luts([self.lut_a, self.lut_b, None], [0.3, 0.5, 0.2])
+        assert isinstance(native.table, list)
+        self.assertAlmostEqualLuts(
+            native, blend_luts([self.lut_a, self.lut_b, None], [0.3, 0.5, 0.2]),
+            16)
+
+    def test_identity(self):
+        self.assertEqualLuts(blend_luts([None], [1], target_size=(3, 4, 5)),
+                             identity_table((3, 4, 5)))
+        with disable_numpy(operations), disable_numpy(generators):
+            result = blend_luts([None], [1], target_size=(3, 4, 5))
+            self.assertEqualLuts(result, identity_table((3, 4, 5)))
+
+    def test_different_sizes(self):
+        lut_b = resize_lut(self.lut_b, 9)
+        result = blend_luts([self.lut_a, lut_b], [0.5, 0.5])
+        assert tuple(result.size) == (5, 5, 5)
+        self.assertAlmostEqualLuts(
+            result, blend_luts([self.lut_a, self.lut_b], [0.5, 0.5]), 14)
+
+        result = blend_luts([self.lut_a, lut_b], [0.5, 0.5], target_size=9)
+        assert tuple(result.size) == (9, 9, 9)
+        self.assertAlmostEqualLuts(
+            result, blend_luts([resize_lut(self.lut_a, 9), lut_b], [0.5, 0.5]),
+            14)
+
+        with disable_numpy(operations):
+            native = blend_luts([self.lut_a, lut_b], [0.5, 0.5], target_size=9)
+        self.assertAlmostEqualLuts(native, result, 14)
+
+    def test_4_channels(self):
+        lut = TestAmplifyLut.lut5_4c
+        result = blend_luts([lut, None], [(0.5, 0.5, 0.5, 1), (0.5, 0.5, 0.5, 0)])
+        self.assertAlmostEqualLuts(result, amplify_lut(lut, 0.5))
+        assert list(result.table[3::4]) == [1.0] * 125
+
+    def test_target_mode(self):
+        lut = ImageFilter.Color3DLUT(5, self.lut_a.table, target_mode='HSV')
+        assert blend_luts([None, lut], [0.5, 0.5]).mode == 'HSV'
+
+
+class TestLutSequence(PillowTestCase):
+    lut_a = generators.rgb_color_enhance(5, exposure=0.3)
+    lut_b = generators.rgb_color_enhance(5, saturation=0.5, contrast=0.2)
+
+    def test_dtype(self):
+        frames = list(lut_sequence(self.lut_a, self.lut_b, 3, dtype='float64'))
+        assert all(lut.table.dtype == numpy.float64 for lut in frames)
+        self.assertAlmostEqualLuts(frames[2], self.lut_b, 20)
+
+    def test_wrong_args(self):
+        with pytest.raises(ValueError, match="should be positive"):
+            lut_sequence(self.lut_a, self.lut_b, 0)
+        with pytest.raises(ValueError, match="same number of channels"):
+            lut_sequence(self.lut_a, TestAmplifyLut.lut5_4c, 2)
+        with pytest.raises(ValueError, match="float32 and float64"):
+            lut_sequence(self.lut_a, self.lut_b, 2, dtype='int8')
+
+    def test_frames(self):
+        frames = list(lut_sequence(self.lut_a, self.lut_b, 5))
+        assert len(frames) == 5
+        self.assertEqualLuts(frames[0], self.lut_a)
+        self.assertAlmostEqualLuts(frames[-1], self.lut_b)
+        for i, frame in enumerate(frames):
+            self.assertAlmostEqualLuts(
+                frame, blend_luts([self.lut_a, self.lut_b], [1 - i / 4, i / 4]),
+                14)
+        assert len({id(frame.table) for frame in frames}) == 5
+
+        frames = list(lut_sequence(self.lut_a, self.lut_b, 1))
+        assert len(frames) == 1
+        self.assertEqualLuts(frames[0], self.lut_a)
+
+    def test_reuse(self):
+        im = Image.new('RGB', (10, 10), (100, 150, 200))
+        frames = lut_sequence(self.lut_a, self.lut_b, 3, reuse=True)
+        first = next(frames)
+        table = first.table
+        pixel = im.filter(first).getpixel((0, 0))
+        assert pixel == im.filter(self.lut_a).getpixel((0, 0))
+        middle = next(frames)
+        assert middle is first
+        assert middle.table is table
+        assert im.filter(middle).getpixel((0, 0)) != pixel
+        assert next(frames) is first
+        self.assertAlmostEqualLuts(first, self.lut_b)
+
+    def test_sizes(self):
+        lut_b = resize_lut(self.lut_b, 9)
+        frames = list(lut_sequence(self.lut_a, lut_b, 2))
+        assert tuple(frames[1].size) == (5, 5, 5)
+        self.assertAlmostEqualLuts(frames[1], self.lut_b, 14)
+
+        frames = list(lut_sequence(self.lut_a, lut_b, 2, target_size=9))
+        assert tuple(frames[0].size) == (9, 9, 9)
+        self.assertAlmostEqualLuts(frames[1], lut_b, 16)
+
+    def test_native(self):
+        with disable_numpy(operations):
+            frames = list(lut_sequence(self.lut_a, self.lut_b, 3))
+            reused = [list(frame.table) for frame in
+                      lut_sequence(self.lut_a, self.lut_b, 3, reuse=True)]
+        assert isinstance(frames[1].table, list)
+        self.assertAlmostEqualLuts(
+            frames[1], blend_luts([self.lut_a, self.lut_b], [0.5, 0.5]), 14)
+        assert reused == [frame.table for frame in frames]
+
+    def test_compact(self):
+        frames = list(lut_sequence(self.lut_a, self.lut_b, 3, reuse=True,
+                                   cls=Float16Color3DLUT))
+        assert isinstance(frames[0], Float16Color3DLUT)
+        self.assertAlmostEqualLuts(frames[0], self.lut_b, 10)
+
+
+class TestUpdateLutRegion(PillowTestCase):
+    bounds = ((0.5, 0, 0), (1, 0.3, 0.3))
+
+    @staticmethod
+    def saturate(region):
+        return generators.rgb_color_enhance(region, saturation=0.5)
+
+    def assert_region(self, lut, inside, outside):
+        inside = numpy.asarray(inside.table).reshape(9, 9, 9, -1)
+        outside = numpy.asarray(outside.table).reshape(9, 9, 9, -1)
+        table = numpy.asarray(lut.table).reshape(9, 9, 9, -1)
+        # Nodes from 0.5 to 1.0 for red, from 0 to 0.375 for green and blue
+        mask = numpy.zeros((9, 9, 9), dtype=bool)
+        mask[0:4, 0:4, 4:9] = True
+        assert numpy.abs(table[mask] - inside[mask]).max() < 1e-6
+        assert (table[~mask] == outside[~mask]).all()
+
+    def test_identity_source(self):
+        lut = identity_table(9)
+        table = lut.table
+        assert update_lut_region(lut, self.saturate, self.bounds) is lut
+        assert lut.table is table
+        self.assert_region(lut, generators.rgb_color_enhance(9, saturation=0.5),
+                           identity_table(9))
+
+    def test_source(self):
+        source = generators.rgb_color_enhance(9, exposure=0.2)
+        lut = generators.rgb_color_enhance(9, exposure=0.2)
+        update_lut_region(lut, self.saturate, self.bounds, source=source)
+        self.assert_region(lut, self.saturate(source), source)
+
+        with pytest.raises(ValueError, match="the same size"):
+            update_lut_region(lut, self.saturate, self.bounds,
+                              source=identity_table(5))
+
+    def test_small_region(self):
+        lut = identity_table(9)
+        regions = []
+
+        def generator(region):
+            regions.append(region)
+            return region.transform(lambda r, g, b: (0, 0, 0))
+
+        update_lut_region(lut, generator, ((0.5, 0.5, 1), (0.5, 0.5, 1)))
+        assert tuple(regions[0].size) == (2, 2, 2)
+        assert list(regions[0].table[:3]) == [0.5, 0.5, 0.875]
+        table = numpy.asarray(lut.table).reshape(9, 9, 9, 3)
+        assert (table[7:9, 4:6, 4:6] == 0).all()
+        # All nodes except the region and the black
+        assert (table != 0).any(axis=-1).sum() == 9**3 - 8 - 1
+
+    def test_wrong_bounds(self):
+        lut = identity_table(9)
+        with pytest.raises(ValueError, match="should not exceed"):
+            update_lut_region(lut, self.saturate, ((0, 0.6, 0), (1, 0.4, 1)))
+        self.assertEqualLuts(lut, identity_table(9))
+
+    def test_wrong_generator(self):
+        with pytest.raises(ValueError, match="2x4x4 size with 3 channels"):
+            update_lut_region(identity_table(9), lambda region: identity_table(3),
+                              ((0.9, 0, 0), (1, 0.3, 0.3)))
+
+    def test_native(self):
+        source = generators.rgb_color_enhance(9, exposure=0.2)
+        lut_numpy = generators.rgb_color_enhance(9, exposure=0.2)
+        update_lut_region(lut_numpy, self.saturate, self.bounds, source=source)
+
+        with disable_numpy(operations):
+            lut_native = ImageFilter.Color3DLUT(9, source.table.tolist())
+            update_lut_region(lut_native, self.saturate, self.bounds,
+                              source=lut_native)
+            assert isinstance(lut_native.table, list)
+        self.assertAlmostEqualLuts(lut_native, lut_numpy, 16)
+
+        lut_list = ImageFilter.Color3DLUT(9, source.table.tolist())
+        update_lut_region(lut_list, self.saturate, self.bounds)
+        assert isinstance(lut_list.table, list)
+        assert all(isinstance(x, float) for x in lut_list.table)
+
+    def test_compact(self):
+        lut = Float16Color3DLUT(9, identity_table(9).table)
+        update_lut_region(lut, self.saturate, self.bounds)
+        self.assert_region(
+            lut, Float16Color3DLUT(9, generators.rgb_color_enhance(
+                9, saturation=0.5).table), identity_table(9))
+
+
+class TestInvertLut(PillowTestCase):
+    lut7_in = ImageFilter.Color3DLUT.generate(
+        7, lambda r, g, b: (r**1.2, g**1.2, b**1.2))
+    lut7_out = ImageFilter.Color3DLUT.generate(
+        7, lambda r, g, b: (r**(1/1.2), g**(1/1.2), b**(1/1.2)))
+    lut5_4c = ImageFilter.Color3DLUT.generate(
+        5, channels=4, callback=lambda r, g, b: (r*r, g*g, b*b, 1.0))
+
+    def test_dtype(self):
+        lut64 = invert_lut(self.lut7_in, dtype='float64')
+        assert lut64.table.dtype == numpy.float64
+        self.assertAlmostEqualLuts(lut64, invert_lut(self.lut7_in), 12)
+
+    def test_wrong_args(self):
+        with pytest.raises(ValueError, match="only 3-channel cubes"):
+            invert_lut(self.lut5_4c)
+
+    def test_correct_args(self):
+        result = invert_lut(identity_table((3, 4, 5), target_mode='RGB'))
+        assert tuple(result.size) == (3, 4, 5)
+        assert result.mode is None
+        assert result.channels == 3
+
+        result = invert_lut(identity_table(3), target_size=(6, 7, 8))
+        assert tuple(result.size) == (6, 7, 8)
+
+        with disable_numpy(operations):
+            result = invert_lut(identity_table(3), target_size=(6, 7, 8))
+        assert tuple(result.size) == (6, 7, 8)
+
+    def test_identity(self):
+        result = invert_lut(identity_table(5))
+        self.assertAlmostEqualLuts(result, identity_table(5))
+
+    def test_correctness(self):
+        res_numpy = invert_lut(self.lut7_in)
+        self.assertAlmostEqualLuts(res_numpy, self.lut7_out, 6)
+
+        with disable_numpy(operations):
+            res_native = invert_lut(self.lut7_in)
+        self.assertAlmostEqualLuts(res_native, res_numpy, 16)
+
+        lut = generators.rgb_color_enhance(9, contrast=0.2, exposure=0.2)
+        result = transform_lut(invert_lut(lut, target_size=17), lut)
+        identity = identity_table(17)
+        assert list(result.table) == pytest.approx(list(identity.table), abs=1e-3)
+
+    def test_not_converged(self):
+        lut = ImageFilter.Color3DLUT.generate(
+            5, lambda r, g, b: (r * 0.5, g, b))
+
+        with warnings.catch_warnings(record=True) as w:
+            result = invert_lut(lut)
+            assert len(w) == 1
+            assert '50 of 125 nodes' in str(w[0].message)
+        assert result.table[-3] == 1.0
+
+        with warnings.catch_warnings(record=True) as w:
+            with disable_numpy(operations):
+                invert_lut(lut)
+            assert len(w) == 1
+            assert '50 of 125 nodes' in str(w[0].message)
+
+    def test_strict(self):
+        # Bright red colors can't be produced
+        lut = ImageFilter.Color3DLUT.generate(
+            5, lambda r, g, b: (r * 0.5, g, b))
+
+        with pytest.raises(ValueError, match="nodes of the inverse table"):
+            invert_lut(lut, strict=True)
+
+        with disable_numpy(operations):
+            with pytest.raises(ValueError, match="nodes of the inverse table"):
+                invert_lut(lut, strict=True)
+
+        result = invert_lut(identity_table(5), strict=True)
+        self.assertAlmostEqualLuts(result, identity_table(5))
+
+    def test_application(self):
+        im = Image.new('RGB', (10, 10))
+
+        lut_numpy = invert_lut(identity_table(5))
+        im.filter(lut_numpy)
+        assert isinstance(lut_numpy.table, numpy.ndarray)
+
+        with disable_numpy(operations):
+            lut_native = invert_lut(identity_table(5))
+        im.filter(lut_native)
+        assert isinstance(lut_native.table, list)
+
+
+class TestOptimizeLutSize(PillowTestCase):
+    def test_linear(self):
+        source = generators.rgb_color_enhance(17, brightness=0.1, contrast=0.1)
+        lut = optimize_lut_size(source, 1 / 255)
+        assert tuple(lut.size) == (2, 2, 2)
+        self.assertAlmostEqualLuts(lut, resize_lut(source, 2), 16)
+
+    def test_max_error(self):
+        source = generators.rgb_color_enhance(
+            17, exposure=0.3, contrast=0.2, vibrance=0.4)
+        assert tuple(optimize_lut_size(source, 1e-6).size) == (17, 17, 17)
+
+        lut = optimize_lut_size(source, 0.1)
+        size = lut.size[0]
+        assert 2 < size < 17
+        assert tuple(lut.size) == (size, size, size)
+        assert tuple(optimize_lut_size(source, 0.2).size) <= tuple(lut.size)
+
+        probes = numpy.random.RandomState(0).rand(1000, 3).astype(numpy.float32)
+        errors = numpy.abs(
+            operations._sample_lut_linear_numpy(lut, probes)
+            - operations._sample_lut_linear_numpy(source, probes))
+        assert errors.max() <= 0.1
+
+        # Nodes of the source and the middles of the cells
+        probes = [[x / 32 for x in range(33)]] * 3
+        reference = operations._resample_lut(source, probes, Image.BILINEAR)
+        smaller = resize_lut(source, size - 1)
+        errors = numpy.abs(
+            operations._resample_lut(smaller, probes, Image.BILINEAR) - reference)
+        assert errors.max() > 0.1
+
+    def test_mean_error(self):
+        source = generators.rgb_color_enhance(
+            17, exposure=0.3, contrast=0.2, vibrance=0.4)
+        lut = optimize_lut_size(source, 1)
+        assert tuple(lut.size) == (2, 2, 2)
+        lut = optimize_lut_size(source, 1, mean_error=0.002)
+        assert 2 < lut.size[0] < 17
+
+    def test_non_cube(self):
+        source = generators.rgb_color_enhance((9, 17, 5), exposure=0.3)
+        lut = optimize_lut_size(source, 0.01, interp=Image.BICUBIC)
+        assert all(s <= t for s, t in zip(lut.size, source.size))
+        assert lut.size[1] == max(lut.size)
+
+    def test_native(self):
+        source = generators.rgb_color_enhance(9, exposure=0.3, contrast=0.2)
+        lut_numpy = optimize_lut_size(source, 0.02)
+        with disable_numpy(operations):
+            lut_native = optimize_lut_size(source, 0.02)
+        assert isinstance(lut_native.table, list)
+        self.assertAlmostEqualLuts(lut_native, lut_numpy, 10)
+
+
+class TestLutFingerprint(PillowTestCase):
+    def test_same_content(self):
+        lut = generators.rgb_color_enhance(5, exposure=0.2, contrast=0.1)
+        fingerprint = lut_fingerprint(lut)
+        assert len(fingerprint) == 32
+
+        copy = ImageFilter.Color3DLUT(lut.size, list(lut.table))
+        assert lut_fingerprint(copy) == fingerprint
+
+        copy = ImageFilter.Color3DLUT(lut.size, numpy.float64(lut.table))
+        assert lut_fingerprint(copy) == fingerprint
+
+        with disable_numpy(operations):
+            assert lut_fingerprint(lut) == fingerprint
+
+    def test_precision(self):
+        lut = identity_table(5)
+        shifted = ImageFilter.Color3DLUT(5, lut.table + 1e-6)
+        assert lut_fingerprint(shifted) == lut_fingerprint(lut)
+        assert lut_fingerprint(shifted, 24) != lut_fingerprint(lut, 24)
+
+        shifted = ImageFilter.Color3DLUT(5, lut.table + 1e-2)
+        assert lut_fingerprint(shifted) != lut_fingerprint(lut)
+        assert lut_fingerprint(shifted, 4) == lut_fingerprint(lut, 4)
+
+    def test_shape(self):
+        table = identity_table(4).table
+        assert lut_fingerprint(ImageFilter.Color3DLUT((4, 4, 4), table)) != \
+            lut_fingerprint(ImageFilter.Color3DLUT((16, 2, 2), table))
+        assert lut_fingerprint(ImageFilter.Color3DLUT(4, table)) != \
+            lut_fingerprint(ImageFilter.Color3DLUT(
+                (4, 4, 3), table, channels=4))
+
+        lut = Color1DLUT(4, [x / 9 for x in range(12)])
+        assert lut_fingerprint(lut) == lut_fingerprint(Color1DLUT(4, lut.table))
+
+    def test_mode_and_domain(self):
+        assert lut_fingerprint(identity_table(5)) != \
+            lut_fingerprint(identity_table(5, target_mode='HSV'))
+
+        lut = Color1DLUT(4, [x / 9 for x in range(12)])
+        assert lut_fingerprint(lut) != lut_fingerprint(
+            Color1DLUT(4, lut.table, domain_max=(2, 2, 2)))
+
+
+class TestLutsClose(PillowTestCase):
+    def test_close(self):
+        lut = identity_table(9)
+        assert luts_close(lut, lut)
+        assert luts_close(lut, identity_table(9))
+        assert luts_close(lut, ImageFilter.Color3DLUT(9, lut.table + 1e-4))
+        assert not luts_close(lut, ImageFilter.Color3DLUT(9, lut.table + 1e-3))
+        assert luts_close(lut, ImageFilter.Color3DLUT(9, lut.table + 1e-3),
+                          tol=1e-2)
+
+        with disable_numpy(operations):
+            assert luts_close(lut, ImageFilter.Color3DLUT(9, lut.table + 1e-4))
+            assert not luts_close(
+                lut, ImageFilter.Color3DLUT(9, lut.table + 1e-3))
+
+    def test_shape(self):
+        assert not luts_close(identity_table(4), identity_table(5))
+        assert not luts_close(identity_table(4), identity_table((4, 4, 5)))
+        assert not luts_close(
+            identity_table(2),
+            ImageFilter.Color3DLUT(2, [0] * 32, channels=4))
+
+    def test_mode_and_domain(self):
+        assert not luts_close(identity_table(5),
+                              identity_table(5, target_mode='HSV'))
+        assert luts_close(identity_table(5, target_mode='HSV'),
+                          identity_table(5, target_mode='HSV'))
+
+        lut = Color1DLUT(4, [x / 9 for x in range(12)])
+        assert luts_close(lut, Color1DLUT(4, lut.table))
+        assert not luts_close(
+            lut, Color1DLUT(4, lut.table, domain_min=(-1, 0, 0)))
+
+    def test_precision(self):
+        left = ImageFilter.Color3DLUT(2, [0.75] * 24)
+        right = ImageFilter.Color3DLUT(2, [0.75 + 1e-8] * 24)
+        assert not luts_close(left, right, tol=1e-9)
+        assert luts_close(left, right, tol=1e-7)
+        with disable_numpy(operations):
+            assert not luts_close(left, right, tol=1e-9)
+            assert luts_close(left, right, tol=1e-7)
+
+        right = ImageFilter.Color3DLUT(2, numpy.float64(right.table))
+        assert not luts_close(left, right, tol=1e-9)
+        with disable_numpy(operations):
+            assert not luts_close(left, right, tol=1e-9)
+
+    def test_partial_difference(self):
+        table = identity_table(33).table.copy()
+        lut = ImageFilter.Color3DLUT(33, table)
+        table[-1] = float('nan')
+        assert not luts_close(ImageFilter.Color3DLUT(33, table), lut)
+        table[-1] = 2
+        assert not luts_close(ImageFilter.Color3DLUT(33, table), lut)
+        assert not luts_close(lut, ImageFilter.Color3DLUT(33, table))
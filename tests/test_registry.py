@@ -0,0 +1,164 @@
+import os
+import shutil
+import threading
+
+import pytest
+
+from pillow_lut import LutRegistry, identity_table, registry
+
+from . import PillowTestCase, disable_numpy, resource, write_broken_cube, write_cube
+
+
+class TestLutRegistry(PillowTestCase):
+    @pytest.fixture(autouse=True)
+    def directory(self, tmp_path):
+        self.path = str(tmp_path)
+        for name, size in [('small', 2), ('medium', 4), ('large', 8)]:
+            write_cube(os.path.join(self.path, name + '.cube'), size)
+        with open(os.path.join(self.path, 'readme.txt'), 'w') as f:
+            f.write("Not a table")
+        shutil.copy(resource('files', 'hald.4.png'), self.path)
+
+    def test_scan(self):
+        write_broken_cube(self.path)
+        luts = LutRegistry(self.path)
+        assert list(luts) == ['broken', 'hald.4', 'large', 'medium', 'small']
+        assert len(luts) == 5
+        assert 'small' in luts
+        assert 'readme' not in luts
+        assert luts.cached_names() == []
+        assert repr(luts) == "<LutRegistry files=5 cached=0 bytes=0>"
+
+    def test_scan_same_name(self):
+        write_broken_cube(self.path)
+        write_cube(os.path.join(self.path, 'hald.4.cube'), 2)
+        with pytest.warns(UserWarning,
+                          match="same name: hald.4.cube, hald.4.png"):
+            luts = LutRegistry(self.path)
+        assert list(luts) == ['broken', 'large', 'medium', 'small']
+
+    def test_get(self):
+        write_broken_cube(self.path)
+        luts = LutRegistry(self.path)
+        lut = luts['medium']
+        self.assertAlmostEqualLuts(lut, identity_table(4))
+        assert luts.get('medium') is lut
+        assert luts.cached_names() == ['medium']
+        assert luts.cached_bytes == registry._table_bytes(lut)
+
+        assert tuple(luts['hald.4'].size) == (16, 16, 16)
+
+        with pytest.raises(KeyError):
+            luts['readme']
+        with pytest.raises(ValueError, match="The table should have"):
+            luts['broken']
+        assert luts.cached_names() == ['medium', 'hald.4']
+
+    def test_target_mode(self):
+        luts = LutRegistry(self.path, '*.cube', target_mode='RGBA')
+        assert luts['small'].mode == 'RGBA'
+
+    def test_lru(self):
+        luts = LutRegistry(self.path)
+        small, medium = luts['small'], luts['medium']
+        small_bytes = registry._table_bytes(small)
+        medium_bytes = registry._table_bytes(medium)
+        luts.max_bytes = small_bytes + medium_bytes
+        assert luts.cached_names() == ['small', 'medium']
+
+        assert luts['small'] is small
+        assert luts.cached_names() == ['medium', 'small']
+
+        # Too large for the cache at all
+        large = luts['large']
+        assert luts['large'] is not large
+        assert luts.cached_names() == ['medium', 'small']
+
+        luts.max_bytes = medium_bytes
+        write_cube(os.path.join(self.path, 'other.cube'), 2)
+        luts.register('other', os.path.join(self.path, 'other.cube'))
+        luts['other']
+        assert luts.cached_names() == ['small', 'other']
+        assert luts.cached_bytes == small_bytes * 2
+
+    def test_evict(self):
+        luts = LutRegistry(self.path)
+        small = luts['small']
+        luts['medium']
+        luts.evict('small')
+        assert luts.cached_names() == ['medium']
+        assert luts['small'] is not small
+
+        luts.evict()
+        assert luts.cached_names() == []
+        assert luts.cached_bytes == 0
+
+    def test_register(self):
+        luts = LutRegistry()
+        assert len(luts) == 0
+        luts.register('look', os.path.join(self.path, 'small.cube'))
+        assert tuple(luts['look'].size) == (2, 2, 2)
+
+        luts.register('look', os.path.join(self.path, 'medium.cube'))
+        assert luts.cached_names() == []
+        assert tuple(luts['look'].size) == (4, 4, 4)
+
+    def test_single_flight(self, monkeypatch):
+        calls = []
+        load = registry._load_lut_file
+        waiting = threading.Semaphore(0)
+        release = threading.Event()
+
+        def blocked_load(*args):
+            calls.append(args[0])
+            assert release.wait(5)
+            return load(*args)
+
+        class CountingEvent(threading.Event):
+            def wait(self, timeout=None):
+                waiting.release()
+                return super().wait(timeout)
+
+        class Loading(registry._Loading):
+            def __init__(self, filename):
+                super().__init__(filename)
+                self.event = CountingEvent()
+
+        monkeypatch.setattr(registry, '_load_lut_file', blocked_load)
+        monkeypatch.setattr(registry, '_Loading', Loading)
+        luts = LutRegistry(self.path)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(luts['medium']))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        # All threads except the loading one wait for the result
+        for _ in range(7):
+            assert waiting.acquire(timeout=5)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert len(results) == 8
+        assert all(lut is results[0] for lut in results)
+
+    def test_prewarm(self):
+        write_broken_cube(self.path)
+        luts = LutRegistry(self.path, '*.cube')
+        errors = luts.prewarm(workers=2)
+        assert list(errors) == ['broken']
+        assert sorted(luts.cached_names()) == ['large', 'medium', 'small']
+
+        luts.evict()
+        assert luts.prewarm(['small']) == {}
+        assert luts.cached_names() == ['small']
+
+    def test_table_bytes(self):
+        luts = LutRegistry(self.path)
+        assert registry._table_bytes(luts['hald.4']) == 16**3 * 3 * 4
+
+        with disable_numpy(registry):
+            assert registry._table_bytes(luts['small']) > 2**3 * 3 * 8
@@ -0,0 +1,113 @@
+import io
+import os
+
+import numpy
+import pytest
+from PIL import Image
+
+from pillow_lut import (
+    Color1DLUT, hald_image, identity_table, load_cube_file, load_hald_image,
+    rgb_color_enhance, save_cube_file, save_hald_image, savers)
+
+from . import PillowTestCase, disable_numpy, resource
+
+
+class TestSaveCubeFile(PillowTestCase):
+    def assertTablesClose(self, left, right):
+        # Values are written with 6 digits after the point
+        assert tuple(left.size) == tuple(right.size)
+        assert left.channels == right.channels
+        assert list(left.table) == pytest.approx(list(right.table), abs=1e-6)
+
+    @pytest.fixture(autouse=True)
+    def directory(self, tmp_path):
+        self.path = str(tmp_path)
+
+    def test_round_trip(self):
+        lut = rgb_color_enhance(7, exposure=0.2, saturation=-0.3)
+        filename = os.path.join(self.path, 'table.cube')
+        save_cube_file(lut, filename, title="Some table")
+
+        with open(filename) as f:
+            assert f.readline() == 'TITLE "Some table"\n'
+            assert f.readline() == 'LUT_3D_SIZE 7\n'
+
+        loaded = load_cube_file(filename)
+        assert loaded.name == "Some table"
+        self.assertTablesClose(loaded, lut)
+
+    def test_file_object(self):
+        lut = identity_table((2, 3, 4))
+        with disable_numpy(savers):
+            f = io.StringIO()
+            save_cube_file(lut, f)
+        assert f.getvalue().startswith("LUT_3D_SIZE 2 3 4\n\n0.000000 ")
+
+        f.seek(0)
+        self.assertTablesClose(load_cube_file(f), lut)
+
+    def test_4_channels(self):
+        lut = identity_table(3)
+        lut = lut.transform(lambda r, g, b: (r, g, b, r * g), channels=4)
+        f = io.StringIO()
+        save_cube_file(lut, f)
+        assert "\nCHANNELS 4\n" in f.getvalue()
+
+        f.seek(0)
+        self.assertTablesClose(load_cube_file(f), lut)
+
+    def test_1d(self):
+        lut = Color1DLUT(
+            4, [x / 3 for x in range(4) for _ in range(3)],
+            domain_min=(0, 0, 0), domain_max=(2, 2, 2))
+        f = io.StringIO()
+        save_cube_file(lut, f)
+        assert f.getvalue().startswith(
+            "LUT_1D_SIZE 4\nDOMAIN_MIN 0.0 0.0 0.0\nDOMAIN_MAX 2.0 2.0 2.0\n")
+
+        f.seek(0)
+        loaded = load_cube_file(f)
+        assert isinstance(loaded, Color1DLUT)
+        assert loaded.domain_max == (2, 2, 2)
+
+
+class TestHaldImage(PillowTestCase):
+    def test_wrong_size(self):
+        with pytest.raises(ValueError, match="Hald image"):
+            hald_image(identity_table(5))
+        with pytest.raises(ValueError, match="Hald image"):
+            hald_image(identity_table((4, 4, 9)))
+
+    def test_source_image(self):
+        im = Image.open(resource('files', 'hald.6.hefe.png')).convert('RGB')
+        lut = load_hald_image(im)
+        assert hald_image(lut).tobytes() == im.tobytes()
+        with disable_numpy(savers):
+            assert hald_image(lut).tobytes() == im.tobytes()
+
+    def test_clip(self):
+        lut = rgb_color_enhance(4, brightness=0.5)
+        im = hald_image(lut)
+        assert im.mode == 'RGB'
+        assert im.size == (8, 8)
+        expected = numpy.clip(numpy.asarray(lut.table), 0, 1)
+        loaded = numpy.asarray(load_hald_image(im).table)
+        assert numpy.abs(loaded - expected).max() <= 0.51 / 255
+
+        with disable_numpy(savers):
+            assert hald_image(lut).tobytes() == im.tobytes()
+
+    def test_4_channels(self):
+        lut = identity_table(4)
+        lut = lut.transform(lambda r, g, b: (r, g, b, 1), channels=4)
+        assert hald_image(lut).mode == 'RGBA'
+
+    def test_save(self):
+        lut = rgb_color_enhance(9, contrast=0.2)
+        f = io.BytesIO()
+        save_hald_image(lut, f, 'PNG')
+        f.seek(0)
+        loaded = load_hald_image(Image.open(f))
+        assert numpy.abs(
+            numpy.asarray(loaded.table) - numpy.clip(lut.table, 0, 1)
+        ).max() <= 0.51 / 255
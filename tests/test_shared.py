@@ -0,0 +1,133 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+import pytest
+from PIL import Image, ImageFilter
+
+from pillow_lut import (
+    SharedColor3DLUT, identity_table, load_cube_file, rgb_color_enhance, shared,
+    update_lut_region)
+
+from . import PillowTestCase, disable_numpy, resource
+
+
+def _apply(lut, size, data):
+    im = Image.frombytes('RGB', size, data)
+    return lut.shared_name, lut.is_owner, im.filter(lut).tobytes()
+
+
+@pytest.mark.skipif(shared.shared_memory is None,
+                    reason="multiprocessing.shared_memory is not available")
+class TestSharedColor3DLUT(PillowTestCase):
+    def test_cls(self):
+        lut = rgb_color_enhance(9, exposure=0.3, cls=SharedColor3DLUT)
+        assert isinstance(lut, SharedColor3DLUT)
+        assert lut.is_owner
+        assert isinstance(lut.table, numpy.ndarray)
+        assert lut.table.dtype == numpy.float32
+        self.assertAlmostEqualLuts(lut, rgb_color_enhance(9, exposure=0.3), 20)
+
+        lut = load_cube_file([
+            'TITLE "Shared"',
+            "LUT_3D_SIZE 2",
+        ] + ["0 0 0"] * 8, cls=SharedColor3DLUT)
+        assert lut.name == "Shared"
+        assert repr(lut) == "<SharedColor3DLUT from ndarray size=2x2x2 channels=3>"
+
+    def test_application(self):
+        im = Image.open(resource('files', 'hald.6.hefe.png')).convert('RGB')
+        lut = rgb_color_enhance(9, exposure=0.3, saturation=0.2)
+        shared_lut = SharedColor3DLUT(lut.size, lut.table)
+        assert im.filter(shared_lut).tobytes() == im.filter(lut).tobytes()
+
+        with disable_numpy(shared):
+            shared_lut = SharedColor3DLUT(lut.size, lut.table)
+            assert isinstance(shared_lut.table, memoryview)
+            assert im.filter(shared_lut).tobytes() == im.filter(lut).tobytes()
+            transformed = shared_lut.transform(lambda r, g, b: (b, g, r))
+            shared_lut.release()
+
+        assert isinstance(transformed, SharedColor3DLUT)
+        self.assertAlmostEqualLuts(
+            transformed, lut.transform(lambda r, g, b: (b, g, r)), 20)
+
+    def test_pickle(self):
+        lut = rgb_color_enhance(5, brightness=0.1, cls=SharedColor3DLUT)
+        lut.name = "Bright"
+        data = pickle.dumps(lut)
+        # Only the handle is pickled
+        assert len(data) < 500
+
+        attached = pickle.loads(data)
+        assert isinstance(attached, SharedColor3DLUT)
+        assert not attached.is_owner
+        assert attached.shared_name == lut.shared_name
+        assert attached.name == "Bright"
+        self.assertEqualLuts(attached, lut)
+
+        # The memory is shared
+        lut.table[0] = 0.5
+        assert attached.table[0] == 0.5
+
+        # Releasing attached table doesn't destroy the block
+        attached.release()
+        with pytest.raises(ValueError, match="released"):
+            attached.table
+        self.assertEqualLuts(pickle.loads(data), lut)
+
+    def test_release(self):
+        with SharedColor3DLUT.generate(3, lambda r, g, b: (r, g, b)) as lut:
+            name = lut.shared_name
+            block = shared.shared_memory.SharedMemory(name=name)
+            block.close()
+        with pytest.raises(ValueError, match="released"):
+            lut.table
+        with pytest.raises(FileNotFoundError):
+            shared.shared_memory.SharedMemory(name=name)
+        # Second release is no-op
+        lut.release()
+
+    def test_garbage_collected(self):
+        lut = identity_table(3, cls=SharedColor3DLUT)
+        name = lut.shared_name
+        del lut
+        with pytest.raises(FileNotFoundError):
+            shared.shared_memory.SharedMemory(name=name)
+
+    def test_replace_table(self):
+        lut = identity_table(4, cls=SharedColor3DLUT)
+        name = lut.shared_name
+        lut.table = lut.table * 2
+        assert lut.shared_name != name
+        with pytest.raises(FileNotFoundError):
+            shared.shared_memory.SharedMemory(name=name)
+        self.assertAlmostEqualLuts(
+            lut, identity_table(4).transform(lambda *x: [v * 2 for v in x]))
+
+        # In-place changes keep the block
+        name = lut.shared_name
+        update_lut_region(lut, lambda lut: identity_table(lut.size),
+                          ((0, 0, 0), (0.5, 0.5, 0.5)))
+        assert lut.shared_name == name
+        assert lut.table[0:3].tolist() == [0, 0, 0]
+
+    def test_process_pool(self):
+        im = Image.open(resource('files', 'hald.4.png')).convert('RGB')
+        lut = rgb_color_enhance(9, exposure=0.3, cls=SharedColor3DLUT)
+        expected = im.filter(ImageFilter.Color3DLUT(lut.size, lut.table))
+
+        with ProcessPoolExecutor(2) as executor:
+            results = list(executor.map(
+                _apply, [lut] * 4, [im.size] * 4, [im.tobytes()] * 4))
+        for name, is_owner, data in results:
+            assert name == lut.shared_name
+            assert not is_owner
+            assert data == expected.tobytes()
+
+        # Workers don't destroy the block on exit
+        block = shared.shared_memory.SharedMemory(name=lut.shared_name)
+        block.close()
+        lut.release()
+        with pytest.raises(FileNotFoundError):
+            shared.shared_memory.SharedMemory(name=lut.shared_name)